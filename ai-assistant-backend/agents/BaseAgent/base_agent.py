@@ -41,7 +41,7 @@ class BaseAgent():
         """
         Generate tool calls based on the messages.
         """
-        response = await chat_model.generate_response_with_tools(self.messages, self.tools)
+        response = await chat_model.generate_response_with_tools(self.messages, self.tools, call_site=f"{self.name}.tool_calls")
 
         self.messages.append(
                 {
@@ -123,7 +123,7 @@ class BaseAgent():
         ]
         
         try:
-            response = await chat_model.generate_response(context_messages)
+            response = await chat_model.generate_response(context_messages, use_cache=True, call_site="analyze_tool_calls")
             
         except Exception as e:
             logger.error(f"Error extracting key info: {e}")
@@ -162,7 +162,8 @@ class BaseAgent():
 
         response_stream = await chat_model.generate_streaming_response(
             messages=self.messages,
-            tools=self.tools
+            tools=self.tools,
+            call_site=f"{self.name}.final_response"
         )
 
         return response_stream
@@ -48,7 +48,7 @@ async def calendar_agent(query: str, chat_history: List[Dict[str, str]]) -> Dict
         ]
 
         # Step 2: Generate the tool plan and tool calls and append the results to the messages list
-        response = await chat_model.generate_response_with_tools(messages, tools)
+        response = await chat_model.generate_response_with_tools(messages, tools, call_site="calendar_agent.tool_calls")
 
         for tc in response.message.tool_calls:
             logger.info(f"Tool name: {tc.function.name} | Parameters: {tc.function.arguments}")
@@ -87,7 +87,8 @@ async def calendar_agent(query: str, chat_history: List[Dict[str, str]]) -> Dict
         # Step 4: Generate the final response
         response_stream = await chat_model.generate_streaming_response(
             messages=messages,
-            tools=tools
+            tools=tools,
+            call_site="calendar_agent.final_response"
         )
         
         full_response = ""
@@ -1,9 +1,11 @@
 from agents.calendar.google_calendar_api import GoogleCalendarAPI
 from utils.utils import logger
+from utils.lazy import LazyObject
 import datetime
 from typing import Dict
 
-calendar_api = GoogleCalendarAPI()
+# Built on first use: in live mode this loads (or interactively obtains) Google credentials
+calendar_api = LazyObject(GoogleCalendarAPI, "calendar_api")
 
 
 def parse_time(time_str: str) -> datetime.time:
@@ -32,7 +34,7 @@ async def get_calendar_events(date: str = None) -> Dict:
     :return: Dictionary containing the existing events
     """
     try:
-        events = await calendar_api.get_google_calendar_events(date)
+        events = await calendar_api.get_cached_google_calendar_events(date)
         logger.info(f"Events fetched: {events}")  # Add this line for debugging
         return {"existing_events": events}
     except Exception as e:
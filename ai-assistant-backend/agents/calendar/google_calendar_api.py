@@ -1,8 +1,11 @@
 import datetime
 import os.path
 from utils.utils import logger
+from utils.upstream import upstream
+from config.config import Config
+from config.fake_provider import FakeCalendarService
+from shared_state import named_cache
 import pytz
-from functools import lru_cache
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -13,9 +16,16 @@ from typing import List, Dict
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# Events keyed by the requested day, or by month for the current month's events
+calendar_cache = named_cache("calendar_events", Config.CALENDAR_CACHE_MAX_ENTRIES, ttl=Config.CALENDAR_CACHE_TTL)
+
 class GoogleCalendarAPI:
     def __init__(self):
         try:
+            if Config.PROVIDER_MODE == "fake":
+                self.creds = None
+                self.service = FakeCalendarService()
+                return
             self.creds = self.get_credentials()
             logger.debug(f"Credentials type: {type(self.creds)}")
             self.service = build("calendar", "v3", credentials=self.creds)
@@ -41,30 +51,16 @@ class GoogleCalendarAPI:
                 token.write(creds.to_json())
         return creds
 
-    @lru_cache(maxsize=100)
-    async def get_cached_google_calendar_events(self, target_date: str = None, cache_duration: int = 15) -> List[Dict]:
+    async def get_cached_google_calendar_events(self, target_date: str = None) -> List[Dict]:
         """
-        Fetches and caches Google Calendar events.
+        Fetches Google Calendar events through the calendar cache. Concurrent requests for the
+        same day share one fetch; entries expire after CALENDAR_CACHE_TTL seconds.
         
         :param target_date: The date to fetch events for (optional)
-        :param cache_duration: How long to cache the results in minutes
         :return: List of calendar events
         """
-        cache_key = f"calendar_events_{target_date}"
-        
-        # Check if the events are already cached
-        if hasattr(self, cache_key):
-            cached_events, cache_time = getattr(self, cache_key)
-            if datetime.datetime.now() - cache_time < datetime.timedelta(minutes=cache_duration):
-                return cached_events
-
-        # Fetch events from the Google Calendar API
-        events = await self.get_google_calendar_events(target_date)
-
-        # Cache the events with the current timestamp
-        setattr(self, cache_key, (events, datetime.datetime.now()))
-
-        return events
+        cache_key = target_date or datetime.datetime.now(pytz.UTC).strftime("month:%Y-%m")
+        return await calendar_cache.get_or_set(cache_key, lambda: self.get_google_calendar_events(target_date))
 
     async def get_google_calendar_events(self, target_date: str = None) -> List[Dict]:
         """Fetches events from all of the user's Google Calendars for the specified date or current month."""
@@ -97,7 +93,7 @@ class GoogleCalendarAPI:
                 execute_method = get_method.execute
                 logger.debug(f"execute_method object: {type(execute_method)}")
                 
-                calendar = await asyncio.to_thread(execute_method)
+                calendar = await upstream.call_in_thread("google", "calendar", execute_method)
                 logger.debug(f"calendar object: {type(calendar)}")
                 
                 user_timezone = calendar['timeZone']
@@ -107,13 +103,14 @@ class GoogleCalendarAPI:
                 raise
 
             logger.info("Fetching list of all calendars")
-            calendar_list = await asyncio.to_thread(self.service.calendarList().list().execute)
+            calendar_list = await upstream.call_in_thread("google", "calendar", self.service.calendarList().list().execute)
 
             events_list = []
             for calendar in calendar_list['items']:
                 calendar_id = calendar['id']
                 logger.info(f"Fetching events for calendar: {calendar['summary']} (ID: {calendar_id})")
-                events_result = await asyncio.to_thread(
+                events_result = await upstream.call_in_thread(
+                    "google", "calendar",
                     self.service.events().list(
                         calendarId=calendar_id,
                         timeMin=time_min,
@@ -182,7 +179,7 @@ class GoogleCalendarAPI:
         
         try:
             # Get the user's timezone
-            calendar = await asyncio.to_thread(self.service.calendars().get(calendarId='primary').execute)
+            calendar = await upstream.call_in_thread("google", "calendar", self.service.calendars().get(calendarId='primary').execute)
             user_timezone = calendar['timeZone']
 
             # Check if it's an all-day event
@@ -218,7 +215,8 @@ class GoogleCalendarAPI:
                     },
                 }
 
-            event = await asyncio.to_thread(self.service.events().insert(calendarId='primary', body=event).execute())
+            event = await upstream.call_in_thread("google", "calendar", self.service.events().insert(calendarId='primary', body=event).execute)
+            await calendar_cache.aclear()
             
             return {
                 "is_success": True,
@@ -246,11 +244,11 @@ class GoogleCalendarAPI:
         """
         try:
             # Get the existing event
-            event = await asyncio.to_thread(self.service.events().get(calendarId='primary', eventId=event_id).execute())
+            event = await upstream.call_in_thread("google", "calendar", self.service.events().get(calendarId='primary', eventId=event_id).execute)
             logger.debug(f"Original event: {event}")
             
             # Get the user's timezone
-            calendar = await asyncio.to_thread(self.service.calendars().get(calendarId='primary').execute())
+            calendar = await upstream.call_in_thread("google", "calendar", self.service.calendars().get(calendarId='primary').execute)
             user_timezone = calendar['timeZone']
             
             # Update the event details if provided
@@ -280,8 +278,9 @@ class GoogleCalendarAPI:
                 event['end']['dateTime'] = end_datetime.isoformat()
 
             logger.debug(f"Updated event (before API call): {event}")
-            updated_event = await asyncio.to_thread(self.service.events().update(calendarId='primary', eventId=event_id, body=event).execute())
+            updated_event = await upstream.call_in_thread("google", "calendar", self.service.events().update(calendarId='primary', eventId=event_id, body=event).execute)
             logger.debug(f"Updated event (after API call): {updated_event}")
+            await calendar_cache.aclear()
             
             return {
                 "is_success": True,
@@ -303,7 +302,8 @@ class GoogleCalendarAPI:
         :return: A dictionary with the status and message of the operation
         """
         try:
-            await asyncio.to_thread(self.service.events().delete(calendarId='primary', eventId=event_id).execute())
+            await upstream.call_in_thread("google", "calendar", self.service.events().delete(calendarId='primary', eventId=event_id).execute)
+            await calendar_cache.aclear()
             
             return {
                 "is_success": True,
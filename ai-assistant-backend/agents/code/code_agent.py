@@ -82,7 +82,7 @@ async def code_agent(user_message: str, chat_history: List[Dict[str, str]]) -> D
         ]
 
         # Step 2: Generate the response
-        response_stream = await chat_model.generate_streaming_response(messages, tools=None)
+        response_stream = await chat_model.generate_streaming_response(messages, tools=None, call_site="code_agent.final_response")
 
         full_response = ""
         # Step 3: Stream the response back to the triage agent
@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional
+import numpy as np
+from utils.bm25 import estimate_tokens
+
+MAX_OVERLAP_WORDS = 100
+
+
+def mmr_select(results: List[Dict], k: int, lambda_mult: float) -> List[Dict]:
+    """
+    Maximal marginal relevance over hybrid results: repeatedly take the candidate with the
+    best trade-off between its fused relevance score and its cosine similarity to the
+    chunks already selected. Near-duplicate overlapping chunks are pushed down the list.
+    """
+    if len(results) <= 1 or k <= 0:
+        return results[:k]
+    vectors = np.asarray([r["embedding"] for r in results], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+    similarity = vectors @ vectors.T
+
+    relevance = np.asarray([r["score"] for r in results], dtype=np.float64)
+    relevance = relevance / relevance.max()
+
+    selected = [0]  # results arrive ordered by fused score
+    max_similarity = similarity[0].astype(np.float64)
+    available = np.ones(len(results), dtype=bool)
+    available[0] = False
+    while len(selected) < min(k, len(results)):
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return [results[i] for i in selected]
+
+
+def join_overlapping(first: str, second: str) -> str:
+    """Concatenate consecutive chunks, dropping the words the second repeats from the end of the first."""
+    first_words, second_words = first.split(), second.split()
+    for size in range(min(len(first_words), len(second_words), MAX_OVERLAP_WORDS), 0, -1):
+        if first_words[-size:] == second_words[:size]:
+            return " ".join(first_words + second_words[size:])
+    return " ".join(first_words + second_words)
+
+
+def source_key(result: Dict) -> str:
+    """Chunks of one upload share their ID prefix (file_<name>_<timestamp>_chunk_<n>)."""
+    return result["id"].rsplit("_chunk_", 1)[0]
+
+
+def best_similarity(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    """The higher dense similarity of two chunks; lexical-only chunks have none."""
+    if first is None or second is None:
+        return second if first is None else first
+    return max(first, second)
+
+
+def merge_adjacent(results: List[Dict]) -> List[Dict]:
+    """
+    Merge selected chunks that are consecutive in the same file into single spans. A span keeps
+    the best fused score and the best dense similarity of its chunks.
+    """
+    ordered = sorted(results, key=lambda r: (source_key(r), (r["metadata"] or {}).get("chunk_index", 0)))
+    spans: List[Dict] = []
+    for result in ordered:
+        metadata = result["metadata"] or {}
+        index = metadata.get("chunk_index", 0)
+        previous = spans[-1] if spans else None
+        if previous and previous["source"] == source_key(result) and index == previous["chunk_end"] + 1:
+            previous["content"] = join_overlapping(previous["content"], result["document"])
+            previous["chunk_end"] = index
+            previous["score"] = max(previous["score"], result["score"])
+            previous["similarity"] = best_similarity(previous["similarity"], result.get("similarity"))
+            continue
+        spans.append({
+            "id": result["id"],
+            "source": source_key(result),
+            "content": result["document"],
+            "metadata": metadata,
+            "chunk_start": index,
+            "chunk_end": index,
+            "score": result["score"],
+            "similarity": result.get("similarity"),
+        })
+    return spans
+
+
+def pack_spans(spans: List[Dict], token_budget: int) -> List[Dict]:
+    """Greedily keep the most relevant spans that fit the budget, then return them in document order."""
+    packed, used = [], 0
+    for span in sorted(spans, key=lambda s: s["score"], reverse=True):
+        tokens = estimate_tokens(span["content"])
+        if used + tokens > token_budget and packed:
+            continue
+        packed.append(span)
+        used += tokens
+    return sorted(packed, key=lambda s: (s["source"], s["chunk_start"]))
+
+
+def select_context(results: List[Dict], k: int, lambda_mult: float, token_budget: int) -> List[Dict]:
+    """MMR diversification, adjacent-chunk merging and token-budget packing of hybrid results."""
+    return pack_spans(merge_adjacent(mmr_select(results, k, lambda_mult)), token_budget)
+
+
+__all__ = ["select_context", "mmr_select", "merge_adjacent", "pack_spans"]
@@ -0,0 +1,98 @@
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from prometheus_client import Counter
+from config.config import Config
+from llm_models.classify import classify_model
+from shared_state import named_cache
+from utils.cache import Cache
+from utils.utils import logger
+
+# Search cache metrics
+SEARCH_CACHE_REQUESTS = Counter('search_cache_requests_total', 'Web search cache lookups', ['result'])
+SEARCH_CACHE_REFRESHES = Counter('search_cache_refreshes_total', 'Background refreshes of stale search results', ['status'])
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivially different queries share an entry."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def cache_key(query: str, variants: Sequence[str] = ()) -> str:
+    """Key on the normalized query plus the (order-independent) set of extra query variants."""
+    extra = sorted({normalize_query(v) for v in variants} - {normalize_query(query)})
+    return " | ".join([normalize_query(query)] + extra)
+
+
+class SearchResultCache:
+    """
+    TTL cache for reranked web search documents keyed by normalized query. Time-sensitive
+    queries expire quickly and timeless ones are kept much longer. Expired entries are
+    still served for a grace period while a single background task refreshes them.
+    Concurrent misses for the same query share one search.
+    """
+
+    def __init__(self, cache: Optional[Cache] = None, enabled: bool = Config.SEARCH_CACHE_ENABLED):
+        self.cache = cache or named_cache("web_search", Config.SEARCH_CACHE_MAX_ENTRIES)
+        self.enabled = enabled
+        # Background refreshes by key, so each key has at most one and the tasks are not garbage collected
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def ttl_for(self, query: str) -> float:
+        try:
+            confidence = await asyncio.to_thread(classify_model.classify_time_sensitivity, query)
+        except Exception as e:
+            logger.warning(f"Time sensitivity classification failed, using short search TTL: {str(e)}")
+            return Config.SEARCH_CACHE_TTL_TIME_SENSITIVE
+        if confidence >= Config.SEARCH_CACHE_TIME_SENSITIVE_THRESHOLD:
+            return Config.SEARCH_CACHE_TTL_TIME_SENSITIVE
+        return Config.SEARCH_CACHE_TTL_TIMELESS
+
+    async def _load(self, key: str, query: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> Tuple[float, List[Dict]]:
+        async def fetch_entry() -> Tuple[float, List[Dict]]:
+            # The TTL is classified while the search runs, and only by the caller that loads it.
+            # Freshness is tracked here, in wall clock time since the entry may be shared with other processes
+            ttl, documents = await asyncio.gather(self.ttl_for(query), fetch())
+            return time.time() + ttl, documents
+
+        # The cache keeps the entry through the stale window
+        return await self.cache.load(
+            key, fetch_entry, ttl=lambda entry: entry[0] - time.time() + Config.SEARCH_CACHE_STALE_TTL
+        )
+
+    async def _refresh(self, key: str, query: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> None:
+        try:
+            await self._load(key, query, fetch)
+            SEARCH_CACHE_REFRESHES.labels(status="success").inc()
+        except Exception as e:
+            SEARCH_CACHE_REFRESHES.labels(status="error").inc()
+            logger.warning(f"Background refresh for search '{query}' failed: {str(e)}")
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[], Awaitable[List[Dict]]],
+                           variants: Sequence[str] = ()) -> List[Dict]:
+        if not self.enabled:
+            return await fetch()
+
+        key = cache_key(query, variants)
+        entry = await self.cache.aget(key)
+        if entry is not None:
+            fresh_until, documents = entry
+            if time.time() < fresh_until:
+                SEARCH_CACHE_REQUESTS.labels(result="hit").inc()
+                return documents
+            SEARCH_CACHE_REQUESTS.labels(result="stale").inc()
+            if key not in self._refreshing:
+                task = asyncio.create_task(self._refresh(key, query, fetch))
+                self._refreshing[key] = task
+                task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+            return documents
+
+        SEARCH_CACHE_REQUESTS.labels(result="miss").inc()
+        _, documents = await self._load(key, query, fetch)
+        return documents
+
+
+search_cache = SearchResultCache()
+
+__all__ = ["search_cache", "SearchResultCache", "normalize_query", "cache_key"]
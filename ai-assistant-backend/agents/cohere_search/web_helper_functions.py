@@ -1,6 +1,7 @@
 from utils.utils import logger
 import json
 import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 def format_chat_history(chat_history: list) -> list:
     """Formats the chat history for processing, returning only user and assistant messages."""
@@ -53,3 +54,20 @@ def parse_reflexion_response(response_text):
                 "old_tool_plan": [],
                 "new_tool_plan": []
             }
+
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so the same page found through different queries dedupes to one key."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, urlencode(query), ""))
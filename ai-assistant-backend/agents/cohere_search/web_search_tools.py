@@ -1,34 +1,72 @@
-from config import tavily_client
+import asyncio
+from config import Config, tavily_async_client
 from llm_models.rerank import rerank
 from typing import List, Dict, Optional
-from db import document_collection
-import requests
-from bs4 import BeautifulSoup
-from llm_models.embed import cohere_embeddings
-from llm_models.rerank import rerank
-from nltk.tokenize import sent_tokenize
-import nltk
+from db import document_collection, corpus_collection, hybrid_query
 from utils import logger
-
-nltk.download('punkt')
+from utils.upstream import upstream
+from utils.web_fetcher import web_fetcher
+from db_executor import db_executor
+from agents.cohere_search.search_cache import search_cache
+from agents.cohere_search.web_helper_functions import canonical_url
+from agents.cohere_search.context_selection import select_context
 
 
 # Create a web search function
-async def web_search(query: str) -> List[Dict]:
-    all_results = []
+async def web_search(query: str, queries: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Search the web for the query and any extra query variants concurrently, dedupe the
+    results by canonical URL and rerank all candidates together against the main query.
+    """
+    variants = [q for q in (queries or []) if q and q.strip()]
+    # Repeat searches are served from the cache and skip both Tavily and rerank
+    return await search_cache.get_or_fetch(query, lambda: _search_and_rerank(query, variants), variants=variants)
+
+
+async def _search_many(queries: List[str]) -> List[Dict]:
+    """Run the queries against Tavily with bounded parallelism and merge results by canonical URL."""
+    semaphore = asyncio.Semaphore(Config.SEARCH_FANOUT_CONCURRENCY)
+
+    async def search_one(q: str) -> Dict:
+        async with semaphore:
+            return await upstream.call(
+                "tavily", "search",
+                tavily_async_client.search,
+                q, search_depth="advanced", max_results=Config.SEARCH_RESULTS_PER_QUERY
+            )
+
+    responses = await asyncio.gather(*(search_one(q) for q in queries), return_exceptions=True)
+    failures = [r for r in responses if isinstance(r, Exception)]
+    if len(failures) == len(responses):
+        raise failures[0]
+    for q, r in zip(queries, responses):
+        if isinstance(r, Exception):
+            logger.warning(f"Web search for variant '{q}' failed: {str(r)}")
+
+    merged: Dict[str, Dict] = {}
+    for response in responses:
+        if isinstance(response, Exception):
+            continue
+        for r in response["results"]:
+            key = canonical_url(r["url"])
+            # Keep the most complete snippet when several queries return the same page
+            if key not in merged or len(r["content"]) > len(merged[key]["content"]):
+                merged[key] = {"title": r["title"], "content": r["content"], "url": r["url"]}
+    return list(merged.values())
+
+
+async def _search_and_rerank(query: str, variants: Optional[List[str]] = None) -> List[Dict]:
     documents = []
 
-    response = tavily_client.search(query, search_depth="advanced", max_results=10)
-    results = [
-        {"title": r["title"], "content": r["content"], "url": r["url"]}
-        for r in response["results"]
-    ]
-    all_results.extend(results)
+    queries = list(dict.fromkeys([query] + (variants or [])))[:Config.SEARCH_MAX_QUERIES]
+    all_results = await _search_many(queries)
+    if not all_results:
+        return documents
 
     # Prepare documents for reranking
     rerank_docs = [f"{r['title']} {r['content']}" for r in all_results]
 
-    # Rerank the results
+    # Rerank all candidates from every query variant in a single call
     rerank_response = await rerank.rerank(query=query, documents=rerank_docs)
 
     # Create the final list of documents
@@ -48,61 +86,28 @@ async def web_search(query: str) -> List[Dict]:
             documents.append(document)
 
     documents.sort(key=lambda x: x["data"]["relevance_score"], reverse=True)
+    if Config.SEARCH_EXPAND_ENABLED:
+        await _expand_snippets(documents)
     return documents
 
-# Create vector search tool
-async def vector_search(query: str) -> List[Dict]:
 
-    urls = [
-        "https://lilianweng.github.io/posts/2023-06-23-agent/",
-        "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
-        "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
-    ]
-
-    # Function to fetch and parse content from a URL
-    def fetch_content(url):
-        response = requests.get(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        return soup.get_text()
-
-    # Function to split text into chunks
-    def split_into_chunks(text, chunk_size=512, overlap=0):
-        sentences = sent_tokenize(text)
-        chunks = []
-        current_chunk = ""
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= chunk_size:
-                current_chunk += sentence + " "
-            else:
-                chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
-                if overlap > 0:
-                    words = current_chunk.split()
-                    current_chunk = " ".join(words[-overlap:]) + " "
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        return chunks
-
-    # Fetch and chunk content for each URL
-    all_chunks = []
-    for url in urls:
-        content = fetch_content(url)
-        chunks = split_into_chunks(content)
-        all_chunks.extend([(chunk, url) for chunk in chunks])
-
-    # Create embeddings for the chunks
-    embeddings = cohere_embeddings.embed_documents([chunk for chunk, _ in all_chunks])
-
-    # Add chunks to the ChromaDB collection
-    document_collection.add(
-        documents=[chunk for chunk, _ in all_chunks],
-        metadatas=[{"url": url} for _, url in all_chunks],
-        ids=[f"chunk_{i}" for i in range(len(all_chunks))],
-        embeddings=embeddings
-    )
+async def _expand_snippets(documents: List[Dict]) -> None:
+    """Attach full-page text to the snippets the reranker scored as most relevant."""
+    candidates = [d for d in documents if d["data"]["relevance_score"] >= Config.SEARCH_EXPAND_MIN_SCORE]
+    candidates = candidates[:Config.SEARCH_EXPAND_TOP_K]
+    if not candidates:
+        return
+    pages = await web_fetcher.fetch_many([d["data"]["url"] for d in candidates])
+    for document, page in zip(candidates, pages):
+        if page is not None and page.text:
+            document["data"]["full_content"] = page.text[:Config.SEARCH_EXPAND_MAX_CHARS]
 
-    # Query the vector store
-    results = document_collection.query(
+# Create vector search tool
+async def vector_search(query: str) -> List[Dict]:
+    """Query the curated corpus indexed by corpus ingestion and rerank the matches."""
+    results = await db_executor.run(
+        "corpus.query",
+        corpus_collection.query,
         query_texts=[query],
         n_results=10,
         include=["documents", "metadatas", "distances"]
@@ -110,6 +115,9 @@ async def vector_search(query: str) -> List[Dict]:
 
     # Prepare documents for reranking
     rerank_docs = results['documents'][0]
+    if not rerank_docs:
+        logger.warning("Curated corpus is empty; has ingestion run yet?")
+        return []
 
     # Rerank the results
     rerank_response = await rerank.rerank(query=query, documents=rerank_docs)
@@ -121,7 +129,7 @@ async def vector_search(query: str) -> List[Dict]:
             formatted_results.append({
                 "id": results['ids'][0][reranked_doc.index],
                 "data": {
-                    "content": reranked_doc.document,
+                    "content": rerank_docs[reranked_doc.index],
                     "url": results['metadatas'][0][reranked_doc.index]['url'],
                     "relevance_score": reranked_doc.relevance_score
                 }
@@ -133,8 +141,9 @@ async def vector_search(query: str) -> List[Dict]:
 
 async def file_search(query: str, filenames: Optional[List[str]] = None) -> List[Dict]:
     """
-    Search through uploaded files in ChromaDB using semantic search.
-    If filenames are provided, search only within those files.
+    Search through uploaded files in ChromaDB using hybrid lexical and semantic search.
+    If filenames are provided, search only within those files. Results are diversified
+    with MMR, adjacent chunks are merged and the spans are packed into a token budget.
     """
     try:
         # Query parameters
@@ -143,52 +152,60 @@ async def file_search(query: str, filenames: Optional[List[str]] = None) -> List
             where_filter = {"filename": {"$in": filenames}}
             logger.info(f"Searching in files: {filenames}")
 
-        logger.info(f"Executing semantic search with query: '{query}'")
+        logger.info(f"Executing hybrid search with query: '{query}'")
 
-        # Query the vector store using only semantic search
-        results = document_collection.query(
-            query_texts=[query],
-            n_results=20,
+        # Fuse BM25 and dense rankings; the better precision lets us send fewer chunks
+        results = await db_executor.run(
+            "documents.hybrid_query",
+            hybrid_query,
+            document_collection,
+            query,
+            Config.FILE_SEARCH_CANDIDATES,
             where=where_filter,
-            include=["documents", "metadatas", "distances"]
+            filenames=filenames,
+            include_embeddings=True
         )
 
-        if not results['documents'][0]:
-            logger.warning("No results found in semantic search")
+        if not results:
+            logger.warning("No results found in hybrid search")
             return []
 
-        logger.info(f"Semantic search returned {len(results['documents'][0])} chunks")
+        logger.info(f"Hybrid search returned {len(results)} chunks")
+
+        spans = select_context(
+            results,
+            k=Config.FILE_SEARCH_N_RESULTS,
+            lambda_mult=Config.FILE_SEARCH_MMR_LAMBDA,
+            token_budget=Config.FILE_SEARCH_TOKEN_BUDGET
+        )
 
-        # Format results directly without reranking
         formatted_results = []
-        for i, (doc, metadata, distance) in enumerate(zip(
-            results['documents'][0],
-            results['metadatas'][0],
-            results['distances'][0]
-        )):
-            similarity_score = 1 - (distance / 2)
-            
+        top_score = results[0]["score"]
+        for span in spans:
+            metadata = span["metadata"]
+
             # Get metadata values with defaults if keys don't exist
             formatted_results.append({
-                "id": results['ids'][0][i],
+                "id": span["id"],
                 "data": {
-                    "content": doc,
+                    "content": span["content"],
                     "filename": metadata.get("filename", "unknown"),
-                    "chunk_index": i,  # Use the current index instead of metadata
-                    "total_chunks": len(results['documents'][0]),
+                    "chunk_index": span["chunk_start"],
+                    "chunk_end": span["chunk_end"],
+                    "total_chunks": metadata.get("total_chunks"),
                     "type": metadata.get("type", "document"),
-                    "relevance_score": similarity_score
+                    # Best dense similarity of the span's chunks (None if only lexical matches were selected)
+                    "relevance_score": span["similarity"],
+                    # Fused rank score relative to the best hit, for ordering only
+                    "rank_score": span["score"] / top_score
                 }
             })
 
-        # Sort by similarity score instead of chunk index
-        formatted_results.sort(key=lambda x: x["data"]["relevance_score"], reverse=True)
-        
-        logger.info(f"Returning {len(formatted_results)} chunks sorted by relevance")
+        logger.info(f"Returning {len(formatted_results)} spans from {len(results)} chunks in document order")
         
         # Log the metadata structure for debugging
         if formatted_results:
-            logger.info(f"Sample metadata structure: {results['metadatas'][0][0]}")
+            logger.info(f"Sample metadata structure: {results[0]['metadata']}")
         
         return formatted_results
 
@@ -218,6 +235,11 @@ web_search_tool = [
                     "query": {
                         "type": "string",
                         "description": "The query to search the internet with.",
+                    },
+                    "queries": {
+                        "type": "array",
+                        "description": "Optional alternative phrasings or sub-questions of the query, searched in parallel for broader coverage of complex questions.",
+                        "items": {"type": "string"}
                     }
                 },
                 "required": ["query"],
@@ -79,7 +79,7 @@ class SearchAgent(BaseAgent):
         ]
         
         try:
-            response = await chat_model.generate_response(context_messages)
+            response = await chat_model.generate_response(context_messages, use_cache=True, call_site="analyze_tool_calls")
             
         except Exception as e:
             logger.error(f"Error extracting key info: {e}")
@@ -118,7 +118,8 @@ class SearchAgent(BaseAgent):
 
         response_stream = await chat_model.generate_streaming_response(
             messages=self.messages,
-            tools=self.tools
+            tools=self.tools,
+            call_site=f"{self.name}.final_response"
         )
 
         return response_stream
\ No newline at end of file
@@ -6,14 +6,15 @@ import json
 import asyncio
 from fastapi import BackgroundTasks
 from fastapi.responses import StreamingResponse
-from db import store_conversation
+from conversation_writer import conversation_writer
 from utils.profiling import profile
 from typing import AsyncGenerator
 
 TIMEOUT = 90.0
 
 @profile
-async def triage_agent(user_message: str, chat_history: list, background_tasks: BackgroundTasks) -> AsyncGenerator[bytes, None]:
+async def triage_agent(user_message: str, chat_history: list, background_tasks: BackgroundTasks,
+                       thread_id: str = None) -> AsyncGenerator[bytes, None]:
     full_response = ""
     cited_response = None
     citations = []
@@ -55,7 +56,7 @@ async def triage_agent(user_message: str, chat_history: list, background_tasks:
             try:
                 logger.info("Calling chat_model.generate_response_with_tools")
                 
-                response = await chat_model.generate_response_with_tools(messages, tools)
+                response = await chat_model.generate_response_with_tools(messages, tools, call_site="triage_agent.route")
                 
             except asyncio.TimeoutError:
                 log_structured("ERROR", "Triage agent initial response timed out", {"user_message": user_message})
@@ -154,9 +155,9 @@ async def triage_agent(user_message: str, chat_history: list, background_tasks:
             log_structured("ERROR", "Unexpected error in triage_agent", {"error": str(e)})
             yield f"An unexpected error occurred in triage_agent: {str(e)}".encode('utf-8')
 
-    def update_chat_history():
+    async def update_chat_history():
         try:
-            store_conversation(user_message, full_response)
+            await conversation_writer.enqueue(user_message, full_response, thread_id)
         except Exception as e:
             logger.error(f"Error in update_chat_history: {str(e)}")
 
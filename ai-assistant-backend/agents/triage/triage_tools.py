@@ -1,16 +1,36 @@
 
-from agents.calendar.calendar_agent import calendar_agent
-from agents.tutor.tutor_agent import tutor_agent
-from agents.code.code_agent import code_agent
-from agents.cohere_search.web_search_agent import cohere_web_search_agent as search_agent
+import importlib
 
-functions_map = {
-    "calendar_agent": calendar_agent,
-    "tutor_agent": tutor_agent,
-    "search_agent": search_agent,
-    "code_agent": code_agent,
+# Tool name -> (module, function). Agent modules are imported on their first call (or by the
+# startup warm-up), so importing the triage agent does not load every agent and its clients.
+AGENT_MODULES = {
+    "calendar_agent": ("agents.calendar.calendar_agent", "calendar_agent"),
+    "tutor_agent": ("agents.tutor.tutor_agent", "tutor_agent"),
+    "search_agent": ("agents.cohere_search.web_search_agent", "cohere_web_search_agent"),
+    "code_agent": ("agents.code.code_agent", "code_agent"),
 }
 
+
+def load_agent(name: str):
+    module, function = AGENT_MODULES[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def load_agents() -> None:
+    """Import every agent module ahead of the first request."""
+    for name in AGENT_MODULES:
+        load_agent(name)
+
+
+def _lazy_agent(name: str):
+    async def run(**kwargs):
+        return await load_agent(name)(**kwargs)
+    run.__name__ = name
+    return run
+
+
+functions_map = {name: _lazy_agent(name) for name in AGENT_MODULES}
+
 tools = [
     {
         "type": "function",
@@ -142,7 +142,10 @@ class ChatProcessor:
         ]
         
         try:
-            response = await asyncio.wait_for(chat_model.generate_response(messages), timeout=timeout)
+            response = await asyncio.wait_for(
+                chat_model.generate_response(messages, use_cache=True, call_site="extract_key_info"),
+                timeout=timeout
+            )
         except asyncio.TimeoutError:
             logger.error(f"Timeout error: extract_key_info took longer than {timeout} seconds")
             return "Error: Request timed out while extracting key info"
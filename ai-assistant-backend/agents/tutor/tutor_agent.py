@@ -69,7 +69,7 @@ class TutorAgent(SearchAgent):
         """
         Generate tool calls based on the messages and generate the final response.
         """
-        response = await chat_model.generate_response_with_tools(self.messages, self.tools)
+        response = await chat_model.generate_response_with_tools(self.messages, self.tools, call_site=f"{self.name}.tool_calls")
 
         self.messages.append(
                 {
@@ -106,7 +106,8 @@ class TutorAgent(SearchAgent):
 
             response_stream = await chat_model.generate_streaming_response(
                 messages=self.messages,
-                tools=self.tools
+                tools=self.tools,
+                call_site=f"{self.name}.final_response"
             )
 
         else:
@@ -117,7 +118,8 @@ class TutorAgent(SearchAgent):
 
             response_stream = await chat_model.generate_streaming_response(
                 messages=self.messages,
-                tools=None
+                tools=None,
+                call_site=f"{self.name}.final_response"
             )
 
         return response_stream
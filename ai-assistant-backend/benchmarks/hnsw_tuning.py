@@ -0,0 +1,149 @@
+"""
+Recall / latency / memory benchmark for Chroma HNSW settings.
+
+Loads a synthetic clustered corpus of unit vectors into a fresh persistent collection for
+every combination in the parameter grid, then reports recall@k against brute-force search,
+query latency percentiles, insert throughput and index size. Use the results to set
+Config.HNSW_COLLECTIONS / HNSW_<COLLECTION>_<FIELD>.
+
+Usage:
+    python benchmarks/hnsw_tuning.py
+    python benchmarks/hnsw_tuning.py --vectors 50000 --dim 1024 --m 16,32 --construction-ef 100,200 --search-ef 10,50,100
+    python benchmarks/hnsw_tuning.py --space cosine,l2 --csv hnsw_results.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from index_config import collection_metadata  # noqa: E402
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+def str_list(value: str):
+    return [v.strip() for v in value.split(",")]
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p * 100)) if len(values) else 0.0
+
+
+def synthetic_corpus(vectors: int, queries: int, dim: int, clusters: int, seed: int):
+    """Unit vectors drawn around random cluster centres, which is closer to text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        points = centres[rng.integers(0, clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(vectors), sample(queries)
+
+
+def brute_force(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k neighbour indices. On unit vectors l2, cosine and ip give the same order."""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def directory_size(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def run_config(corpus, queries, truth, k, insert_batch, hnsw):
+    import chromadb
+    from chromadb.config import Settings
+
+    path = tempfile.mkdtemp(prefix="hnsw_tuning_")
+    try:
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        collection = client.create_collection(name="hnsw_tuning", metadata=collection_metadata(hnsw))
+        ids = [str(i) for i in range(len(corpus))]
+
+        insert_times = []
+        for start in range(0, len(corpus), insert_batch):
+            batch = corpus[start:start + insert_batch]
+            started_at = time.perf_counter()
+            collection.add(ids=ids[start:start + insert_batch], embeddings=batch.tolist())
+            insert_times.append(time.perf_counter() - started_at)
+
+        query_times, recalls = [], []
+        for query, expected in zip(queries, truth):
+            started_at = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            query_times.append(time.perf_counter() - started_at)
+            found = {int(i) for i in result["ids"][0]}
+            recalls.append(len(found.intersection(expected.tolist())) / k)
+
+        return {
+            **hnsw,
+            "recall": float(np.mean(recalls)),
+            "query_p50_ms": percentile(query_times, 0.5) * 1000,
+            "query_p95_ms": percentile(query_times, 0.95) * 1000,
+            "insert_per_vector_us": sum(insert_times) / len(corpus) * 1e6,
+            "insert_batch_p95_ms": percentile(insert_times, 0.95) * 1000,
+            "disk_mb": directory_size(path) / 1e6,
+            # Vectors plus level-0 links; upper layers add roughly 1/M more
+            "est_memory_mb": len(corpus) * (corpus.shape[1] * 4 + hnsw["M"] * 2 * 4) / 1e6,
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main(args) -> None:
+    corpus, queries = synthetic_corpus(args.vectors, args.queries, args.dim, args.clusters, args.seed)
+    truth = brute_force(corpus, queries, args.k)
+    print(f"corpus={args.vectors}x{args.dim} queries={args.queries} k={args.k}")
+
+    grid = itertools.product(args.space, args.m, args.construction_ef, args.search_ef, args.batch_size, args.sync_threshold)
+    rows = []
+    for space, m, construction_ef, search_ef, batch_size, sync_threshold in grid:
+        hnsw = {"space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                "batch_size": batch_size, "sync_threshold": sync_threshold}
+        row = run_config(corpus, queries, truth, args.k, args.insert_batch, hnsw)
+        rows.append(row)
+        print(f"space={space} M={m} construction_ef={construction_ef} search_ef={search_ef} "
+              f"batch_size={batch_size} sync_threshold={sync_threshold}: "
+              f"recall@{args.k}={row['recall']:.3f} query p50={row['query_p50_ms']:.2f}ms p95={row['query_p95_ms']:.2f}ms "
+              f"insert={row['insert_per_vector_us']:.1f}us/vector disk={row['disk_mb']:.1f}MB "
+              f"est_memory={row['est_memory_mb']:.1f}MB")
+
+    if args.csv and rows:
+        with open(args.csv, "w", newline="") as handle:
+            writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {os.path.abspath(args.csv)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune Chroma HNSW parameters")
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--insert-batch", type=int, default=500, help="Vectors per add() call")
+    parser.add_argument("--space", type=str_list, default=["l2"])
+    parser.add_argument("--m", type=int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int_list, default=[100, 200])
+    parser.add_argument("--search-ef", type=int_list, default=[10, 50, 100])
+    parser.add_argument("--batch-size", type=int_list, default=[100])
+    parser.add_argument("--sync-threshold", type=int_list, default=[1000])
+    parser.add_argument("--csv", default=None, help="Also write the results to this CSV file")
+    main(parser.parse_args())
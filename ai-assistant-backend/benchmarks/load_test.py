@@ -0,0 +1,94 @@
+"""
+Load test for the chat pipeline against the fake provider.
+
+Runs concurrent /api/chat/ requests either in-process (default, no server needed) or
+against a running server with --url, and reports throughput, time to first chunk and
+total latency percentiles. The in-process transport buffers response bodies, so use
+--url against a running server when time to first chunk matters.
+
+Usage:
+    python benchmarks/load_test.py --requests 200 --concurrency 20
+    PROVIDER_MODE=fake uvicorn main:app & python benchmarks/load_test.py --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+QUERIES = [
+    "What are the latest developments in AI?",
+    "What's on my calendar tomorrow?",
+    "Can you write a python function to merge two sorted lists?",
+    "Explain how photosynthesis works",
+    "Can you teach me the basics of linear algebra?",
+    "What is prompt engineering for agents?",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run_one(client, query: str, ttfts: list, totals: list, errors: list) -> None:
+    start = time.perf_counter()
+    first_chunk = None
+    try:
+        async with client.stream("POST", "/api/chat/", json={"messages": [{"role": "user", "content": query}]}) as response:
+            async for _ in response.aiter_bytes():
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                return
+    except Exception as e:
+        errors.append(str(e))
+        return
+    end = time.perf_counter()
+    ttfts.append((first_chunk or end) - start)
+    totals.append(end - start)
+
+
+async def main(args) -> None:
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        os.environ.setdefault("PROVIDER_MODE", "fake")
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=120)
+
+    ttfts, totals, errors = [], [], []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(i: int) -> None:
+        async with semaphore:
+            await run_one(client, QUERIES[i % len(QUERIES)], ttfts, totals, errors)
+
+    async with client:
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    print(f"requests={args.requests} concurrency={args.concurrency} errors={len(errors)} elapsed={elapsed:.2f}s")
+    print(f"throughput={len(totals) / elapsed:.2f} req/s")
+    for name, values in (("time_to_first_chunk", ttfts), ("total", totals)):
+        if values:
+            print(f"{name}: mean={statistics.mean(values):.3f}s p50={percentile(values, 0.5):.3f}s "
+                  f"p95={percentile(values, 0.95):.3f}s p99={percentile(values, 0.99):.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the chat pipeline")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--url", default=None, help="Target a running server instead of the in-process app")
+    asyncio.run(main(parser.parse_args()))
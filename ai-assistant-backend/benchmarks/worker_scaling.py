@@ -0,0 +1,153 @@
+"""
+Throughput scaling of the multi-worker server (serve.py) with the number of worker processes.
+
+Starts one Chroma server and a shared state directory in a temporary location, then for each
+worker count launches serve.py against them with the fake provider, drives /api/chat/ with
+concurrent requests and reports throughput, latency percentiles and scaling efficiency
+relative to one worker. Fake provider latencies are scaled down (--latency-scale) so the
+run is bound by the server's own CPU work rather than simulated upstream waits; throughput
+can only scale up to the number of cores available.
+
+Usage:
+    python benchmarks/worker_scaling.py
+    python benchmarks/worker_scaling.py --workers 1,2,4,8 --requests 800 --concurrency 64
+    python benchmarks/worker_scaling.py --latency-scale 1.0   # realistic upstream latencies
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import QUERIES, percentile, run_one  # noqa: E402
+
+READY_TIMEOUT = 120  # seconds for all workers to start
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(workdir: str, chroma_port: int, latency_scale: float) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PROVIDER_MODE": "fake",
+        "FAKE_ERROR_RATE": "0",
+        "FAKE_TOKENS_PER_SECOND": str(60 / latency_scale if latency_scale > 0 else 1e9),
+        "CHROMA_MODE": "http",
+        "CHROMA_HOST": "127.0.0.1",
+        "CHROMA_PORT": str(chroma_port),
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma"),
+        "SHARED_STATE_BACKEND": "sqlite",
+        "SHARED_STATE_DIR": os.path.join(workdir, "shared_state"),
+        "CORPUS_INGEST_ON_STARTUP": "False",
+        "FETCH_CACHE_DIR": os.path.join(workdir, "fetch_cache"),
+    })
+    from config.config import Config
+    for endpoint, latency in Config.FAKE_LATENCY.items():
+        env[f"FAKE_LATENCY_{endpoint.upper()}_MEDIAN"] = str(latency["median"] * latency_scale)
+    return env
+
+
+def wait_until_ready(url: str, process: subprocess.Popen) -> None:
+    import httpx
+
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server did not start within {READY_TIMEOUT}s")
+
+
+async def drive(url: str, requests: int, concurrency: int):
+    import httpx
+
+    ttfts, totals, errors = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        async def bounded(i: int) -> None:
+            async with semaphore:
+                await run_one(client, QUERIES[i % len(QUERIES)], ttfts, totals, errors)
+
+        # Warm up every worker (lazy imports, client setup) before measuring
+        await asyncio.gather(*(bounded(i) for i in range(concurrency)))
+        for values in (ttfts, totals, errors):
+            values.clear()
+        started_at = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started_at
+    return elapsed, ttfts, totals, errors
+
+
+def run_workers(workers: int, env: dict, args):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url, process)
+        return asyncio.run(drive(url, args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def main(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="worker_scaling_")
+    chroma_port = free_port()
+    # Set before the config is first imported, so the Chroma server started here uses them too
+    os.environ.update(CHROMA_HOST="127.0.0.1", CHROMA_PORT=str(chroma_port), CHROMA_DB_PATH=os.path.join(workdir, "chroma"))
+    env = server_env(workdir, chroma_port, args.latency_scale)
+    from serve import start_chroma_server
+
+    print(f"cores={os.cpu_count()} requests={args.requests} concurrency={args.concurrency} latency_scale={args.latency_scale}")
+    chroma = start_chroma_server()
+    try:
+        baseline = None
+        for workers in args.workers:
+            elapsed, ttfts, totals, errors = run_workers(workers, env, args)
+            throughput = len(totals) / elapsed if elapsed else 0.0
+            baseline = baseline or throughput
+            efficiency = throughput / (baseline * workers) if baseline else 0.0
+            print(f"workers={workers}: {throughput:.1f} req/s (x{throughput / baseline:.2f}, efficiency {efficiency:.0%}) "
+                  f"latency p50={percentile(totals, 0.5) * 1000:.0f}ms p95={percentile(totals, 0.95) * 1000:.0f}ms "
+                  f"ttfc p50={percentile(ttfts, 0.5) * 1000:.0f}ms errors={len(errors)}")
+    finally:
+        chroma.terminate()
+        chroma.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput against the number of server workers")
+    parser.add_argument("--workers", type=int_list, default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="Multiplier for the fake provider latencies (0 removes them)")
+    main(parser.parse_args())
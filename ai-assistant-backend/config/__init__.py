@@ -1 +1 @@
-from .config import Config, cohere_client, tavily_search, tavily_client
\ No newline at end of file
+from .config import Config, cohere_client, tavily_search, tavily_client, tavily_async_client
\ No newline at end of file
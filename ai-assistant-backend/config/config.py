@@ -1,8 +1,6 @@
 import os
-import cohere
 from dotenv import load_dotenv
-from langchain_community.tools.tavily_search import TavilySearchResults
-from tavily import TavilyClient
+from utils.lazy import LazyObject
 
 # Load environment variables
 load_dotenv()
@@ -17,34 +15,317 @@ class Config:
     COHERE_MODEL = 'command-r-plus-08-2024'
     EMBED_MODEL = 'embed-english-v2.0'
     RERANK_MODEL = 'rerank-multilingual-v3.0'
+    # Rerank stage: token budget and depth bounds for candidates sent to the remote reranker
+    RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", "8000"))
+    RERANK_MIN_DEPTH = int(os.getenv("RERANK_MIN_DEPTH", "5"))
+    RERANK_MAX_DEPTH = int(os.getenv("RERANK_MAX_DEPTH", "40"))
     CLASSIFY_MODEL = 'embed-english-v2.0'
+    # Neighbours consulted by the local kNN classifier
+    CLASSIFY_K = int(os.getenv("CLASSIFY_K", "7"))
+
+    # Upstream governance: default concurrency / rate limits per provider endpoint.
+    # Each value can be overridden with UPSTREAM_<PROVIDER>_<ENDPOINT>_<FIELD>, e.g. UPSTREAM_COHERE_CHAT_RATE=5
+    UPSTREAM_LIMITS = {
+        "cohere": {
+            "chat": {"concurrency": 8, "rate": 8.0, "burst": 8},
+            "embed": {"concurrency": 4, "rate": 16.0, "burst": 16},
+            "rerank": {"concurrency": 4, "rate": 8.0, "burst": 8},
+            "classify": {"concurrency": 4, "rate": 8.0, "burst": 8},
+        },
+        "tavily": {
+            "search": {"concurrency": 4, "rate": 2.0, "burst": 4},
+        },
+        "google": {
+            "calendar": {"concurrency": 4, "rate": 5.0, "burst": 10},
+        },
+    }
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+    UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+    UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8.0"))
+
+    @classmethod
+    def upstream_limit(cls, provider: str, endpoint: str) -> dict:
+        """Return the concurrency/rate/burst limits for a provider endpoint, applying env overrides."""
+        limits = dict(cls.UPSTREAM_LIMITS.get(provider, {}).get(endpoint, {"concurrency": 4, "rate": 4.0, "burst": 4}))
+        for field, cast in (("concurrency", int), ("rate", float), ("burst", int)):
+            override = os.getenv(f"UPSTREAM_{provider.upper()}_{endpoint.upper()}_{field.upper()}")
+            if override:
+                limits[field] = cast(override)
+        # Limits apply to the provider account, so each server worker gets an equal share
+        workers = max(1, cls.SERVER_WORKERS)
+        if workers > 1:
+            limits = {
+                "concurrency": max(1, limits["concurrency"] // workers),
+                "rate": limits["rate"] / workers,
+                "burst": max(1, limits["burst"] // workers),
+            }
+        return limits
+
+    # Request hedging for idempotent, non-streaming upstream calls
+    HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "False") == "True"
+    HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))  # max fraction of extra requests
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+    # Response cache for deterministic internal LLM calls
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True") == "True"
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+
+    # Web search result cache. TTL depends on how time sensitive the query is; stale entries
+    # are served for up to SEARCH_CACHE_STALE_TTL seconds while a background refresh runs.
+    SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "True") == "True"
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+    SEARCH_CACHE_TTL_TIME_SENSITIVE = float(os.getenv("SEARCH_CACHE_TTL_TIME_SENSITIVE", "600"))
+    SEARCH_CACHE_TTL_TIMELESS = float(os.getenv("SEARCH_CACHE_TTL_TIMELESS", "86400"))
+    SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "300"))
+    SEARCH_CACHE_TIME_SENSITIVE_THRESHOLD = float(os.getenv("SEARCH_CACHE_TIME_SENSITIVE_THRESHOLD", "0.5"))
+
+    # Embeddings cache, keyed by model, input type and text. Embeddings never change, so by default
+    # entries do not expire (a TTL of 0) and are only evicted by the size bound.
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True") == "True"
+    EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "0"))
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+
+    # Google Calendar events cache, per day (or month). Cleared when an event is created, edited or deleted.
+    CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "900"))
+    CALENDAR_CACHE_MAX_ENTRIES = int(os.getenv("CALENDAR_CACHE_MAX_ENTRIES", "100"))
+
+    # Multi-query web search fan-out
+    SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", "4"))
+    SEARCH_FANOUT_CONCURRENCY = int(os.getenv("SEARCH_FANOUT_CONCURRENCY", "4"))
+    SEARCH_RESULTS_PER_QUERY = int(os.getenv("SEARCH_RESULTS_PER_QUERY", "10"))
+
+    # Curated corpus served by vector_search, indexed once at startup and refreshed incrementally
+    CORPUS_SOURCES = [url.strip() for url in os.getenv("CORPUS_SOURCES", ",".join([
+        "https://lilianweng.github.io/posts/2023-06-23-agent/",
+        "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
+        "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
+    ])).split(",") if url.strip()]
+    CORPUS_COLLECTION = os.getenv("CORPUS_COLLECTION", "curated_corpus")
+    CORPUS_INGEST_ON_STARTUP = os.getenv("CORPUS_INGEST_ON_STARTUP", "True") == "True"
+    CORPUS_CHUNK_SIZE = int(os.getenv("CORPUS_CHUNK_SIZE", "512"))
+
+    # Hybrid retrieval: BM25 and dense rankings fused with reciprocal rank fusion
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per ranking, before fusion
+
+    # Production server (serve.py): SERVER_WORKERS processes with uvloop and httptools. More than one
+    # worker requires CHROMA_MODE=http, SHARED_STATE_BACKEND=sqlite and no numpy vector stores.
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    # ChromaDB: "embedded" opens the data directory in this process, "http" connects to a Chroma server
+    # (e.g. `chroma run --path ./agent_conversation_data --port 8001`, or serve.py --chroma-server)
+    CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded")
+    CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./agent_conversation_data")  # also holds the SQLite sidecar indexes
+    CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+    CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+    # Caches and cross-request state (query cache generations, thread turn counters, background job
+    # leadership): "memory" keeps them per process, "sqlite" shares them between the workers on a host
+    SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory")
+    SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "./shared_state")
+    # Per-process metric files that /metrics aggregates when there is more than one worker (set by serve.py)
+    PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+    # Dedicated thread pool for blocking Chroma / SQLite I/O
+    CHROMA_MAX_WORKERS = int(os.getenv("CHROMA_MAX_WORKERS", "4"))
+
+    # Vector store backend per collection: "chroma" (HNSW) or "numpy" (memory-mapped arrays with
+    # exact search, for collections under ~100k vectors). Override per collection with
+    # VECTOR_STORE_<COLLECTION>, e.g. VECTOR_STORE_DOCUMENTS_COLLECTION=numpy
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+    NUMPY_STORE_DTYPE = os.getenv("NUMPY_STORE_DTYPE", "float32")  # or int8, a quarter of the size
+    NUMPY_STORE_SPACE = os.getenv("NUMPY_STORE_SPACE", "cosine")
+
+    @classmethod
+    def vector_store_backend(cls, collection: str) -> str:
+        name = "".join(c if c.isalnum() else "_" for c in collection).upper()
+        return os.getenv(f"VECTOR_STORE_{name}", cls.VECTOR_STORE_BACKEND)
+
+    # Tenant partitioning: with TENANCY_ENABLED, conversations and uploaded files are stored in a
+    # collection per tenant, identified by TENANT_HEADER (set by the authenticating proxy).
+    # Requests without the header, and all data from before tenancy, use the default tenant.
+    # Trust assumption: the backend does no authentication itself, so the header is only honored on
+    # requests that also carry TENANT_PROXY_SECRET in TENANT_PROXY_SECRET_HEADER. The proxy must
+    # authenticate the user, set both headers and drop any copies sent by the client; every other
+    # request (except /metrics) is rejected. Tenancy cannot be enabled without a secret.
+    TENANCY_ENABLED = os.getenv("TENANCY_ENABLED", "False") == "True"
+    TENANT_HEADER = os.getenv("TENANT_HEADER", "X-User-ID")
+    TENANT_PROXY_SECRET = os.getenv("TENANT_PROXY_SECRET", "")
+    TENANT_PROXY_SECRET_HEADER = os.getenv("TENANT_PROXY_SECRET_HEADER", "X-Tenant-Proxy-Secret")
+    TENANT_MAX_OPEN_PARTITIONS = int(os.getenv("TENANT_MAX_OPEN_PARTITIONS", "64"))  # per collection
+    TENANT_PARTITION_IDLE_SECONDS = float(os.getenv("TENANT_PARTITION_IDLE_SECONDS", "600"))
+    CHROMA_MEMORY_LIMIT_BYTES = int(os.getenv("CHROMA_MEMORY_LIMIT_BYTES", "0"))  # 0 keeps every loaded index in memory
+
+    # HNSW index configuration per Chroma collection, applied when the collection is created.
+    # Each value can be overridden with HNSW_<COLLECTION>_<FIELD>, e.g. HNSW_DOCUMENTS_COLLECTION_SEARCH_EF=50.
+    # Use benchmarks/hnsw_tuning.py to pick values.
+    HNSW_DEFAULTS = {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10, "batch_size": 100, "sync_threshold": 1000}
+    HNSW_COLLECTIONS = {
+        "agent_conversations": {},
+        "documents_collection": {},
+        "curated_corpus": {},
+    }
+
+    @classmethod
+    def hnsw_config(cls, collection: str) -> dict:
+        """Return the HNSW settings for a collection, applying env overrides."""
+        config = dict(cls.HNSW_DEFAULTS, **cls.HNSW_COLLECTIONS.get(collection, {}))
+        prefix = "HNSW_" + "".join(c if c.isalnum() else "_" for c in collection).upper()
+        for field in config:
+            override = os.getenv(f"{prefix}_{field.upper()}")
+            if override:
+                config[field] = override if field == "space" else int(override)
+        return config
+
+    # Chroma query-result cache, invalidated by per-collection generation counters
+    QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "True") == "True"
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+
+    # Write-behind conversation storage: turns are journaled locally and stored in batches
+    CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "32"))
+    CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "2.0"))  # seconds
+    CONVERSATION_JOURNAL_FSYNC = os.getenv("CONVERSATION_JOURNAL_FSYNC", "True") == "True"
+    # Characters of the answer summary embedded with each turn; full text lives in the thread store
+    CONVERSATION_SUMMARY_CHARS = int(os.getenv("CONVERSATION_SUMMARY_CHARS", "300"))
+
+    # Conversation retention: turns older than RETENTION_MAX_AGE_DAYS (unless retrieved at least
+    # RETENTION_MIN_HITS times) or beyond the newest RETENTION_MAX_TURNS_PER_THREAD of their thread
+    # are archived to gzip JSONL, folded into a per-thread summary and removed from the index.
+    # Setting a policy to 0 disables it.
+    RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "False") == "True"
+    RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))  # seconds between runs
+    RETENTION_MAX_AGE_DAYS = int(os.getenv("RETENTION_MAX_AGE_DAYS", "90"))
+    RETENTION_MIN_HITS = int(os.getenv("RETENTION_MIN_HITS", "3"))
+    RETENTION_MAX_TURNS_PER_THREAD = int(os.getenv("RETENTION_MAX_TURNS_PER_THREAD", "50"))
+    RETENTION_MAX_PER_RUN = int(os.getenv("RETENTION_MAX_PER_RUN", "1000"))
+    RETENTION_DELETE_BATCH = int(os.getenv("RETENTION_DELETE_BATCH", "200"))
+    RETENTION_IDLE_SECONDS = float(os.getenv("RETENTION_IDLE_SECONDS", "5"))  # quiet period before each batch
+    RETENTION_MAX_DEFER = float(os.getenv("RETENTION_MAX_DEFER", "600"))  # proceed anyway after waiting this long
+    RETENTION_SUMMARY_CHARS = int(os.getenv("RETENTION_SUMMARY_CHARS", "1500"))
+    RETENTION_PROBE_QUERIES = int(os.getenv("RETENTION_PROBE_QUERIES", "20"))
+    RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "./conversation_archive")
+
+    # file_search context selection: hybrid candidates, MMR picks (FILE_SEARCH_N_RESULTS), then
+    # adjacent chunks are merged and packed into the token budget
+    FILE_SEARCH_CANDIDATES = int(os.getenv("FILE_SEARCH_CANDIDATES", "20"))
+    FILE_SEARCH_N_RESULTS = int(os.getenv("FILE_SEARCH_N_RESULTS", "8"))
+    FILE_SEARCH_MMR_LAMBDA = float(os.getenv("FILE_SEARCH_MMR_LAMBDA", "0.7"))
+    FILE_SEARCH_TOKEN_BUDGET = int(os.getenv("FILE_SEARCH_TOKEN_BUDGET", "3000"))
+
+    # Async web page fetcher with an on-disk cache of extracted text
+    FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "./fetch_cache")
+    FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+    FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "20"))
+    FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "2"))
+    FETCH_FRESH_TTL = float(os.getenv("FETCH_FRESH_TTL", "3600"))
+    FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+
+    # Expand the top reranked web search snippets into full-page context
+    SEARCH_EXPAND_ENABLED = os.getenv("SEARCH_EXPAND_ENABLED", "True") == "True"
+    SEARCH_EXPAND_MIN_SCORE = float(os.getenv("SEARCH_EXPAND_MIN_SCORE", "0.9"))
+    SEARCH_EXPAND_TOP_K = int(os.getenv("SEARCH_EXPAND_TOP_K", "3"))
+    SEARCH_EXPAND_MAX_CHARS = int(os.getenv("SEARCH_EXPAND_MAX_CHARS", "4000"))
+
+    # Startup: "eager" initializes clients, Chroma, NLTK data and agent modules concurrently during
+    # lifespan startup; "lazy" defers each until its first use, for the fastest possible boot
+    STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+
+    # Provider mode: "live" talks to Cohere/Tavily, "fake" uses the deterministic local stand-ins
+    PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live")
+    FAKE_PROVIDER_SEED = int(os.getenv("FAKE_PROVIDER_SEED", "42"))
+    FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0.0"))
+    FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", "60"))
+    FAKE_OUTPUT_TOKENS = int(os.getenv("FAKE_OUTPUT_TOKENS", "120"))
+    FAKE_EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "1024"))
+    # Log-normal latency (median seconds, sigma) per fake endpoint; override with FAKE_LATENCY_<ENDPOINT>_MEDIAN / _SIGMA
+    FAKE_LATENCY = {
+        "chat": {"median": 1.2, "sigma": 0.4},
+        "chat_stream": {"median": 0.6, "sigma": 0.4},  # time to first token
+        "embed": {"median": 0.15, "sigma": 0.3},
+        "rerank": {"median": 0.25, "sigma": 0.3},
+        "classify": {"median": 0.2, "sigma": 0.3},
+        "search": {"median": 1.5, "sigma": 0.5},
+        "fetch": {"median": 0.4, "sigma": 0.5},
+        "calendar": {"median": 0.2, "sigma": 0.3},
+    }
+
+    @classmethod
+    def fake_latency(cls, endpoint: str) -> dict:
+        """Return the latency distribution for a fake provider endpoint, applying env overrides."""
+        latency = dict(cls.FAKE_LATENCY.get(endpoint, {"median": 0.1, "sigma": 0.2}))
+        for field in ("median", "sigma"):
+            override = os.getenv(f"FAKE_LATENCY_{endpoint.upper()}_{field.upper()}")
+            if override:
+                latency[field] = float(override)
+        return latency
 
     # Initialize Cohere client
     @classmethod
     def init_cohere_sync_client(cls):
+        if cls.PROVIDER_MODE == "fake":
+            from config.fake_provider import FakeCohereClient
+            return FakeCohereClient()
+        import cohere
         return cohere.ClientV2(cls.COHERE_API_KEY)
 
     @classmethod
     def init_cohere_client(cls):
+        if cls.PROVIDER_MODE == "fake":
+            from config.fake_provider import FakeAsyncCohereClient
+            return FakeAsyncCohereClient()
+        import cohere
         return cohere.AsyncClientV2(cls.COHERE_API_KEY)
 
     @classmethod
     def init_tavily_search(cls):
+        if cls.PROVIDER_MODE == "fake":
+            return None
+        from langchain_community.tools.tavily_search import TavilySearchResults
         return TavilySearchResults(max_results=8)
     
     @classmethod
     def init_cohere_tavily_search(cls):
+        if cls.PROVIDER_MODE == "fake":
+            from config.fake_provider import FakeTavilyClient
+            return FakeTavilyClient()
+        from tavily import TavilyClient
         return TavilyClient(api_key=cls.TAVILY_API_KEY)
+
+    @classmethod
+    def init_tavily_async_client(cls):
+        if cls.PROVIDER_MODE == "fake":
+            from config.fake_provider import FakeAsyncTavilyClient
+            return FakeAsyncTavilyClient()
+        from tavily import AsyncTavilyClient
+        return AsyncTavilyClient(api_key=cls.TAVILY_API_KEY)
+
+    @classmethod
+    def init_fetch_transport(cls):
+        """Transport for the web fetcher's HTTP client; None uses the network."""
+        if cls.PROVIDER_MODE == "fake":
+            from config.fake_provider import FakeWebTransport
+            return FakeWebTransport()
+        return None
         
 
-# Create instances of the Cohere client
-cohere_client = Config.init_cohere_client()
+# Create instances of the Cohere client; clients (and their SDK imports) are created on first use
+cohere_client = LazyObject(Config.init_cohere_client, "cohere_client")
 
-cohere_sync_client = Config.init_cohere_sync_client()
+cohere_sync_client = LazyObject(Config.init_cohere_sync_client, "cohere_sync_client")
 
 # Create Tavily search instance
-tavily_search = Config.init_tavily_search()
+tavily_search = LazyObject(Config.init_tavily_search, "tavily_search")
+
+tavily_client = LazyObject(Config.init_cohere_tavily_search, "tavily_client")
+
+tavily_async_client = LazyObject(Config.init_tavily_async_client, "tavily_async_client")
+
 
-tavily_client = Config.init_cohere_tavily_search()
+def warm_up_clients() -> None:
+    """Create the provider clients ahead of the first request."""
+    for lazy_client in (cohere_client, cohere_sync_client, tavily_async_client):
+        lazy_client.resolve()
 
-__all__ = ['cohere_client', 'cohere_sync_client', 'tavily_search', 'tavily_client', Config]
\ No newline at end of file
+__all__ = ['cohere_client', 'cohere_sync_client', 'tavily_search', 'tavily_client', 'tavily_async_client', 'warm_up_clients', Config]
\ No newline at end of file
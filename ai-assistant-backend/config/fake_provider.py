@@ -0,0 +1,514 @@
+"""
+Deterministic local stand-ins for the Cohere, Tavily and Google Calendar clients and
+for the web pages fetched when search snippets are expanded.
+
+Enabled with PROVIDER_MODE=fake. Only the subset of the APIs used by the backend is
+implemented. Response content is a pure function of the request, while latencies,
+token rates and error rates follow the distributions configured in Config, so the
+pipeline can be load tested offline without spending API quota.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import cohere
+import httpx
+from config.config import Config
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_FILLER_WORDS = (
+    "the", "result", "shows", "that", "this", "approach", "works", "because", "each", "step",
+    "builds", "on", "previous", "context", "and", "keeps", "answer", "clear", "for", "user",
+    "information", "relevant", "sources", "indicate", "key", "point", "is", "summary", "with",
+    "details", "about", "topic", "in", "practice", "overall", "consider", "example", "data",
+)
+
+# Keyword hints that make tool selection deterministic and plausible for the triage router
+_TOOL_HINTS = {
+    "calendar": ("calendar", "schedule", "meeting", "appointment", "event", "events", "tomorrow", "today", "busy", "free"),
+    "tutor": ("teach", "tutor", "lesson", "learn", "understand", "review", "step", "explain"),
+    "code": ("code", "function", "bug", "debug", "python", "javascript", "program", "compile", "class", "script"),
+    "file": ("file", "files", "uploaded", "pdf", "document", "docx"),
+    "vector": ("agent", "agents", "prompt", "engineering", "adversarial", "attack", "attacks"),
+    "search": ("what", "who", "when", "where", "why", "how", "latest", "news", "search", "find"),
+    "get": ("what", "show", "list", "on", "have", "any"),
+    "create": ("create", "add", "book", "new", "set"),
+    "edit": ("edit", "change", "move", "update", "reschedule", "rename"),
+    "delete": ("delete", "remove", "cancel", "clear"),
+}
+
+
+class FakeProviderError(Exception):
+    """Injected upstream failure carrying an HTTP status code like the real SDK errors."""
+
+    def __init__(self, status_code: int, message: str = "Injected fake provider error"):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _digest(*parts: Any) -> int:
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return int(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _message_text(message: Any) -> str:
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(json.dumps(item, default=str) if not isinstance(item, str) else item for item in content)
+    return ""
+
+
+def _message_role(message: Any) -> str:
+    return message.get("role", "") if isinstance(message, dict) else getattr(message, "role", "")
+
+
+class FakeProviderCore:
+    """Shared behaviour for the fake clients: latency sampling, error injection and payload synthesis."""
+
+    def __init__(self, seed: int = Config.FAKE_PROVIDER_SEED):
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    # -- timing and failures -------------------------------------------------
+
+    def latency(self, endpoint: str) -> float:
+        distribution = Config.fake_latency(endpoint)
+        with self._lock:
+            sample = self._rng.lognormvariate(math.log(max(distribution["median"], 1e-6)), distribution["sigma"])
+        return sample
+
+    def maybe_fail(self, endpoint: str) -> None:
+        with self._lock:
+            roll = self._rng.random()
+            status = self._rng.choice((429, 429, 500, 503))
+        if roll < Config.FAKE_ERROR_RATE:
+            raise FakeProviderError(status, f"Injected {endpoint} failure")
+
+    # -- embeddings ----------------------------------------------------------
+
+    def embed_text(self, text: str) -> List[float]:
+        """Feature-hashed bag of words so texts sharing words get similar vectors."""
+        dim = Config.FAKE_EMBED_DIM
+        vector = [0.0] * dim
+        words = _tokens(text) or ["empty"]
+        for word in words:
+            h = _digest("embed", word)
+            vector[h % dim] += 1.0 if (h >> 20) & 1 else -1.0
+            vector[(h >> 32) % dim] += 0.5
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_response(self, texts: Optional[List[str]] = None, images: Optional[List[str]] = None) -> cohere.EmbedByTypeResponse:
+        inputs = list(texts or []) + [f"image {_digest(image)}" for image in (images or [])]
+        return cohere.EmbedByTypeResponse(
+            id=str(uuid.uuid4()),
+            embeddings=cohere.EmbedByTypeResponseEmbeddings(float_=[self.embed_text(text) for text in inputs]),
+            texts=list(texts or []),
+        )
+
+    # -- rerank --------------------------------------------------------------
+
+    @staticmethod
+    def relevance(query: str, document: str) -> float:
+        query_words = set(_tokens(query))
+        doc_words = set(_tokens(document))
+        if not query_words or not doc_words:
+            return 0.0
+        overlap = len(query_words & doc_words) / len(query_words)
+        # Small deterministic jitter breaks ties without reordering clear winners
+        jitter = (_digest("rerank", query, document) % 1000) / 20000.0
+        return round(min(1.0, overlap * 0.95 + jitter), 4)
+
+    def rerank_response(self, query: str, documents: List[Any], top_n: Optional[int] = None,
+                        return_documents: bool = False) -> cohere.V2RerankResponse:
+        texts = [d if isinstance(d, str) else json.dumps(d, default=str) for d in documents]
+        scored = sorted(((self.relevance(query, text), i) for i, text in enumerate(texts)), key=lambda x: (-x[0], x[1]))
+        if top_n:
+            scored = scored[:top_n]
+        return cohere.V2RerankResponse(
+            id=str(uuid.uuid4()),
+            results=[
+                cohere.V2RerankResponseResultsItem(
+                    index=i,
+                    relevance_score=score,
+                    document=cohere.V2RerankResponseResultsItemDocument(text=texts[i]) if return_documents else None,
+                )
+                for score, i in scored
+            ],
+        )
+
+    # -- classify ------------------------------------------------------------
+
+    def classify_response(self, inputs: List[str], examples: List[Any]) -> cohere.ClassifyResponse:
+        example_vectors = [(getattr(e, "label", None) or e["label"], self.embed_text(getattr(e, "text", None) or e["text"])) for e in examples]
+        labels = sorted({label for label, _ in example_vectors})
+        classifications = []
+        for text in inputs:
+            query = self.embed_text(text)
+            scores = {label: 0.0 for label in labels}
+            for label, vector in example_vectors:
+                scores[label] += max(0.0, sum(a * b for a, b in zip(query, vector)))
+            total = sum(scores.values())
+            confidences = {label: (score / total if total else 1.0 / len(labels)) for label, score in scores.items()}
+            prediction = max(confidences, key=confidences.get)
+            classifications.append(cohere.ClassifyResponseClassificationsItem(
+                id=str(uuid.uuid4()),
+                input=text,
+                prediction=prediction,
+                predictions=[prediction],
+                confidence=confidences[prediction],
+                confidences=[confidences[prediction]],
+                labels={label: cohere.ClassifyResponseClassificationsItemLabelsValue(confidence=c) for label, c in confidences.items()},
+                classification_type="single-label",
+            ))
+        return cohere.ClassifyResponse(id=str(uuid.uuid4()), classifications=classifications)
+
+    # -- chat ----------------------------------------------------------------
+
+    @staticmethod
+    def _last_user_text(messages: List[Any]) -> str:
+        for message in reversed(messages):
+            if _message_role(message) == "user":
+                return _message_text(message)
+        return ""
+
+    def select_tool(self, query: str, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pick the tool whose name hints and description best match the query."""
+        query_words = set(_tokens(query))
+        best_tool, best_score = tools[0], -1.0
+        for tool in tools:
+            function = tool.get("function", {})
+            name = function.get("name", "")
+            score = 0.1 * len(query_words & set(_tokens(function.get("description", ""))))
+            for hint, keywords in _TOOL_HINTS.items():
+                if hint in name:
+                    score += 2.0 * len(query_words & set(keywords))
+            if score > best_score:
+                best_tool, best_score = tool, score
+        return best_tool
+
+    @staticmethod
+    def tool_arguments(tool: Dict[str, Any], query: str) -> Dict[str, Any]:
+        parameters = tool.get("function", {}).get("parameters", {})
+        arguments = {}
+        for name in parameters.get("required", []):
+            kind = parameters.get("properties", {}).get(name, {}).get("type", "string")
+            if kind in ("array", "list"):
+                arguments[name] = []
+            elif kind == "string":
+                if name == "date":
+                    arguments[name] = datetime.date.today().isoformat()
+                elif name == "time":
+                    arguments[name] = "09:00-10:00"
+                else:
+                    arguments[name] = query
+            else:
+                arguments[name] = None
+        return arguments
+
+    def answer_words(self, messages: List[Any]) -> List[str]:
+        query = self._last_user_text(messages)
+        rng = random.Random(_digest("answer", self.seed, [_message_text(m) for m in messages]))
+        words = _tokens(query)[:12] + [rng.choice(_FILLER_WORDS) for _ in range(Config.FAKE_OUTPUT_TOKENS)]
+        return words[:Config.FAKE_OUTPUT_TOKENS]
+
+    @staticmethod
+    def usage(messages: List[Any], output_tokens: int) -> cohere.Usage:
+        input_tokens = sum(len(_tokens(_message_text(m))) for m in messages)
+        return cohere.Usage(
+            billed_units=cohere.UsageBilledUnits(input_tokens=input_tokens, output_tokens=output_tokens),
+            tokens=cohere.UsageTokens(input_tokens=input_tokens, output_tokens=output_tokens),
+        )
+
+    def chat_response(self, messages: List[Any], tools: Optional[List[Dict[str, Any]]] = None) -> cohere.ChatResponse:
+        query = self._last_user_text(messages)
+        has_tool_results = any(_message_role(m) == "tool" for m in messages)
+        if tools and not has_tool_results:
+            tool = self.select_tool(query, tools)
+            name = tool["function"]["name"]
+            message = cohere.AssistantMessageResponse(
+                role="assistant",
+                tool_plan=f"I will use {name} to handle the request.",
+                tool_calls=[cohere.ToolCallV2(
+                    id=f"call_{_digest('tool', name, query) % 10**8}",
+                    type="function",
+                    function=cohere.ToolCallV2Function(name=name, arguments=json.dumps(self.tool_arguments(tool, query))),
+                )],
+            )
+            output_tokens = 20
+        else:
+            words = self.answer_words(messages)
+            message = cohere.AssistantMessageResponse(
+                role="assistant",
+                content=[cohere.TextAssistantMessageResponseContentItem(type="text", text=" ".join(words))],
+            )
+            output_tokens = len(words)
+        return cohere.ChatResponse(
+            id=str(uuid.uuid4()),
+            finish_reason="TOOL_CALL" if message.tool_calls else "COMPLETE",
+            message=message,
+            usage=self.usage(messages, output_tokens),
+        )
+
+    def stream_events(self, messages: List[Any]):
+        """Yield (delay_before_event, event) pairs for a streamed text response."""
+        words = self.answer_words(messages)
+        gap = 1.0 / max(Config.FAKE_TOKENS_PER_SECOND, 1e-6)
+        response_id = str(uuid.uuid4())
+        yield self.latency("chat_stream"), cohere.MessageStartStreamedChatResponseV2(
+            type="message-start", id=response_id,
+            delta=cohere.ChatMessageStartEventDelta(message=cohere.ChatMessageStartEventDeltaMessage(role="assistant")),
+        )
+        yield 0.0, cohere.ContentStartStreamedChatResponseV2(
+            type="content-start", index=0,
+            delta=cohere.ChatContentStartEventDelta(message=cohere.ChatContentStartEventDeltaMessage(
+                content=cohere.ChatContentStartEventDeltaMessageContent(type="text", text=""))),
+        )
+        for i, word in enumerate(words):
+            yield (0.0 if i == 0 else gap), cohere.ContentDeltaStreamedChatResponseV2(
+                type="content-delta", index=0,
+                delta=cohere.ChatContentDeltaEventDelta(message=cohere.ChatContentDeltaEventDeltaMessage(
+                    content=cohere.ChatContentDeltaEventDeltaMessageContent(text=word if i == 0 else f" {word}"))),
+            )
+        yield 0.0, cohere.ContentEndStreamedChatResponseV2(type="content-end", index=0)
+        yield 0.0, cohere.MessageEndStreamedChatResponseV2(
+            type="message-end", id=response_id,
+            delta=cohere.ChatMessageEndEventDelta(finish_reason="COMPLETE", usage=self.usage(messages, len(words))),
+        )
+
+    # -- search --------------------------------------------------------------
+
+    def search_response(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        words = _tokens(query) or ["query"]
+        slug = "-".join(words[:6])
+        results = []
+        for i in range(max_results):
+            rng = random.Random(_digest("search", self.seed, query, i))
+            snippet = " ".join(words + [rng.choice(_FILLER_WORDS) for _ in range(40)])
+            results.append({
+                "title": f"{' '.join(words[:6]).title()} - result {i + 1}",
+                "url": f"https://fake-search.local/{slug}/{i + 1}",
+                "content": snippet,
+                "score": round(1.0 - i / (max_results + 1), 4),
+                "raw_content": None,
+            })
+        return {"query": query, "follow_up_questions": None, "answer": None, "images": [], "results": results,
+                "response_time": 0.0}
+
+    # -- web pages -----------------------------------------------------------
+
+    def page_html(self, url: str) -> str:
+        """An article page for a URL, wrapped in the boilerplate the fetcher strips."""
+        words = [word for word in _tokens(urlsplit(url).path) if not word.isdigit()] or ["page"]
+        rng = random.Random(_digest("page", self.seed, url))
+        paragraphs = "".join(
+            f"<p>{' '.join(words + [rng.choice(_FILLER_WORDS) for _ in range(60)])}.</p>" for _ in range(5)
+        )
+        return (f"<html><head><title>{' '.join(words).title()}</title></head><body>"
+                f"<nav>Home | About</nav><article><h1>{' '.join(words).title()}</h1>{paragraphs}</article>"
+                f"<footer>Fake search</footer></body></html>")
+
+
+# Shared core so the sync and async clients draw from one latency/error sequence
+fake_core = FakeProviderCore()
+
+
+class FakeAsyncCohereClient:
+    """Stand-in for cohere.AsyncClientV2."""
+
+    def __init__(self, core: FakeProviderCore = fake_core):
+        self.core = core
+
+    async def _delay(self, endpoint: str) -> None:
+        await asyncio.sleep(self.core.latency(endpoint))
+        self.core.maybe_fail(endpoint)
+
+    async def chat(self, messages: List[Any], model: str = None, tools: Optional[list] = None, **kwargs) -> cohere.ChatResponse:
+        await self._delay("chat")
+        return self.core.chat_response(messages, tools)
+
+    async def chat_stream(self, messages: List[Any], model: str = None, tools: Optional[list] = None, **kwargs):
+        self.core.maybe_fail("chat_stream")
+        for delay, event in self.core.stream_events(messages):
+            if delay:
+                await asyncio.sleep(delay)
+            yield event
+
+    async def embed(self, texts: Optional[List[str]] = None, images: Optional[List[str]] = None, **kwargs) -> cohere.EmbedByTypeResponse:
+        await self._delay("embed")
+        return self.core.embed_response(texts, images)
+
+    async def rerank(self, query: str, documents: List[Any], model: str = None, top_n: Optional[int] = None,
+                     return_documents: bool = False, **kwargs) -> cohere.V2RerankResponse:
+        await self._delay("rerank")
+        return self.core.rerank_response(query, documents, top_n, return_documents)
+
+    async def classify(self, inputs: List[str], examples: List[Any], model: str = None, **kwargs) -> cohere.ClassifyResponse:
+        await self._delay("classify")
+        return self.core.classify_response(inputs, examples)
+
+
+class FakeCohereClient:
+    """Stand-in for cohere.ClientV2."""
+
+    def __init__(self, core: FakeProviderCore = fake_core):
+        self.core = core
+
+    def _delay(self, endpoint: str) -> None:
+        time.sleep(self.core.latency(endpoint))
+        self.core.maybe_fail(endpoint)
+
+    def chat(self, messages: List[Any], model: str = None, tools: Optional[list] = None, **kwargs) -> cohere.ChatResponse:
+        self._delay("chat")
+        return self.core.chat_response(messages, tools)
+
+    def chat_stream(self, messages: List[Any], model: str = None, tools: Optional[list] = None, **kwargs):
+        self.core.maybe_fail("chat_stream")
+        for delay, event in self.core.stream_events(messages):
+            if delay:
+                time.sleep(delay)
+            yield event
+
+    def embed(self, texts: Optional[List[str]] = None, images: Optional[List[str]] = None, **kwargs) -> cohere.EmbedByTypeResponse:
+        self._delay("embed")
+        return self.core.embed_response(texts, images)
+
+    def rerank(self, query: str, documents: List[Any], model: str = None, top_n: Optional[int] = None,
+               return_documents: bool = False, **kwargs) -> cohere.V2RerankResponse:
+        self._delay("rerank")
+        return self.core.rerank_response(query, documents, top_n, return_documents)
+
+    def classify(self, inputs: List[str], examples: List[Any], model: str = None, **kwargs) -> cohere.ClassifyResponse:
+        self._delay("classify")
+        return self.core.classify_response(inputs, examples)
+
+
+class FakeTavilyClient:
+    """Stand-in for tavily.TavilyClient."""
+
+    def __init__(self, core: FakeProviderCore = fake_core):
+        self.core = core
+
+    def search(self, query: str, search_depth: str = "basic", max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        time.sleep(self.core.latency("search"))
+        self.core.maybe_fail("search")
+        return self.core.search_response(query, max_results)
+
+
+class FakeAsyncTavilyClient:
+    """Stand-in for tavily.AsyncTavilyClient."""
+
+    def __init__(self, core: FakeProviderCore = fake_core):
+        self.core = core
+
+    async def search(self, query: str, search_depth: str = "basic", max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(self.core.latency("search"))
+        self.core.maybe_fail("search")
+        return self.core.search_response(query, max_results)
+
+
+class FakeWebTransport(httpx.AsyncBaseTransport):
+    """Stand-in for the network under the web fetcher's httpx client. Pages never change, so revalidation returns 304."""
+
+    def __init__(self, core: FakeProviderCore = fake_core):
+        self.core = core
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.core.latency("fetch"))
+        self.core.maybe_fail("fetch")
+        html = self.core.page_html(str(request.url))
+        etag = f'"{hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag}, request=request)
+        return httpx.Response(200, headers={"Content-Type": "text/html; charset=utf-8", "ETag": etag},
+                              content=html.encode("utf-8"), request=request)
+
+
+class _FakeRequest:
+    """Mimics a googleapiclient HttpRequest: work happens when execute() is called."""
+
+    def __init__(self, core: FakeProviderCore, action):
+        self.core = core
+        self.action = action
+
+    def execute(self):
+        time.sleep(self.core.latency("calendar"))
+        return self.action()
+
+
+class FakeCalendarService:
+    """In-memory stand-in for the subset of the Google Calendar v3 service used by GoogleCalendarAPI."""
+
+    def __init__(self, core: FakeProviderCore = fake_core, time_zone: str = "UTC"):
+        self.core = core
+        self.time_zone = time_zone
+        self._events: Dict[str, Dict[str, Any]] = {}
+
+    def calendars(self):
+        service = self
+
+        class _Calendars:
+            def get(self, calendarId):
+                return _FakeRequest(service.core, lambda: {"id": calendarId, "summary": "Fake calendar", "timeZone": service.time_zone})
+        return _Calendars()
+
+    def calendarList(self):
+        service = self
+
+        class _CalendarList:
+            def list(self):
+                return _FakeRequest(service.core, lambda: {"items": [{"id": "primary", "summary": "Fake calendar"}]})
+        return _CalendarList()
+
+    def events(self):
+        service = self
+
+        def _start(event):
+            return event["start"].get("dateTime", event["start"].get("date", ""))
+
+        class _Events:
+            def list(self, calendarId, timeMin=None, timeMax=None, **kwargs):
+                def action():
+                    lo, hi = (timeMin or "")[:10], (timeMax or "9999")[:10]
+                    items = [e for e in service._events.values() if lo <= _start(e)[:10] <= hi]
+                    return {"items": sorted(items, key=_start)}
+                return _FakeRequest(service.core, action)
+
+            def insert(self, calendarId, body):
+                def action():
+                    event = dict(body, id=uuid.uuid4().hex)
+                    service._events[event["id"]] = event
+                    return event
+                return _FakeRequest(service.core, action)
+
+            def get(self, calendarId, eventId):
+                return _FakeRequest(service.core, lambda: dict(service._events[eventId]))
+
+            def update(self, calendarId, eventId, body):
+                def action():
+                    service._events[eventId] = dict(body, id=eventId)
+                    return service._events[eventId]
+                return _FakeRequest(service.core, action)
+
+            def delete(self, calendarId, eventId):
+                return _FakeRequest(service.core, lambda: service._events.pop(eventId, None) and "")
+        return _Events()
+
+
+__all__ = ["FakeAsyncCohereClient", "FakeCohereClient", "FakeTavilyClient", "FakeAsyncTavilyClient", "FakeWebTransport", "FakeCalendarService", "FakeProviderError", "fake_core"]
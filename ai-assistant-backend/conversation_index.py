@@ -0,0 +1,169 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from tenancy import DEFAULT_TENANT
+from utils.utils import logger
+
+BACKFILL_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp: str, conversation_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, conversation_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(timestamp), str(conversation_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def normalize_timestamp(value: Optional[str]) -> Optional[str]:
+    """Parse an ISO date or datetime into the isoformat used for stored timestamps."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).isoformat()
+
+
+class ConversationTimeIndex:
+    """
+    SQLite sidecar ordering conversations by (timestamp, id) within each tenant. Chroma has
+    no ordering, so recency queries page through this B-tree index and then fetch only the
+    page's documents from the collection. Cursors encode the last (timestamp, id) returned.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._backfilled = set()
+        self._backfill_locks = {}
+        self._backfill_locks_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_times ("
+            "id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, tenant TEXT NOT NULL DEFAULT 'default')"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(conversation_times)")}
+        if "tenant" not in columns:
+            self._conn.execute("ALTER TABLE conversation_times ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_times ON conversation_times (timestamp, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_times_tenant ON conversation_times (tenant, timestamp, id)")
+        # Tenants whose backfill has completed, so restarts don't page their collections again
+        self._conn.execute("CREATE TABLE IF NOT EXISTS backfilled_tenants (tenant TEXT PRIMARY KEY)")
+        self._conn.commit()
+
+    def add_many(self, rows: Iterable[Tuple[str, str]], tenant: str = DEFAULT_TENANT) -> None:
+        """Insert or update (conversation_id, timestamp) rows of a tenant."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conversation_times (id, timestamp, tenant) VALUES (?, ?, ?)",
+                [(conversation_id, timestamp, tenant) for conversation_id, timestamp in rows],
+            )
+            self._conn.commit()
+
+    def add(self, conversation_id: str, timestamp: str, tenant: str = DEFAULT_TENANT) -> None:
+        self.add_many([(conversation_id, timestamp)], tenant)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM conversation_times WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def count(self, tenant: Optional[str] = None) -> int:
+        """Number of indexed conversations of a tenant, or of all tenants when none is given."""
+        with self._lock:
+            if tenant is None:
+                return self._conn.execute("SELECT COUNT(*) FROM conversation_times").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM conversation_times WHERE tenant = ?", (tenant,)).fetchone()[0]
+
+    def older_than(self, cutoff: str, limit: int) -> List[Tuple[str, str]]:
+        """(conversation_id, tenant) of conversations stored before cutoff across all tenants, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, tenant FROM conversation_times WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?", (cutoff, limit)
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def tenants(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT tenant FROM conversation_times")]
+
+    def page(self, limit: int, cursor: Optional[str] = None, start: Optional[str] = None,
+             end: Optional[str] = None, tenant: str = DEFAULT_TENANT) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+        """
+        Newest-first page of a tenant's (conversation_id, timestamp) rows with start <= timestamp < end.
+        Returns the rows and the cursor for the next page (None on the last page).
+        """
+        clauses, params = ["tenant = ?"], [tenant]
+        if cursor:
+            timestamp, conversation_id = decode_cursor(cursor)
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend([timestamp, conversation_id])
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        sql = "SELECT id, timestamp FROM conversation_times WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return rows, next_cursor
+
+    def _backfill_recorded(self, tenant: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM backfilled_tenants WHERE tenant = ?", (tenant,)).fetchone() is not None
+
+    def _record_backfill(self, tenant: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO backfilled_tenants (tenant) VALUES (?)", (tenant,))
+            self._conn.commit()
+
+    def ensure_indexed(self, collection, tenant: str = DEFAULT_TENANT) -> None:
+        """
+        Backfill a tenant's rows from its conversation collection when the collection predates the
+        index (or tenancy), or an earlier backfill was interrupted. Completion is recorded per tenant;
+        a failed backfill is retried by the next call.
+        """
+        if tenant in self._backfilled:
+            return
+        with self._backfill_locks_lock:
+            lock = self._backfill_locks.setdefault(tenant, threading.Lock())
+        with lock:
+            if tenant in self._backfilled:
+                return
+            # Re-adding a conversation replaces its row, so an interrupted backfill can simply start over
+            if not self._backfill_recorded(tenant) and self.count(tenant) < collection.count():
+                logger.info(f"Backfilling conversation time index for tenant '{tenant}'")
+                offset = 0
+                while True:
+                    page = collection.get(limit=BACKFILL_PAGE_SIZE, offset=offset, include=["metadatas"])
+                    if not page["ids"]:
+                        break
+                    # Thread summaries share the collection but are not conversations
+                    self.add_many(
+                        ((conversation_id, (metadata or {}).get("timestamp", ""))
+                         for conversation_id, metadata in zip(page["ids"], page["metadatas"])
+                         if (metadata or {}).get("type", "conversation") == "conversation"),
+                        tenant,
+                    )
+                    offset += len(page["ids"])
+            self._record_backfill(tenant)
+            self._backfilled.add(tenant)
+
+
+__all__ = ["ConversationTimeIndex", "encode_cursor", "decode_cursor", "normalize_timestamp"]
@@ -0,0 +1,236 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from prometheus_client import Counter, Gauge
+from config.config import Config
+from conversation_threads import full_document, summarize_response
+from db import (CHROMA_DB_PATH, conversation_collection, conversation_threads, conversation_time_index,
+                lexical_index, summary_id, delete_conversations)
+from db_executor import db_executor
+from shared_state import try_lock
+from tenancy import DEFAULT_TENANT, tenant_scope
+from utils.traffic import traffic_monitor
+from utils.utils import logger
+
+SUMMARY_HEADER = "Summary of earlier turns in this conversation:"
+SUMMARY_LINE_CHARS = 160
+PROBE_RESULTS = 10
+
+# Retention metrics, reported before and after each run
+CONVERSATION_INDEX_VECTORS = Gauge('conversation_index_vectors', 'Vectors in the conversation collection', ['phase'])
+CONVERSATION_INDEX_BYTES = Gauge('conversation_index_disk_bytes', 'On-disk size of the Chroma data directory', ['phase'])
+CONVERSATION_QUERY_P95 = Gauge('conversation_query_p95_seconds', 'p95 latency of probe queries against the conversation index', ['phase'])
+RETENTION_TURNS_ARCHIVED = Counter('retention_turns_archived_total', 'Conversation turns archived and removed from the index')
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ConversationRetention:
+    """
+    Keeps the conversation index bounded. Each run selects turns past the age policy (unless
+    they are retrieved often) or beyond the per-thread turn limit, then in batches, during
+    quiet periods: archives their full text to gzip JSONL outside the index, folds them into
+    one summary vector per thread and deletes their vectors and sidecar rows.
+    """
+
+    def __init__(self, archive_dir: str = Config.RETENTION_ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self._task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict] = None
+
+    @staticmethod
+    def _tenants() -> List[str]:
+        return list(dict.fromkeys([DEFAULT_TENANT] + conversation_time_index.tenants()))
+
+    def _probe_timings(self, samples: int) -> List[float]:
+        """Latencies of nearest-neighbour queries for stored vectors, bypassing the query cache."""
+        collection = conversation_collection.uncached
+        sample = collection.get(limit=samples, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return []
+        timings = []
+        for embedding in embeddings:
+            started_at = time.perf_counter()
+            collection.query(query_embeddings=[list(embedding)], n_results=PROBE_RESULTS)
+            timings.append(time.perf_counter() - started_at)
+        return timings
+
+    def index_stats(self) -> Dict:
+        """Vectors across all tenant partitions; probe queries are spread over the tenants."""
+        tenants = self._tenants()
+        samples = max(1, Config.RETENTION_PROBE_QUERIES // len(tenants))
+        vectors, timings = 0, []
+        for tenant in tenants:
+            with tenant_scope(tenant):
+                vectors += conversation_collection.count()
+                if len(timings) < Config.RETENTION_PROBE_QUERIES:
+                    timings.extend(self._probe_timings(samples))
+        return {
+            "vectors": vectors,
+            "disk_bytes": directory_size(CHROMA_DB_PATH),
+            "p95_query_seconds": float(np.percentile(timings, 95)) if timings else None,
+        }
+
+    def _select_expired(self) -> Dict[str, List[str]]:
+        """Expired turn ids grouped by tenant."""
+        limit = Config.RETENTION_MAX_PER_RUN
+        expired: List[Tuple[str, str]] = []
+        if Config.RETENTION_MAX_AGE_DAYS > 0:
+            cutoff = (datetime.now() - timedelta(days=Config.RETENTION_MAX_AGE_DAYS)).isoformat()
+            aged = conversation_time_index.older_than(cutoff, limit)
+            hits = conversation_threads.hits([i for i, _ in aged])
+            expired.extend((i, tenant) for i, tenant in aged if hits.get(i, 0) < Config.RETENTION_MIN_HITS)
+        if Config.RETENTION_MAX_TURNS_PER_THREAD > 0:
+            expired.extend(conversation_threads.overflow_turns(Config.RETENTION_MAX_TURNS_PER_THREAD, limit))
+        by_tenant: Dict[str, List[str]] = defaultdict(list)
+        for i, tenant in list(dict.fromkeys(expired))[:limit]:
+            by_tenant[tenant].append(i)
+        return by_tenant
+
+    def _load_records(self, ids: List[str]) -> List[Dict]:
+        """Full records for the turns; those stored before threading are read back from Chroma."""
+        turns = conversation_threads.get_turns(ids)
+        records = [dict(turn, document=full_document(turn["user_input"], turn["response"])) for turn in turns.values()]
+        legacy = [i for i in ids if i not in turns]
+        if legacy:
+            result = conversation_collection.get(ids=legacy, include=["documents", "metadatas"])
+            for conversation_id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+                metadata = metadata or {}
+                records.append({
+                    "id": conversation_id,
+                    "thread_id": metadata.get("thread_id", conversation_id),
+                    "turn": metadata.get("turn", 1),
+                    "timestamp": metadata.get("timestamp", ""),
+                    "document": document,
+                })
+        return records
+
+    def _archive(self, records: List[Dict], path: str) -> None:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        # Appending gzip members keeps one readable file per run across batches
+        with gzip.open(path, "at", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _compact(self, records: List[Dict]) -> None:
+        """Fold archived turns into their thread's summary record, one multi-row upsert per batch."""
+        by_thread: Dict[str, List[Dict]] = defaultdict(list)
+        for record in records:
+            by_thread[record["thread_id"]].append(record)
+        ids = [summary_id(thread_id) for thread_id in by_thread]
+        existing = conversation_collection.get(ids=ids, include=["documents", "metadatas"])
+        previous = {i: (doc, meta or {}) for i, doc, meta in zip(existing["ids"], existing["documents"], existing["metadatas"])}
+
+        documents, metadatas = [], []
+        for thread_id, turns in by_thread.items():
+            document, metadata = previous.get(summary_id(thread_id), ("", {}))
+            lines = [line for line in document.split("\n") if line.startswith("- ")]
+            for turn in sorted(turns, key=lambda t: t["turn"]):
+                if "user_input" in turn:
+                    line = f"- {turn['user_input']} -> {summarize_response(turn['response'], SUMMARY_LINE_CHARS)}"
+                else:
+                    line = f"- {summarize_response(turn['document'], SUMMARY_LINE_CHARS)}"
+                lines.append(line)
+            # Keep the most recent lines within the budget
+            while len(lines) > 1 and sum(len(line) + 1 for line in lines) > Config.RETENTION_SUMMARY_CHARS:
+                lines.pop(0)
+            documents.append("\n".join([SUMMARY_HEADER] + lines))
+            metadatas.append({
+                "type": "thread_summary",
+                "thread_id": thread_id,
+                "timestamp": max(t["timestamp"] for t in turns),
+                "turns_compacted": metadata.get("turns_compacted", 0) + len(turns),
+            })
+        conversation_collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+        lexical_index.add(conversation_collection.name, ids, documents)
+
+    async def _wait_for_quiet(self) -> None:
+        deadline = time.monotonic() + Config.RETENTION_MAX_DEFER
+        while not traffic_monitor.is_quiet(Config.RETENTION_IDLE_SECONDS) and time.monotonic() < deadline:
+            await asyncio.sleep(1)
+
+    def _record_stats(self, phase: str, stats: Dict) -> None:
+        CONVERSATION_INDEX_VECTORS.labels(phase=phase).set(stats["vectors"])
+        CONVERSATION_INDEX_BYTES.labels(phase=phase).set(stats["disk_bytes"])
+        if stats["p95_query_seconds"] is not None:
+            CONVERSATION_QUERY_P95.labels(phase=phase).set(stats["p95_query_seconds"])
+
+    async def run_once(self) -> Dict:
+        """Apply the retention policies once and return a report with index stats before and after."""
+        started_at = datetime.now()
+        before = await db_executor.run("retention.stats", self.index_stats)
+        self._record_stats("before", before)
+        expired = await db_executor.run("retention.select", self._select_expired)
+
+        archive_path = os.path.join(self.archive_dir, f"conversations-{started_at.strftime('%Y%m%dT%H%M%S')}.jsonl.gz")
+        archived = 0
+        for tenant, ids in expired.items():
+            # Each tenant's turns live in its own partition
+            with tenant_scope(tenant):
+                for i in range(0, len(ids), Config.RETENTION_DELETE_BATCH):
+                    await self._wait_for_quiet()
+                    batch = ids[i:i + Config.RETENTION_DELETE_BATCH]
+                    records = await db_executor.run("retention.load", self._load_records, batch)
+                    # Archive before anything is removed so a failure never loses text
+                    await asyncio.to_thread(self._archive, [dict(r, tenant=tenant) for r in records], archive_path)
+                    await db_executor.run("retention.compact", self._compact, records)
+                    await delete_conversations(batch)
+                    archived += len(records)
+                    RETENTION_TURNS_ARCHIVED.inc(len(records))
+        # Release partitions of tenants that were only opened for this run
+        conversation_collection.router.sweep()
+
+        after = await db_executor.run("retention.stats", self.index_stats)
+        self._record_stats("after", after)
+        self.last_report = {
+            "started_at": started_at.isoformat(),
+            "archived": archived,
+            "archive_path": archive_path if archived else None,
+            "before": before,
+            "after": after,
+        }
+        logger.info(f"Conversation retention run complete: {self.last_report}")
+        return self.last_report
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(Config.RETENTION_INTERVAL)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error during conversation retention run: {e}")
+
+    def start(self) -> None:
+        # With several server workers, only the one holding the lock runs retention
+        if Config.RETENTION_ENABLED and self._task is None and try_lock("retention"):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+conversation_retention = ConversationRetention()
+
+__all__ = ["conversation_retention", "ConversationRetention"]
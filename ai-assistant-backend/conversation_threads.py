@@ -0,0 +1,140 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from tenancy import DEFAULT_TENANT
+
+# Sentence boundaries for the extractive answer summary
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+MARKDOWN_PATTERN = re.compile(r"[*_`#>]+")
+
+
+def summarize_response(response: str, max_chars: int) -> str:
+    """Extractive summary of an answer: its leading sentences, up to max_chars characters."""
+    text = " ".join(MARKDOWN_PATTERN.sub("", response).split())
+    summary = ""
+    for sentence in SENTENCE_PATTERN.split(text):
+        candidate = f"{summary} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        summary = candidate
+    return summary or text[:max_chars]
+
+
+def embedding_document(user_input: str, response: str, max_chars: int) -> str:
+    """The compact, query-focused text embedded for a turn: the user message and a short answer summary."""
+    return f"user: {user_input}\nassistant: {summarize_response(response, max_chars)}"
+
+
+def full_document(user_input: str, response: str) -> str:
+    return f"user: {user_input}\nassistant: {response}"
+
+
+class ConversationThreadStore:
+    """
+    SQLite sidecar holding the full text of every conversation turn, keyed by turn ID and
+    indexed by (tenant, thread_id, turn). Chroma only stores and embeds the compact representation
+    of each turn; full text and whole threads are read from here.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_turns ("
+            "id TEXT PRIMARY KEY, thread_id TEXT NOT NULL, turn INTEGER NOT NULL, "
+            "timestamp TEXT NOT NULL, user_input TEXT NOT NULL, response TEXT NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0, tenant TEXT NOT NULL DEFAULT 'default')"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(conversation_turns)")}
+        if "hits" not in columns:
+            self._conn.execute("ALTER TABLE conversation_turns ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        if "tenant" not in columns:
+            self._conn.execute("ALTER TABLE conversation_turns ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        self._conn.execute("DROP INDEX IF EXISTS idx_conversation_turns_thread")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_turns_tenant_thread ON conversation_turns (tenant, thread_id, turn)"
+        )
+        self._conn.commit()
+
+    def add_many(self, records: Iterable[Dict]) -> None:
+        rows = [
+            (r["id"], r["thread_id"], r["turn"], r["timestamp"], r["user_input"], r["response"], r.get("tenant", DEFAULT_TENANT))
+            for r in records
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conversation_turns (id, thread_id, turn, timestamp, user_input, response, tenant) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM conversation_turns WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def record_hits(self, ids: Iterable[str]) -> None:
+        """Count a retrieval of each turn; retention keeps frequently retrieved turns longer."""
+        with self._lock:
+            self._conn.executemany("UPDATE conversation_turns SET hits = hits + 1 WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def hits(self, ids: List[str]) -> Dict[str, int]:
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, hits FROM conversation_turns WHERE id IN ({', '.join('?' for _ in ids)})", ids
+            ).fetchall()
+        return {row["id"]: row["hits"] for row in rows}
+
+    def overflow_turns(self, max_turns: int, limit: int) -> List[Tuple[str, str]]:
+        """(turn_id, tenant) of turns beyond the newest max_turns of their thread, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, tenant FROM (SELECT id, tenant, timestamp, ROW_NUMBER() OVER "
+                "(PARTITION BY tenant, thread_id ORDER BY turn DESC) AS position FROM conversation_turns) "
+                "WHERE position > ? ORDER BY timestamp LIMIT ?", (max_turns, limit)
+            ).fetchall()
+        return [(row["id"], row["tenant"]) for row in rows]
+
+    def next_turn(self, thread_id: str, tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(turn) FROM conversation_turns WHERE tenant = ? AND thread_id = ?", (tenant, thread_id)
+            ).fetchone()
+        return 1 if row[0] is None else row[0] + 1
+
+    def get_turns(self, ids: List[str]) -> Dict[str, Dict]:
+        """Full records for the given turn IDs; IDs without a sidecar row are omitted."""
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM conversation_turns WHERE id IN ({', '.join('?' for _ in ids)})", ids
+            ).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+    def thread_of(self, turn_id: str, tenant: str = DEFAULT_TENANT) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM conversation_turns WHERE id = ? AND tenant = ?", (turn_id, tenant)
+            ).fetchone()
+        return row["thread_id"] if row else None
+
+    def get_thread(self, thread_id: str, tenant: str = DEFAULT_TENANT) -> List[Dict]:
+        """All turns of a tenant's thread in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM conversation_turns WHERE tenant = ? AND thread_id = ? ORDER BY turn", (tenant, thread_id)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+__all__ = ["ConversationThreadStore", "summarize_response", "embedding_document", "full_document"]
@@ -0,0 +1,216 @@
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from config.config import Config
+from db import CHROMA_DB_PATH, conversation_record, conversation_threads, store_conversations
+from db_executor import db_executor
+from shared_state import SHARED, counters, release, try_lock
+from tenancy import current_tenant
+from utils.utils import logger
+
+# Threads whose next turn number is remembered without a lookup
+TURN_COUNTER_ENTRIES = 4096
+
+# Write-behind metrics
+CONVERSATION_WRITES_PENDING = Gauge('conversation_writes_pending', 'Conversation turns journaled but not yet stored')
+CONVERSATION_BATCH_SIZE = Histogram('conversation_write_batch_size', 'Conversation turns stored per batch',
+                                    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+CONVERSATION_FLUSH_SECONDS = Histogram('conversation_flush_seconds', 'Time to embed and store one batch of conversation turns',
+                                       buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+CONVERSATION_FLUSH_ERRORS = Counter('conversation_flush_errors_total', 'Failed conversation batch writes')
+
+
+class ConversationWriter:
+    """
+    Write-behind queue for conversation storage. enqueue() appends the turn to a local
+    JSONL journal and returns; a worker task stores pending turns in multi-row batches
+    (one embedding call per batch) once CONVERSATION_BATCH_SIZE turns are waiting or
+    CONVERSATION_FLUSH_INTERVAL seconds have passed. The journal is rewritten with the
+    remaining turns after each committed batch and replayed on start, so turns accepted
+    before a crash are stored on the next run. Stored turns become searchable after the
+    next flush rather than immediately.
+
+    With the shared state backend (several server workers), each process journals to its own
+    file suffixed with its pid and takes over the journals of processes that have exited.
+    """
+
+    def __init__(self, journal_path: str, batch_size: int = Config.CONVERSATION_BATCH_SIZE,
+                 flush_interval: float = Config.CONVERSATION_FLUSH_INTERVAL,
+                 fsync: bool = Config.CONVERSATION_JOURNAL_FSYNC):
+        self.journal_path = journal_path
+        self._base_journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._pending: List[Dict] = []
+        self._journal_lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Next turn number per (tenant, thread), covering turns that are still pending
+        self._next_turns = counters("thread_turns", max_entries=TURN_COUNTER_ENTRIES)
+
+    def _sync(self, handle) -> None:
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def _append_journal(self, record: Dict) -> None:
+        with self._journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(record) + "\n")
+                self._sync(handle)
+
+    def _rewrite_journal(self) -> None:
+        # Snapshot under the journal lock so a concurrent append is either in the snapshot or written after it
+        with self._journal_lock:
+            pending = list(self._pending)
+            if not pending:
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                return
+            temp_path = f"{self.journal_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                handle.writelines(json.dumps(record) + "\n" for record in pending)
+                self._sync(handle)
+            os.replace(temp_path, self.journal_path)
+
+    def _read_journal(self, paths: Optional[List[str]] = None) -> List[Dict]:
+        records: Dict[str, Dict] = {}
+        for path in paths or [self.journal_path]:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append
+                        logger.warning("Skipping unreadable conversation journal entry")
+                        continue
+                    records[record["id"]] = record
+        return list(records.values())
+
+    @staticmethod
+    def _journal_lock_name(path: str) -> str:
+        return "journal-" + os.path.basename(path)
+
+    def _claim_journals(self) -> List[str]:
+        """
+        Switch to this process's own journal and lock it, then lock the journals of processes
+        that have exited (their locks are free). Returns the journals taken over.
+        """
+        base, ext = os.path.splitext(self._base_journal_path)
+        self.journal_path = f"{base}.{os.getpid()}{ext}"
+        try_lock(self._journal_lock_name(self.journal_path))
+        return [path for path in glob.glob(f"{glob.escape(base)}*{ext}")
+                if path != self.journal_path and try_lock(self._journal_lock_name(path))]
+
+    def _remove_journals(self, paths: List[str]) -> None:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+            release(self._journal_lock_name(path), delete=True)
+
+    async def start(self) -> None:
+        """Replay journaled turns from a previous run and start the flush worker."""
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        taken_over = await asyncio.to_thread(self._claim_journals) if SHARED else []
+        replayed = await asyncio.to_thread(self._read_journal, [self.journal_path] + taken_over)
+        if replayed:
+            logger.info(f"Replaying {len(replayed)} journaled conversation(s)")
+            self._pending = replayed + self._pending
+            for record in replayed:
+                key = self._turn_key(record.get("tenant", "default"), record["thread_id"])
+                self._next_turns.raise_to(key, record["turn"] + 1)
+            CONVERSATION_WRITES_PENDING.set(len(self._pending))
+            self._wakeup.set()
+        if taken_over:
+            # Move the taken-over turns into this process's journal before removing the originals
+            await asyncio.to_thread(self._rewrite_journal)
+            await asyncio.to_thread(self._remove_journals, taken_over)
+        self._task = asyncio.create_task(self._run())
+
+    @staticmethod
+    def _turn_key(tenant: str, thread_id: str) -> str:
+        return f"{tenant}:{thread_id}"
+
+    async def _take_turn(self, thread_id: str) -> int:
+        tenant = current_tenant()
+        key = self._turn_key(tenant, thread_id)
+        floor = 1
+        if self._next_turns.get(key) is None:
+            floor = await db_executor.run("threads.next_turn", conversation_threads.next_turn, thread_id, tenant)
+        # Atomic, so turns numbered concurrently (by any worker) never share a number
+        return self._next_turns.take(key, floor)
+
+    async def enqueue(self, user_input: str, chatbot_response: str, thread_id: str = None,
+                      conversation_id: str = None) -> str:
+        """Journal a conversation turn for the next batch and return its ID. Without a thread_id the turn starts a new thread."""
+        await self.start()
+        turn = await self._take_turn(thread_id) if thread_id else 1
+        record = conversation_record(user_input, chatbot_response, thread_id, turn, conversation_id)
+        self._pending.append(record)
+        CONVERSATION_WRITES_PENDING.set(len(self._pending))
+        await asyncio.to_thread(self._append_journal, record)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return record["id"]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Store all pending turns in batches. A failed batch stays journaled and is retried on the next flush."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                started_at = time.perf_counter()
+                try:
+                    await store_conversations(batch)
+                except Exception as e:
+                    CONVERSATION_FLUSH_ERRORS.inc()
+                    logger.error(f"Error storing {len(batch)} conversation(s), will retry: {e}")
+                    return
+                CONVERSATION_FLUSH_SECONDS.observe(time.perf_counter() - started_at)
+                CONVERSATION_BATCH_SIZE.observe(len(batch))
+                # New turns are only ever appended, so the batch is still at the front
+                del self._pending[:len(batch)]
+                CONVERSATION_WRITES_PENDING.set(len(self._pending))
+                await asyncio.to_thread(self._rewrite_journal)
+
+    async def stop(self) -> None:
+        """Stop the worker and store everything still pending."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        if SHARED and not self._pending:
+            # Nothing left to take over, so the per-process journal lock is no longer needed
+            release(self._journal_lock_name(self.journal_path), delete=True)
+
+
+conversation_writer = ConversationWriter(os.path.join(CHROMA_DB_PATH, "conversation_journal.jsonl"))
+
+__all__ = ["conversation_writer", "ConversationWriter"]
@@ -0,0 +1,3 @@
+from .corpus_ingestion import corpus_ingestor, CorpusIngestor
+
+__all__ = ["corpus_ingestor", "CorpusIngestor"]
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+from prometheus_client import Counter
+from config.config import Config
+from db import CHROMA_DB_PATH, corpus_collection
+from llm_models.embed import cohere_embeddings
+from utils import logger
+from utils.web_fetcher import web_fetcher
+from db_executor import db_executor
+
+# Corpus ingestion metrics
+CORPUS_SOURCES_PROCESSED = Counter('corpus_sources_processed_total', 'Corpus sources processed during ingestion', ['outcome'])
+
+MANIFEST_PATH = os.path.join(CHROMA_DB_PATH, "corpus_manifest.json")
+EMBED_BATCH_SIZE = 96  # Cohere's limit
+
+
+def source_id(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=1)
+def sentence_tokenizer() -> Optional[Callable[[str], List[str]]]:
+    """
+    NLTK's punkt sentence tokenizer, or None if its data is not installed. The data is bundled
+    into the image at build time (see Dockerfile) instead of being downloaded at runtime.
+    """
+    from nltk.tokenize import sent_tokenize
+    try:
+        sent_tokenize("Load the model.")
+    except LookupError:
+        logger.warning("NLTK punkt data not found; splitting sentences on punctuation instead")
+        return None
+    return sent_tokenize
+
+
+def split_sentences(text: str) -> List[str]:
+    tokenize = sentence_tokenizer()
+    if tokenize is None:
+        # punkt data unavailable (e.g. offline); fall back to splitting on sentence punctuation
+        return [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+    return tokenize(text)
+
+
+def split_into_chunks(text: str, chunk_size: int = Config.CORPUS_CHUNK_SIZE) -> List[str]:
+    """Split text into chunks of whole sentences of at most chunk_size characters."""
+    chunks = []
+    current_chunk = ""
+    for sentence in split_sentences(text):
+        if len(current_chunk) + len(sentence) <= chunk_size:
+            current_chunk += sentence + " "
+        else:
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + " "
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+class CorpusIngestor:
+    """
+    Indexes the configured corpus sources into a dedicated collection. Pages are revalidated
+    through the web fetcher with conditional GETs, and a manifest records each source's
+    content hash so only sources whose extracted text changed are re-embedded. Chunk IDs are
+    derived from the source URL, so re-ingesting a source replaces its chunks instead of
+    duplicating them.
+    """
+
+    def __init__(self, sources: Optional[List[str]] = None, collection=corpus_collection, manifest_path: str = MANIFEST_PATH):
+        self.sources = sources if sources is not None else Config.CORPUS_SOURCES
+        self.collection = collection
+        self.manifest_path = manifest_path
+        self._lock = asyncio.Lock()
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Corpus manifest unreadable, re-ingesting all sources: {str(e)}")
+            return {}
+
+    def save_manifest(self, manifest: Dict[str, Dict]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    async def replace_chunks(self, url: str, chunks: List[str], old_ids: List[str]) -> List[str]:
+        """Embed and upsert a source's chunks, removing any chunks left over from a longer previous version."""
+        sid = source_id(url)
+        ids = [f"corpus_{sid}_{i}" for i in range(len(chunks))]
+        for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = chunks[i:i + EMBED_BATCH_SIZE]
+            embeddings = await asyncio.to_thread(cohere_embeddings.embed_documents, batch)
+            await db_executor.run(
+                "corpus.upsert",
+                self.collection.upsert,
+                documents=batch,
+                metadatas=[{"url": url, "chunk_index": i + j, "total_chunks": len(chunks)} for j in range(len(batch))],
+                ids=ids[i:i + EMBED_BATCH_SIZE],
+                embeddings=embeddings,
+            )
+        stale_ids = sorted(set(old_ids) - set(ids))
+        if stale_ids:
+            await db_executor.run("corpus.delete", self.collection.delete, ids=stale_ids)
+        return ids
+
+    def remove_sources(self, manifest: Dict[str, Dict]) -> None:
+        """Drop sources that are no longer configured."""
+        for url in set(manifest) - set(self.sources):
+            chunk_ids = manifest.pop(url).get("chunk_ids", [])
+            if chunk_ids:
+                self.collection.delete(ids=chunk_ids)
+            logger.info(f"Removed corpus source {url}")
+
+    async def ingest(self) -> Dict[str, Dict]:
+        """Bring every configured source up to date. Concurrent calls are serialized."""
+        async with self._lock:
+            manifest = await asyncio.to_thread(self.load_manifest)
+            await db_executor.run("corpus.delete", self.remove_sources, manifest)
+
+            results = await web_fetcher.fetch_many(self.sources, revalidate=True)
+            for url, result in zip(self.sources, results):
+                entry = manifest.get(url, {})
+                if result is None:
+                    # Keep serving whatever was indexed previously for this source
+                    CORPUS_SOURCES_PROCESSED.labels(outcome="error").inc()
+                    continue
+                if result.content_hash == entry.get("content_hash"):
+                    CORPUS_SOURCES_PROCESSED.labels(outcome="not_modified" if result.from_cache else "unchanged").inc()
+                    continue
+                try:
+                    chunk_ids = await self.replace_chunks(url, split_into_chunks(result.text), entry.get("chunk_ids", []))
+                except Exception as e:
+                    CORPUS_SOURCES_PROCESSED.labels(outcome="error").inc()
+                    logger.error(f"Error ingesting corpus source {url}: {str(e)}")
+                    continue
+                manifest[url] = {"content_hash": result.content_hash, "chunk_ids": chunk_ids,
+                                 "ingested_at": datetime.now().isoformat()}
+                await asyncio.to_thread(self.save_manifest, manifest)
+                CORPUS_SOURCES_PROCESSED.labels(outcome="ingested").inc()
+                logger.info(f"Ingested {len(chunk_ids)} corpus chunks from {url}")
+
+            await asyncio.to_thread(self.save_manifest, manifest)
+            return manifest
+
+
+corpus_ingestor = CorpusIngestor()
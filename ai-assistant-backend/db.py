@@ -1,79 +1,289 @@
+import asyncio
 import chromadb
+from chromadb.config import Settings
+from collections import defaultdict
 from datetime import datetime
+from functools import partial
 import uuid
 import logging
 from chromadb.errors import ChromaError
 from llm_models.embed import cohere_ef
+from config.config import Config
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from query_cache import TrackedCollection
+from db_executor import db_executor
+from conversation_index import ConversationTimeIndex, normalize_timestamp
+from conversation_threads import ConversationThreadStore, embedding_document, full_document
+from index_config import distance_to_similarity
+from vector_store import open_vector_store
+from vector_store.partitions import PartitionRouter, PartitionedCollection
+from tenancy import current_tenant, tenant_scope
+from utils.lazy import LazyObject
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
 import os
 
 # Initialize Persistent ChromaDB client
-CHROMA_DB_PATH = "./agent_conversation_data"
+CHROMA_DB_PATH = Config.CHROMA_DB_PATH
 
 # Create the directory if it doesn't exist
 if not os.path.exists(CHROMA_DB_PATH):
     os.makedirs(CHROMA_DB_PATH)
 
 
-client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+def _open_client():
+    if Config.CHROMA_MODE == "http":
+        # A Chroma server owns the data, so any number of worker processes can share it
+        return chromadb.HttpClient(host=Config.CHROMA_HOST, port=Config.CHROMA_PORT)
+    # With a memory limit, Chroma unloads the least recently used HNSW segments (e.g. idle tenant partitions)
+    return chromadb.PersistentClient(
+        path=CHROMA_DB_PATH,
+        settings=Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=Config.CHROMA_MEMORY_LIMIT_BYTES)
+        if Config.CHROMA_MEMORY_LIMIT_BYTES else Settings(),
+    )
 
-# Create or get existing conversation collection
-conversation_collection = client.get_or_create_collection(
-    name="agent_conversations",
-    embedding_function=cohere_ef,
-)
+# The client and collections are opened on first use (or by the startup warm-up), not at import
+client = LazyObject(_open_client, "chroma_client")
+
+# Collections are vector stores on the backend configured for each (Chroma by default), wrapped
+# so query results are cached until the next write to the collection
+
+
+def _open_collection(config_name: str, name: str) -> TrackedCollection:
+    return TrackedCollection(open_vector_store(name, cohere_ef, client, CHROMA_DB_PATH, config_name=config_name))
+
+
+def _partitioned(base_name: str) -> PartitionedCollection:
+    """A collection split into one partition per tenant, routed by the request's tenant."""
+    return PartitionedCollection(PartitionRouter(
+        base_name, partial(_open_collection, base_name),
+        max_open=Config.TENANT_MAX_OPEN_PARTITIONS, idle_seconds=Config.TENANT_PARTITION_IDLE_SECONDS,
+    ))
+
+# Create or get existing conversation collection, partitioned by tenant
+conversation_collection = _partitioned("agent_conversations")
+
+# Create or get existing document collection, partitioned by tenant
+document_collection = _partitioned("documents_collection")
 
-# Create or get existing document collection
-document_collection = client.get_or_create_collection(
-    name="documents_collection",
-    embedding_function=cohere_ef,
+# Create or get existing collection for the curated vector_search corpus
+corpus_collection = LazyObject(
+    lambda: TrackedCollection(open_vector_store(Config.CORPUS_COLLECTION, cohere_ef, client, CHROMA_DB_PATH)),
+    "corpus_collection",
 )
 
+# BM25 index maintained alongside the conversation and document collections
+lexical_index = LexicalIndex(os.path.join(CHROMA_DB_PATH, "lexical_index.sqlite3"))
+
+# Time-ordered index of conversations for recency queries and pagination
+conversation_time_index = ConversationTimeIndex(os.path.join(CHROMA_DB_PATH, "conversation_time_index.sqlite3"))
+
+# Full text of conversation turns, grouped into threads; Chroma only embeds a compact summary
+conversation_threads = ConversationThreadStore(os.path.join(CHROMA_DB_PATH, "conversation_threads.sqlite3"))
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def store_conversation(user_input: str, chatbot_response: str, conversation_id: str = None) -> None:
-    """Store a conversation in the ChromaDB collection."""
+def warm_up() -> None:
+    """Open the Chroma client and the default collections ahead of the first request."""
+    client.heartbeat()
+    conversation_collection.count()
+    document_collection.count()
+    corpus_collection.count()
+
+def conversation_record(user_input: str, chatbot_response: str, thread_id: str = None, turn: int = 1,
+                        conversation_id: str = None) -> Dict:
+    """
+    Build the stored form of one conversation turn for the current tenant. A turn without a
+    thread starts a new one.
+    """
+    conversation_id = conversation_id or str(uuid.uuid4())
+    return {
+        "id": conversation_id,
+        "tenant": current_tenant(),
+        "thread_id": thread_id or conversation_id,
+        "turn": turn,
+        "timestamp": datetime.now().isoformat(),
+        "user_input": user_input,
+        "response": chatbot_response,
+    }
+
+def _store_conversations(records: List[Dict]) -> List[str]:
+    """
+    Store conversation records with one multi-row upsert per tenant partition, so Chroma
+    embeds each batch with a single embedding call. Upserting keeps replays of the same
+    records idempotent. Full text goes to the thread store and the lexical index; only the
+    user message and a short answer summary are embedded.
+    """
+    by_tenant: Dict[str, List[Dict]] = defaultdict(list)
+    for record in records:
+        by_tenant[record.get("tenant", current_tenant())].append(record)
+    for tenant, tenant_records in by_tenant.items():
+        with tenant_scope(tenant):
+            _store_tenant_conversations(tenant_records)
+    return [record["id"] for record in records]
+
+def _store_tenant_conversations(records: List[Dict]) -> None:
     try:
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-        
-        conversation_collection.add(
-            documents=[f"user: {user_input}\nassistant: {chatbot_response}"],
-            metadatas=[{"type": "conversation", "timestamp": datetime.now().isoformat()}],
-            ids=[conversation_id],
+        ids = [record["id"] for record in records]
+        conversation_threads.add_many(records)
+        conversation_collection.upsert(
+            documents=[
+                embedding_document(record["user_input"], record["response"], Config.CONVERSATION_SUMMARY_CHARS)
+                for record in records
+            ],
+            metadatas=[
+                {"type": "conversation", "timestamp": record["timestamp"], "thread_id": record["thread_id"], "turn": record["turn"]}
+                for record in records
+            ],
+            ids=ids,
+        )
+        lexical_index.add(
+            conversation_collection.name, ids,
+            [full_document(record["user_input"], record["response"]) for record in records],
         )
-        logger.info(f"Conversation stored successfully with ID: {conversation_id}")
-        return conversation_id
+        conversation_time_index.add_many(((record["id"], record["timestamp"]) for record in records), current_tenant())
+        logger.info(f"Stored {len(ids)} conversation(s)")
     except ChromaError as ce:
-        logger.error(f"ChromaDB error while storing conversation: {ce}")
+        logger.error(f"ChromaDB error while storing conversations: {ce}")
         raise
     except Exception as e:
-        logger.error(f"Unexpected error while storing conversation: {e}")
+        logger.error(f"Unexpected error while storing conversations: {e}")
         raise
 
-# TODO: Implement a more sophisticated search algorithm
+def _store_conversation(user_input: str, chatbot_response: str, conversation_id: str = None, thread_id: str = None) -> str:
+    """Store a conversation turn in the ChromaDB collection, appending it to thread_id if given."""
+    turn = conversation_threads.next_turn(thread_id, current_tenant()) if thread_id else 1
+    return _store_conversations([conversation_record(user_input, chatbot_response, thread_id, turn, conversation_id)])[0]
+
+
+def summary_id(thread_id: str) -> str:
+    """ID of the Chroma record holding the compacted summary of a thread's archived turns."""
+    return f"summary_{thread_id}"
+
+
+def _thread_summary(thread_id: str) -> Optional[str]:
+    result = conversation_collection.get(ids=[summary_id(thread_id)], include=["documents"])
+    return result['documents'][0] if result['ids'] else None
+
+
+def _delete_conversations(ids: List[str]) -> None:
+    """Remove conversation turns from the collection and every sidecar index."""
+    conversation_collection.delete(ids=ids)
+    lexical_index.delete(conversation_collection.name, ids)
+    conversation_time_index.delete(ids)
+    conversation_threads.delete(ids)
+
+
+def _full_documents(ids: List[str], documents: List[str]) -> List[str]:
+    """Replace stored summaries with the full turn text; records that predate threads keep their document."""
+    turns = conversation_threads.get_turns(ids)
+    return [
+        full_document(turns[id]["user_input"], turns[id]["response"]) if id in turns else document
+        for id, document in zip(ids, documents)
+    ]
+
+def hybrid_query(collection, query: str, n_results: int, where: Optional[Dict] = None,
+                 filenames: Optional[List[str]] = None, include_embeddings: bool = False) -> List[Dict]:
+    """
+    Rank documents by fusing the dense Chroma ranking with the BM25 ranking from the
+    lexical index (reciprocal rank fusion). Returns up to n_results dicts with id,
+    document, metadata, distance and its similarity in the collection's space (None for
+    lexical-only hits), the fused score and, if requested, the stored embedding.
+    """
+    lexical_index.ensure_indexed(collection)
+    candidates = max(n_results, Config.HYBRID_CANDIDATES)
+    include = ["documents", "metadatas", "embeddings"] if include_embeddings else ["documents", "metadatas"]
+
+    dense = collection.query(
+        query_texts=[query],
+        n_results=candidates,
+        where=where,
+        include=include + ["distances"]
+    )
+    space = collection.space
+    hits = {}
+    for i, doc_id in enumerate(dense['ids'][0]):
+        distance = dense['distances'][0][i]
+        hits[doc_id] = {"id": doc_id, "document": dense['documents'][0][i], "metadata": dense['metadatas'][0][i],
+                        "distance": distance, "similarity": distance_to_similarity(distance, space)}
+        if include_embeddings:
+            hits[doc_id]["embedding"] = dense['embeddings'][0][i]
+
+    lexical_ids = lexical_index.search(collection.name, query, candidates, filenames=filenames)
+    fused = reciprocal_rank_fusion([dense['ids'][0], lexical_ids], k=Config.HYBRID_RRF_K)[:n_results]
+
+    # Lexical-only hits still need their text and metadata from the collection
+    missing = [doc_id for doc_id, _ in fused if doc_id not in hits]
+    if missing:
+        extra = collection.get(ids=missing, include=include)
+        for i, doc_id in enumerate(extra['ids']):
+            hits[doc_id] = {"id": doc_id, "document": extra['documents'][i], "metadata": extra['metadatas'][i],
+                            "distance": None, "similarity": None}
+            if include_embeddings:
+                hits[doc_id]["embedding"] = extra['embeddings'][i]
+
+    return [dict(hits[doc_id], score=score) for doc_id, score in fused if doc_id in hits]
+
+
+def _encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii")
+
+
+def _decode_offset(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["offset"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 # TODO: Test robustness of this function
-# TODO: Flesh out route to allow client to specify n_results
-def get_relevant_conversations(query, n_results=3):
-    """Retrieve relevant conversations based on a query."""
+def _get_relevant_conversations(query, n_results=3, cursor: Optional[str] = None, start: Optional[str] = None,
+                                end: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    Retrieve relevant conversations based on a query, using hybrid lexical and dense ranking.
+    Supports an optional [start, end) timestamp range and cursor pagination over the ranking.
+    Returns the conversations and the cursor for the next page.
+    """
     try:
         logger.info(f"Querying for relevant conversations with query: '{query}', n_results: {n_results}")
-        results = conversation_collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        logger.debug(f"Raw query results: {results}")
+        offset = _decode_offset(cursor)
+        start, end = normalize_timestamp(start), normalize_timestamp(end)
+        wanted = offset + n_results + 1
+        if not (start or end):
+            results = hybrid_query(conversation_collection, query, wanted)
+        else:
+            # Date filtering happens after ranking, so widen the ranking until it yields the page
+            # (plus one, to know whether another page follows) or runs out of conversations
+            fetch, total = wanted * 4, conversation_collection.count()
+            while True:
+                ranked = hybrid_query(conversation_collection, query, fetch)
+                results = [
+                    r for r in ranked
+                    if (not start or (r['metadata'] or {}).get('timestamp', '') >= start)
+                    and (not end or (r['metadata'] or {}).get('timestamp', '') < end)
+                ]
+                if len(results) >= wanted or fetch >= total:
+                    break
+                fetch *= 4
+        logger.debug(f"Query results: {results}")
         
-        if not results['documents']:
+        if not results:
             logger.info(f"No relevant conversations found for query: {query}")
-            return []
+            return [], None
         
-        conversations = results['documents'][0]
+        page = results[offset:offset + n_results]
+        next_cursor = _encode_offset(offset + n_results) if len(results) > offset + n_results else None
+        conversations = _full_documents([r['id'] for r in page], [r['document'] for r in page])
+        conversation_threads.record_hits(r['id'] for r in page)
         logger.info(f"Retrieved {len(conversations)} relevant conversations")
         logger.debug(f"Conversations: {conversations}")
         
-        return conversations
+        return conversations, next_cursor
     except ChromaError as ce:
         logger.error(f"ChromaDB error while retrieving conversations: {ce}")
         raise
@@ -81,20 +291,38 @@ def get_relevant_conversations(query, n_results=3):
         logger.error(f"Unexpected error while retrieving conversations: {e}")
         raise
 
-# TODO: Review return type of this function
-# TODO: Test this function
-def get_conversation_by_id(conversation_id: str):
-    """Retrieve a specific conversation by its ID."""
+def _get_conversation_by_id(conversation_id: str):
+    """
+    Retrieve the whole thread a conversation belongs to, turns in order. Accepts a thread ID
+    or the ID of any turn in the thread. Turns removed by retention are represented by the
+    thread's summary.
+    """
     try:
+        thread_id = conversation_threads.thread_of(conversation_id, current_tenant()) or conversation_id
+        turns = conversation_threads.get_thread(thread_id, current_tenant())
+        summary = _thread_summary(thread_id)
+        if turns or summary:
+            return {
+                "thread_id": thread_id,
+                "summary": summary,
+                "turns": [dict(turn, document=full_document(turn["user_input"], turn["response"])) for turn in turns]
+            }
+
+        # Records stored before threading are single turns that only exist in Chroma
         result = conversation_collection.get(
             ids=[conversation_id],
             include=["documents", "metadatas"]
         )
         if result['ids']:
             return {
-                "id": result['ids'][0],
-                "document": result['documents'][0],
-                "metadata": result['metadatas'][0]
+                "thread_id": result['ids'][0],
+                "summary": None,
+                "turns": [{
+                    "id": result['ids'][0],
+                    "turn": 1,
+                    "timestamp": (result['metadatas'][0] or {}).get("timestamp"),
+                    "document": result['documents'][0]
+                }]
             }
         else:
             logger.info(f"No conversation found with ID: {conversation_id}")
@@ -107,27 +335,39 @@ def get_conversation_by_id(conversation_id: str):
         raise
 
 
-# TODO: Implement client function to allow user to specify n_results
 # TODO: Review return type of this function
-def get_recent_conversations(n_results=10) -> list:
-    """Retrieve the most recent conversations."""
-
-    
+def _get_recent_conversations(n_results=10, cursor: Optional[str] = None, start: Optional[str] = None,
+                              end: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """
+    Retrieve the most recent conversations, newest first, from the time index. Supports an
+    optional [start, end) timestamp range and cursor pagination. Returns the conversations
+    and the cursor for the next page.
+    """
     try:
+        conversation_time_index.ensure_indexed(conversation_collection, current_tenant())
+        rows, next_cursor = conversation_time_index.page(
+            n_results, cursor=cursor, start=normalize_timestamp(start), end=normalize_timestamp(end), tenant=current_tenant()
+        )
+        ids = [conversation_id for conversation_id, _ in rows]
+        if not ids:
+            return [], None
+
         results = conversation_collection.get(
-            where={"type": "conversation"},
-            limit=n_results,
+            ids=ids,
             include=["documents", "metadatas"]
         )
-        logger.info(f"Retrieved {len(results['ids'])} recent conversations")
+        documents = _full_documents(results['ids'], results['documents'])
+        by_id = {id: (doc, meta) for id, doc, meta in zip(results['ids'], documents, results['metadatas'])}
+        logger.info(f"Retrieved {len(by_id)} recent conversations")
+        # Keep the index's time order; Chroma returns rows in arbitrary order
         return [
             {
                 "id": id,
-                "document": doc,
-                "metadata": meta
+                "document": by_id[id][0],
+                "metadata": by_id[id][1]
             }
-            for id, doc, meta in zip(results['ids'], results['documents'], results['metadatas'])
-        ]
+            for id in ids if id in by_id
+        ], next_cursor
     except ChromaError as ce:
         logger.error(f"ChromaDB error while retrieving recent conversations: {ce}")
         raise
@@ -135,6 +375,33 @@ def get_recent_conversations(n_results=10) -> list:
         logger.error(f"Unexpected error while retrieving recent conversations: {e}")
         raise
 
+# Async entry points: the blocking Chroma work runs on the dedicated vector store pool
+async def store_conversation(user_input: str, chatbot_response: str, conversation_id: str = None, thread_id: str = None) -> str:
+    return await db_executor.run("conversations.add", _store_conversation, user_input, chatbot_response, conversation_id, thread_id)
+
+
+async def store_conversations(records: List[Dict]) -> List[str]:
+    return await db_executor.run("conversations.add_batch", _store_conversations, records)
+
+
+async def delete_conversations(ids: List[str]) -> None:
+    await db_executor.run("conversations.delete", _delete_conversations, ids)
+
+
+async def get_relevant_conversations(query, n_results=3, cursor: Optional[str] = None, start: Optional[str] = None,
+                                     end: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    return await db_executor.run("conversations.query", _get_relevant_conversations, query, n_results, cursor, start, end)
+
+
+async def get_conversation_by_id(conversation_id: str):
+    return await db_executor.run("conversations.get", _get_conversation_by_id, conversation_id)
+
+
+async def get_recent_conversations(n_results=10, cursor: Optional[str] = None, start: Optional[str] = None,
+                                   end: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    return await db_executor.run("conversations.get", _get_recent_conversations, n_results, cursor, start, end)
+
+
 if __name__ == "__main__":
     # Example usage
     user_input = "What's my schedule for tomorrow?"
@@ -145,7 +412,7 @@ if __name__ == "__main__":
 
         # Retrieve relevant conversations
         query = "What appointments do I have?"
-        relevant_convs = get_relevant_conversations(query)
+        relevant_convs, _ = asyncio.run(get_relevant_conversations(query))
         print("Relevant conversations:")
         for conv in relevant_convs:
             print(conv)
@@ -0,0 +1,68 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from prometheus_client import Counter, Gauge, Histogram
+from config.config import Config
+
+# Vector store access metrics
+VECTOR_STORE_QUEUE_DEPTH = Gauge('vector_store_queue_depth', 'Vector store operations waiting for a worker thread', ['operation'])
+VECTOR_STORE_IN_FLIGHT = Gauge('vector_store_in_flight', 'Vector store operations currently running', ['operation'])
+VECTOR_STORE_QUEUE_WAIT = Histogram('vector_store_queue_wait_seconds', 'Time vector store operations wait for a worker thread',
+                                    ['operation'], buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+VECTOR_STORE_DURATION = Histogram('vector_store_operation_seconds', 'Execution time of vector store operations',
+                                  ['operation'], buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+VECTOR_STORE_ERRORS = Counter('vector_store_errors_total', 'Failed vector store operations', ['operation'])
+
+
+class DBExecutor:
+    """
+    Runs blocking Chroma and SQLite I/O on a small dedicated thread pool so HNSW searches
+    and writes never block the event loop, and a burst of slow operations cannot take
+    over the default executor used by everything else.
+    """
+
+    def __init__(self, max_workers: int = Config.CHROMA_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-store")
+
+    async def run(self, operation: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) on the pool, recording queue depth, wait time and latency under operation."""
+        submitted_at = time.perf_counter()
+        started = False
+        VECTOR_STORE_QUEUE_DEPTH.labels(operation=operation).inc()
+
+        def task():
+            nonlocal started
+            started = True
+            started_at = time.perf_counter()
+            VECTOR_STORE_QUEUE_DEPTH.labels(operation=operation).dec()
+            VECTOR_STORE_QUEUE_WAIT.labels(operation=operation).observe(started_at - submitted_at)
+            VECTOR_STORE_IN_FLIGHT.labels(operation=operation).inc()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                VECTOR_STORE_ERRORS.labels(operation=operation).inc()
+                raise
+            finally:
+                VECTOR_STORE_IN_FLIGHT.labels(operation=operation).dec()
+                VECTOR_STORE_DURATION.labels(operation=operation).observe(time.perf_counter() - started_at)
+
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (e.g. the request's tenant) into the worker thread
+        context = contextvars.copy_context()
+        try:
+            return await loop.run_in_executor(self._executor, context.run, task)
+        except asyncio.CancelledError:
+            # A queued task cancelled before it ran never decrements the queue depth itself
+            if not started:
+                VECTOR_STORE_QUEUE_DEPTH.labels(operation=operation).dec()
+            raise
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+db_executor = DBExecutor()
+
+__all__ = ["db_executor", "DBExecutor"]
@@ -4,7 +4,8 @@ from typing import Tuple, List, Union
 from fastapi import HTTPException
 import os
 from llm_models.embed import Embeddings
-from db import document_collection
+from db import document_collection, lexical_index
+from db_executor import db_executor
 from utils import logger
 from datetime import datetime
 import time
@@ -85,19 +86,27 @@ class FileProcessor:
                     # Create embeddings for the batch
                     batch_embeddings = self.embeddings.embed_documents(batch_chunks) if full_text else [embeddings]
                     
-                    # Store batch in vector database
-                    document_collection.add(
+                    batch_metadatas = [{
+                        "filename": filename,
+                        "chunk_index": j + i,  # Global chunk index
+                        "total_chunks": len(chunks),
+                        "type": "image" if filename.endswith(('.jpg', '.jpeg', '.png')) else "document",
+                        "timestamp": datetime.now().isoformat()
+                    } for j in range(len(batch_chunks))]
+                    batch_ids = [f"file_{filename}_{timestamp}_chunk_{j+i}" for j in range(len(batch_chunks))]
+
+                    # Store batch in vector database and the lexical index
+                    await db_executor.run(
+                        "documents.add",
+                        document_collection.add,
                         documents=batch_chunks,
-                        metadatas=[{
-                            "filename": filename,
-                            "chunk_index": j + i,  # Global chunk index
-                            "total_chunks": len(chunks),
-                            "type": "image" if filename.endswith(('.jpg', '.jpeg', '.png')) else "document",
-                            "timestamp": datetime.now().isoformat()
-                        } for j in range(len(batch_chunks))],
-                        ids=[f"file_{filename}_{timestamp}_chunk_{j+i}" for j in range(len(batch_chunks))],
+                        metadatas=batch_metadatas,
+                        ids=batch_ids,
                         embeddings=batch_embeddings
                     )
+                    await db_executor.run(
+                        "lexical.add", lexical_index.add, document_collection.name, batch_ids, batch_chunks, batch_metadatas
+                    )
                 
                 logger.info(f"File processed and stored in {len(chunks)} chunks")
                 # Return a brief summary instead of full text
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional
+from utils.utils import logger
+
+# Chroma's own defaults, used for any field a collection does not configure
+CHROMA_HNSW_DEFAULTS = {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10, "batch_size": 100, "sync_threshold": 1000}
+
+
+def collection_metadata(hnsw: Dict[str, Any]) -> Dict[str, Any]:
+    """Chroma collection metadata for an HNSW configuration."""
+    return {f"hnsw:{field}": value for field, value in hnsw.items()}
+
+
+def collection_space(collection) -> str:
+    """Distance space an existing collection was created with."""
+    return (collection.metadata or {}).get("hnsw:space", CHROMA_HNSW_DEFAULTS["space"])
+
+
+def distance_to_similarity(distance: Optional[float], space: str) -> Optional[float]:
+    """
+    Convert a Chroma distance to a similarity in [-1, 1] (cosine similarity for unit vectors).
+    Chroma's l2 space returns squared euclidean distance, ip and cosine return 1 - similarity.
+    """
+    if distance is None:
+        return None
+    if space == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+
+def open_collection(client, name: str, embedding_function, hnsw: Dict[str, Any]):
+    """
+    Get or create a collection with the given HNSW configuration. The configuration only
+    applies when the collection is created; Chroma keeps the original settings of an existing
+    collection, so a mismatch is logged and the collection has to be rebuilt to change them.
+    """
+    collection = client.get_or_create_collection(
+        name=name,
+        embedding_function=embedding_function,
+        metadata=collection_metadata(hnsw),
+    )
+    actual = collection.metadata or {}
+    for field, value in hnsw.items():
+        current = actual.get(f"hnsw:{field}", CHROMA_HNSW_DEFAULTS.get(field))
+        if current != value:
+            logger.warning(f"Collection '{name}' was created with hnsw:{field}={current}, not the configured {value}; "
+                           f"rebuild the collection to apply it")
+    return collection
+
+
+__all__ = ["open_collection", "collection_metadata", "collection_space", "distance_to_similarity", "CHROMA_HNSW_DEFAULTS"]
@@ -0,0 +1,122 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.bm25 import STOPWORDS
+from utils.utils import logger
+
+# Word tokens, keeping underscores so code identifiers like my_func stay whole
+QUERY_TOKEN_PATTERN = re.compile(r"\w+")
+BACKFILL_PAGE_SIZE = 500
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Build an FTS5 MATCH expression that ORs the quoted query terms, so user input is never parsed as FTS syntax."""
+    terms = [t for t in dict.fromkeys(QUERY_TOKEN_PATTERN.findall(query.lower())) if t not in STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: each list contributes 1 / (k + rank) for every ID it contains."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index kept next to the Chroma collections in an SQLite FTS5 table.
+    Rows are keyed by (collection, doc_id) and written whenever documents are added to
+    a collection, so lexical queries never scan the vector store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._backfilled = set()
+        # One lock per collection, so callers wait for a backfill in progress instead of querying a partial index
+        self._backfill_locks: Dict[str, threading.Lock] = {}
+        self._backfill_locks_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS lexical_index USING fts5("
+            "collection UNINDEXED, doc_id UNINDEXED, filename UNINDEXED, content, "
+            "tokenize = \"unicode61 tokenchars '_'\")"
+        )
+        self._conn.commit()
+
+    def add(self, collection: str, ids: Sequence[str], documents: Sequence[str],
+            metadatas: Optional[Sequence[Dict]] = None) -> None:
+        metadatas = metadatas or [{}] * len(ids)
+        rows = []
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            filename = (metadata or {}).get("filename")
+            # Index the filename too so queries naming a file match its chunks
+            content = f"{filename}\n{document}" if filename else document
+            rows.append((collection, doc_id, filename, content))
+        with self._lock:
+            self._conn.executemany("DELETE FROM lexical_index WHERE collection = ? AND doc_id = ?",
+                                   [(collection, doc_id) for doc_id in ids])
+            self._conn.executemany("INSERT INTO lexical_index (collection, doc_id, filename, content) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, collection: str, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM lexical_index WHERE collection = ? AND doc_id = ?",
+                                   [(collection, doc_id) for doc_id in ids])
+            self._conn.commit()
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lexical_index WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def search(self, collection: str, query: str, limit: int, filenames: Optional[List[str]] = None) -> List[str]:
+        """Return up to limit document IDs ordered by BM25 relevance."""
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        sql = "SELECT doc_id FROM lexical_index WHERE lexical_index MATCH ? AND collection = ?"
+        params: List = [expression, collection]
+        if filenames:
+            sql += f" AND filename IN ({', '.join('?' for _ in filenames)})"
+            params.extend(filenames)
+        # FTS5 bm25() is lower-is-better
+        sql += " ORDER BY bm25(lexical_index) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params).fetchall()]
+
+    def ensure_indexed(self, collection) -> None:
+        """
+        Backfill the index from a Chroma collection that predates it, or whose backfill was
+        interrupted. Succeeds at most once per collection; a failed backfill is retried by the next call.
+        """
+        name = collection.name
+        if name in self._backfilled:
+            return
+        with self._backfill_locks_lock:
+            lock = self._backfill_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name in self._backfilled:
+                return
+            # Re-adding a document replaces its row, so an interrupted backfill can simply start over
+            if self.count(name) < collection.count():
+                logger.info(f"Backfilling lexical index for collection '{name}'")
+                offset = 0
+                while True:
+                    page = collection.get(limit=BACKFILL_PAGE_SIZE, offset=offset, include=["documents", "metadatas"])
+                    if not page["ids"]:
+                        break
+                    self.add(name, page["ids"], page["documents"], page["metadatas"])
+                    offset += len(page["ids"])
+            self._backfilled.add(name)
+
+
+__all__ = ["LexicalIndex", "reciprocal_rank_fusion", "match_expression"]
@@ -1,16 +1,23 @@
 from typing import AsyncIterator, Coroutine
 from config.config import Config, cohere_client
 from utils.utils import logger
+from utils.upstream import upstream
+from utils.hedging import hedger
+from utils.llm_metrics import track_llm_metrics
+from llm_models.response_cache import response_cache
 import time
 class ChatModel:
     def __init__(self):
         self.client = cohere_client
         self.model_name = Config.COHERE_MODEL
 
-    async def generate_streaming_response(self, messages, tools) -> AsyncIterator:
+    @track_llm_metrics
+    async def generate_streaming_response(self, messages, tools, call_site: str = "generate_streaming_response") -> AsyncIterator:
         try:
             start_time = time.time()
-            response = self.client.chat_stream(
+            response = upstream.stream(
+                "cohere", "chat",
+                self.client.chat_stream,
                 model=self.model_name,
                 messages=messages,
                 tools=tools
@@ -23,7 +30,9 @@ class ChatModel:
 
     def generate_router_agent_response(self, messages):
        try:
-           response = self.client.chat(
+           response = upstream.call(
+               "cohere", "chat",
+               self.client.chat,
                messages=messages,
                temperature=0.2,
                model=self.model_name
@@ -33,11 +42,30 @@ class ChatModel:
            logger.error(f"Error generating router agent response: {str(e)}")
            raise
 
-    async def generate_response(self, messages):
+    async def generate_response(self, messages, use_cache: bool = False, call_site: str = "generate_response"):
+       """
+       Generate a non-streaming response. Internal calls whose output depends only on their
+       inputs can pass use_cache=True to reuse a previous response for identical inputs.
+       """
+       cache_key = response_cache.make_key(self.model_name, messages) if use_cache else None
+       if cache_key:
+           cached = await response_cache.get(cache_key, call_site)
+           if cached is not None:
+               return cached
+
+       response = await self._generate_response(messages, call_site=call_site)
+       if cache_key:
+           await response_cache.set(cache_key, response)
+       return response
+
+    @track_llm_metrics
+    async def _generate_response(self, messages, call_site: str = "generate_response"):
        start_time = time.time()
        
        try:
-           response = await self.client.chat(
+           response = await upstream.call(
+               "cohere", "chat",
+               self.client.chat,
                messages=messages,
                model=self.model_name
            )
@@ -49,7 +77,9 @@ class ChatModel:
 
     def generate_seeded_response(self, messages, seed):
        try:
-           response = self.client.chat(
+           response = upstream.call(
+               "cohere", "chat",
+               self.client.chat,
                messages=messages,
                model=self.model_name,
                seed=seed
@@ -60,14 +90,18 @@ class ChatModel:
            raise
     
     def generate_json_response(self, messages: list) -> dict:
-        response = self.client.chat(
+        response = upstream.call(
+            "cohere", "chat",
+            self.client.chat,
             messages=messages,
             model=self.model_name,
             response_format={ "type": "json_object" }
         )
     
     def generate_short_response(self, messages: list) -> dict:
-        response = self.client.chat(
+        response = upstream.call(
+            "cohere", "chat",
+            self.client.chat,
             messages=messages,
             model=self.model_name,
             max_tokens=50,
@@ -76,14 +110,20 @@ class ChatModel:
         return response
     
 
-    async def generate_response_with_tools(self, messages: list, tools: list) -> Coroutine:
+    @track_llm_metrics
+    async def generate_response_with_tools(self, messages: list, tools: list, call_site: str = "generate_response_with_tools") -> Coroutine:
         try:
             start_time = time.time()
-            response = await self.client.chat(
-            messages=messages,
-            model=self.model_name,
-            tools=tools
-        )
+            response = await hedger.run(
+                f"chat.{call_site}",
+                lambda: upstream.call(
+                    "cohere", "chat",
+                    self.client.chat,
+                    messages=messages,
+                    model=self.model_name,
+                    tools=tools
+                )
+            )
             logger.info(f"generate_response_with_tools completed in {time.time() - start_time:.2f}s")
             return response
         except Exception as e:
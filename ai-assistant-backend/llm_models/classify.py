@@ -1,23 +1,191 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
 from llm_models.classify_examples import examples
-from config.config import cohere_client, Config
+from llm_models.embed import get_embeddings
+from config.config import Config
+from utils.utils import logger
+
+# Candidate softmax temperatures for leave-one-out calibration
+TEMPERATURE_GRID = (0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5)
+
+
+class LabelConfidence:
+    def __init__(self, confidence: float):
+        self.confidence = confidence
+
+
+class Classification:
+    """Result of a local classification, shaped like the Cohere classify response items."""
+
+    def __init__(self, input: str, labels: Dict[str, float]):
+        self.input = input
+        self.labels = {label: LabelConfidence(confidence) for label, confidence in labels.items()}
+        self.prediction = max(labels, key=labels.get)
+        self.confidence = labels[self.prediction]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _example_fields(example: Any):
+    if isinstance(example, dict):
+        return example["text"], example["label"]
+    return example.text, example.label
+
+
+def examples_digest(examples: Sequence[Any]) -> str:
+    """Content hash of an example set's (text, label) pairs."""
+    pairs = [list(_example_fields(e)) for e in examples]
+    return hashlib.sha256(json.dumps(pairs, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class _ExampleIndex:
+    """
+    Label names, per-example label ids, the normalized example matrix and the fitted
+    temperature. Never modified once built: updates build a new index and replace the
+    reference, so a concurrent classification uses either the old or the new one entirely.
+    """
+
+    def __init__(self, labels: List[str], label_ids: np.ndarray, matrix: np.ndarray, temperature: float):
+        self.labels = labels
+        self.label_ids = label_ids
+        self.matrix = matrix
+        self.temperature = temperature
+
+
+class LocalClassifier:
+    """
+    Few-shot classifier that embeds its labeled examples once and classifies queries
+    by cosine kNN over the cached example matrix. Votes are softmax-weighted by
+    similarity with a temperature fitted by leave-one-out over the examples.
+    """
+
+    DEFAULT_TEMPERATURE = 0.05
+
+    def __init__(self, examples: Sequence[Any], k: int = Config.CLASSIFY_K):
+        self.k = k
+        self._examples = list(examples)
+        self._lock = threading.Lock()
+        self._index: Optional[_ExampleIndex] = None
+
+    @property
+    def labels(self) -> List[str]:
+        return self._index.labels if self._index is not None else []
+
+    @property
+    def temperature(self) -> float:
+        return self._index.temperature if self._index is not None else self.DEFAULT_TEMPERATURE
+
+    def _build(self, labels: List[str], matrix: np.ndarray) -> _ExampleIndex:
+        label_names = sorted(set(labels))
+        positions = {label: i for i, label in enumerate(label_names)}
+        label_ids = np.array([positions[label] for label in labels], dtype=np.int64)
+        temperature = self._fit_temperature(matrix, label_ids, len(label_names))
+        return _ExampleIndex(label_names, label_ids, matrix, temperature)
+
+    def _ensure_index(self) -> _ExampleIndex:
+        index = self._index
+        if index is not None:
+            return index
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            texts, labels = zip(*(_example_fields(e) for e in self._examples))
+            matrix = _normalize(np.asarray(get_embeddings(list(texts)), dtype=np.float32))
+            self._index = self._build(list(labels), matrix)
+            logger.info(f"Local classifier indexed {len(texts)} examples across {len(self._index.labels)} labels")
+            return self._index
+
+    def add_examples(self, new_examples: Sequence[Any]) -> None:
+        """Embed and add examples to a live classifier without re-embedding the existing ones."""
+        if not new_examples:
+            return
+        self._ensure_index()
+        texts, labels = zip(*(_example_fields(e) for e in new_examples))
+        vectors = _normalize(np.asarray(get_embeddings(list(texts)), dtype=np.float32))
+        with self._lock:
+            index = self._index
+            self._examples.extend(new_examples)
+            all_labels = [index.labels[i] for i in index.label_ids] + list(labels)
+            self._index = self._build(all_labels, np.vstack([index.matrix, vectors]))
+
+    def _votes(self, similarities: np.ndarray, label_ids: np.ndarray, temperature: float, n_labels: int) -> np.ndarray:
+        """Softmax-weighted kNN votes per label for a (batch, n_examples) similarity matrix."""
+        k = min(self.k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        weights = np.exp((top_similarities - top_similarities.max(axis=1, keepdims=True)) / temperature)
+        votes = np.zeros((similarities.shape[0], n_labels), dtype=np.float64)
+        rows = np.repeat(np.arange(similarities.shape[0]), k)
+        np.add.at(votes, (rows, label_ids[top].ravel()), weights.ravel())
+        return votes / votes.sum(axis=1, keepdims=True)
+
+    def _fit_temperature(self, matrix: np.ndarray, label_ids: np.ndarray, n_labels: int) -> float:
+        """Pick the temperature minimising leave-one-out negative log-likelihood on the examples."""
+        if n_labels < 2 or matrix.shape[0] <= self.k:
+            return self.DEFAULT_TEMPERATURE
+        similarities = matrix @ matrix.T
+        np.fill_diagonal(similarities, -np.inf)
+        best, best_nll = self.DEFAULT_TEMPERATURE, np.inf
+        for temperature in TEMPERATURE_GRID:
+            probabilities = self._votes(similarities, label_ids, temperature, n_labels)
+            correct = probabilities[np.arange(len(label_ids)), label_ids]
+            nll = -np.mean(np.log(np.clip(correct, 1e-6, 1.0)))
+            if nll < best_nll:
+                best, best_nll = temperature, nll
+        return best
+
+    def classify_embeddings(self, query_embeddings: np.ndarray, inputs: Optional[List[str]] = None) -> List[Classification]:
+        """Classify a batch of precomputed query embeddings."""
+        index = self._ensure_index()
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        probabilities = self._votes(queries @ index.matrix.T, index.label_ids, index.temperature, len(index.labels))
+        inputs = inputs or [""] * len(queries)
+        return [
+            Classification(text, {label: float(p) for label, p in zip(index.labels, row)})
+            for text, row in zip(inputs, probabilities)
+        ]
+
+    def classify_batch(self, queries: List[str]) -> List[Classification]:
+        """Embed the queries in one call and classify them together."""
+        if not queries:
+            return []
+        return self.classify_embeddings(np.asarray(get_embeddings(queries)), queries)
+
+    def classify(self, query: str) -> Classification:
+        return self.classify_batch([query])[0]
+
 
 #TODO: Consider other types of classification. Perhaps for the router to improve on agent selection?
 class Classifier:
     def __init__(self):
-        self.client = cohere_client
-        self.model = Config.CLASSIFY_MODEL
+        self._engines: Dict[str, LocalClassifier] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, examples: Sequence[Any]) -> LocalClassifier:
+        """Return the cached engine for an example set, building it on first use. Engines are keyed by content."""
+        key = examples_digest(examples)
+        engine = self._engines.get(key)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.setdefault(key, LocalClassifier(examples))
+        return engine
+
+    def classify(self, query: str, examples: list) -> Classification:
+        return self.engine(examples).classify(query)
 
-    def classify(self, query: str, examples: list) -> float:
-        response = self.client.classify(
-            model=self.model,
-            inputs=[query],
-            examples=examples
-        )
-        return response.classifications[0]
+    def classify_batch(self, queries: List[str], examples: list) -> List[Classification]:
+        return self.engine(examples).classify_batch(queries)
 
     def classify_time_sensitivity(self, query: str) -> float:
         classification = self.classify(query, examples)
-        
+
         # Check if 'time_sensitive' is in the labels
         if 'time_sensitive' in classification.labels:
             return classification.labels['time_sensitive'].confidence
@@ -29,22 +197,22 @@ class Classifier:
     #TODO: Add more examples to help with classifying query examples best routed to the tutor agent
     def classify_tutor_examples(self, query: str, tutor_examples: list) -> float:
         classification = self.classify(query, tutor_examples)
-        return classification.labels.get('spam', 0).confidence
-    
+        return classification.labels.get('spam', LabelConfidence(0)).confidence
+
     #TODO: Add more examples to help with classifying query examples best routed to the calendar agent
     def classify_calendar_examples(self, query: str, calendar_examples: list) -> float:
         classification = self.classify(query, calendar_examples)
-        return classification.labels.get('spam', 0).confidence
-    
+        return classification.labels.get('spam', LabelConfidence(0)).confidence
+
     #TODO: Add more examples to help with classifying query examples best routed to the web search agent
     def classify_web_search_examples(self, query: str, web_search_examples: list) -> float:
         classification = self.classify(query, web_search_examples)
-        return classification.labels.get('spam', 0).confidence
-    
+        return classification.labels.get('spam', LabelConfidence(0)).confidence
+
     #TODO: Add more examples to help with classifying query examples best routed to the code agent
     def classify_code_examples(self, query: str, code_examples: list) -> float:
         classification = self.classify(query, code_examples)
-        return classification.labels.get('spam', 0).confidence
+        return classification.labels.get('spam', LabelConfidence(0)).confidence
 
 
-classify_model = Classifier()
\ No newline at end of file
+classify_model = Classifier()
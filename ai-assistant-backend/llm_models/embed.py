@@ -1,10 +1,32 @@
 from config.config import Config, cohere_sync_client
-from langchain_cohere import CohereEmbeddings
 from chromadb.utils.embedding_functions import EmbeddingFunction
 from typing import List
 from utils.utils import logger
-from typing import List, Union
+from utils.lazy import LazyObject
+from utils.upstream import upstream
+from shared_state import named_cache
+from typing import Callable, List, Union
 import base64
+import hashlib
+import numpy as np
+
+# Vectors are stored as float32 arrays, a quarter of the size of lists of Python floats
+embedding_cache = named_cache(
+    "embeddings", Config.EMBEDDING_CACHE_MAX_ENTRIES, ttl=Config.EMBEDDING_CACHE_TTL, enabled=Config.EMBEDDING_CACHE_ENABLED
+)
+
+
+def cached_embed(texts: List[str], input_type: str, embed: Callable[[List[str]], List[List[float]]],
+                 model_name: str = Config.EMBED_MODEL) -> List[List[float]]:
+    """Embed texts with embed(texts), only sending those not already in the embedding cache."""
+    keys = [hashlib.sha256(f"{model_name}:{input_type}:{text}".encode("utf-8")).hexdigest() for text in texts]
+    vectors = {key: embedding_cache.get(key) for key in set(keys)}
+    missing = {key: text for key, text in zip(keys, texts) if vectors[key] is None}
+    if missing:
+        for key, vector in zip(missing, embed(list(missing.values()))):
+            vectors[key] = np.asarray(vector, dtype=np.float32)
+            embedding_cache.set(key, vectors[key])
+    return [vectors[key].tolist() for key in keys]
 
 class Embeddings():
     def __init__(self, model_name=Config.EMBED_MODEL, embeddings_type=["float"]):
@@ -15,7 +37,9 @@ class Embeddings():
     def embed_documents(self, texts: List[str]):
         """Embed text documents using the Cohere API."""
         logger.info(f"Embedding {len(texts)} documents")
-        response = self.client.embed(
+        response = upstream.call_sync(
+            "cohere", "embed",
+            self.client.embed,
             texts=texts,
             model=self.model_name,
             embedding_types=self.embeddings_type,
@@ -36,7 +60,9 @@ class Embeddings():
                 image_uri = f"data:image/jpeg;base64,{encoded_string}"
                 image_uris.append(image_uri)
 
-        response = self.client.embed(
+        response = upstream.call_sync(
+            "cohere", "embed",
+            self.client.embed,
             images=image_uris,
             model=self.model_name,
             embedding_types=self.embeddings_type,
@@ -56,37 +82,49 @@ class CustomCohereEmbeddingFunction(EmbeddingFunction):
         if isinstance(input, str):
             input = [input]
             
+        return cached_embed(input, self.input_type, self._embed, self.model_name)
 
-        response = self.client.embed(
-            texts=input,
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        response = upstream.call_sync(
+            "cohere", "embed",
+            self.client.embed,
+            texts=texts,
             model=self.model_name,
             embedding_types=self.embeddings_type,
             input_type=self.input_type
         )
+        return response.embeddings.float
 
-        embeddings = response.embeddings.float
-
-        return [list(map(float, embedding)) for embedding in embeddings]
+def init_document_embeddings():
+    """Initialize the embeddings used to index corpus documents."""
+    if Config.PROVIDER_MODE == "fake":
+        # The LangChain wrapper builds its own client, so use our client-backed embeddings instead
+        return Embeddings()
+    # langchain_cohere is slow to import, so it is only loaded when the embeddings are first used
+    from langchain_cohere import CohereEmbeddings
+    return CohereEmbeddings(model=Config.EMBED_MODEL, cohere_api_key=Config.COHERE_API_KEY, user_agent="ai-assistant-backend")
 
 def init_embeddings():
 
     """Initialize and return the embeddings and custom embedding function."""
-    cohere_embeddings = CohereEmbeddings(model=Config.EMBED_MODEL, cohere_api_key=Config.COHERE_API_KEY, user_agent="ai-assistant-backend")
+    cohere_embeddings = LazyObject(init_document_embeddings, "cohere_embeddings")
     cohere_ef = CustomCohereEmbeddingFunction(api_key=Config.COHERE_API_KEY, input_type="search_document")
     return cohere_embeddings, cohere_ef
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
-    response = cohere_sync_client.embed(
+def _embed_for_classification(texts: List[str]) -> List[List[float]]:
+    response = upstream.call_sync(
+        "cohere", "embed",
+        cohere_sync_client.embed,
         model=Config.EMBED_MODEL,
         texts=texts,
         embedding_types=["float"],
         input_type="classification"
     )
+    return response.embeddings.float
 
-    embeddings =  response.embeddings.float
-
-    return [list(map(float, embedding)) for embedding in embeddings]
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    return cached_embed(texts, "classification", _embed_for_classification)
 
 cohere_embeddings, cohere_ef = init_embeddings()
 
-__all__ = ["cohere_embeddings", "cohere_ef", "get_embeddings"]
\ No newline at end of file
+__all__ = ["cohere_embeddings", "cohere_ef", "get_embeddings", "cached_embed", "embedding_cache"]
\ No newline at end of file
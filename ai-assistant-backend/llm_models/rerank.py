@@ -1,24 +1,80 @@
+import uuid
+from typing import List, Optional
+import cohere
+import numpy as np
+from prometheus_client import Histogram
 from config.config import Config, cohere_client
 from utils.utils import logger
+from utils.upstream import upstream
+from utils.hedging import hedger
+from utils.bm25 import bm25_scores, estimate_tokens
 
 TOP_N = 10
 
+# Rerank stage metrics
+RERANK_CANDIDATES = Histogram('rerank_candidates', 'Candidates entering the rerank stage and sent to the remote reranker',
+                              ['stage'], buckets=(1, 2, 5, 10, 20, 40, 80, 160))
+
+
 class CohereReRank:
     def __init__(self):
         self.client = cohere_client
         self.model_name = Config.RERANK_MODEL
 
-    async def rerank(self, query: str, documents: list) -> list:
+    @staticmethod
+    def rerank_depth(query: str, documents: List[str], order: np.ndarray, token_budget: int) -> int:
+        """How many of the lexically best candidates fit in the token budget, within the configured depth bounds."""
+        query_tokens = estimate_tokens(query)
+        # Each document is scored together with the query, so the query is paid per document
+        costs = np.array([estimate_tokens(documents[i]) + query_tokens for i in order])
+        depth = int(np.searchsorted(np.cumsum(costs), token_budget, side="right"))
+        return max(min(Config.RERANK_MIN_DEPTH, len(documents)), min(depth, Config.RERANK_MAX_DEPTH))
+
+    async def rerank(self, query: str, documents: list, token_budget: Optional[int] = None,
+                     top_n: Optional[int] = None) -> cohere.V2RerankResponse:
+        """
+        Rerank documents for the query. A local BM25 pass orders the candidates so only the
+        best ones that fit the token budget are sent to the remote reranker. Result indices
+        always refer to the caller's documents list.
+        """
+        top_n = top_n or TOP_N
+        if not documents:
+            return cohere.V2RerankResponse(id=str(uuid.uuid4()), results=[])
+
+        scores = bm25_scores(query, documents)
+        order = np.argsort(-scores, kind="stable")
+        RERANK_CANDIDATES.labels(stage="input").observe(len(documents))
+
+        depth = self.rerank_depth(query, documents, order, token_budget or Config.RERANK_TOKEN_BUDGET)
+        candidates = order[:depth].tolist()
+        RERANK_CANDIDATES.labels(stage="sent").observe(len(candidates))
+
         try:
-            response = await self.client.rerank(
-                query=query,
-                documents=documents,
-            model=self.model_name,
-            top_n=TOP_N
+            response = await hedger.run(
+                "rerank.rerank",
+                lambda: upstream.call(
+                    "cohere", "rerank",
+                    self.client.rerank,
+                    query=query,
+                    documents=[documents[i] for i in candidates],
+                    model=self.model_name,
+                    top_n=min(top_n, len(candidates))
+                )
             )
-            return response
         except Exception as e:
             logger.error(f"Error reranking documents: {str(e)}")
             raise
 
-rerank = CohereReRank()
\ No newline at end of file
+        # Map indices from the trimmed candidate list back to the caller's list
+        return cohere.V2RerankResponse(
+            id=response.id,
+            meta=response.meta,
+            results=[
+                cohere.V2RerankResponseResultsItem(
+                    index=candidates[r.index], relevance_score=r.relevance_score, document=r.document
+                )
+                for r in response.results
+            ],
+        )
+
+rerank = CohereReRank()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+from typing import Any, Optional
+from prometheus_client import Counter
+from config.config import Config
+from shared_state import named_cache
+from utils.cache import Cache
+from utils.utils import logger
+
+# Response cache metrics
+LLM_CACHE_HITS = Counter('llm_cache_hits_total', 'LLM response cache hits', ['call_site'])
+LLM_CACHE_MISSES = Counter('llm_cache_misses_total', 'LLM response cache misses', ['call_site'])
+LLM_CACHE_AVOIDED_TOKENS = Counter('llm_cache_avoided_tokens_total', 'Tokens not spent thanks to cache hits', ['call_site', 'token_type'])
+
+
+def _to_jsonable(obj: Any) -> Any:
+    """Convert SDK objects (e.g. Cohere tool calls) into plain data for hashing."""
+    for attr in ("model_dump", "dict"):
+        method = getattr(obj, attr, None)
+        if callable(method):
+            return method()
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    return str(obj)
+
+
+class ResponseCache:
+    """
+    Cache for deterministic, non-streaming LLM calls, keyed by a canonical hash of
+    (model, messages, tools, parameters). Callers opt in per call.
+    """
+
+    def __init__(self, cache: Optional[Cache] = None, ttl: float = Config.LLM_CACHE_TTL,
+                 enabled: bool = Config.LLM_CACHE_ENABLED):
+        self.cache = cache or named_cache("llm_responses", Config.LLM_CACHE_MAX_ENTRIES, ttl=ttl)
+        self.enabled = enabled
+
+    @staticmethod
+    def make_key(model: str, messages: list, tools: Optional[list] = None, **params) -> str:
+        payload = {"model": model, "messages": messages, "tools": tools or [], "params": params}
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_to_jsonable)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str, call_site: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        response = await self.cache.aget(key)
+        if response is None:
+            LLM_CACHE_MISSES.labels(call_site=call_site).inc()
+            return None
+        LLM_CACHE_HITS.labels(call_site=call_site).inc()
+        tokens = getattr(getattr(response, "usage", None), "tokens", None)
+        if tokens is not None:
+            LLM_CACHE_AVOIDED_TOKENS.labels(call_site=call_site, token_type="input").inc(tokens.input_tokens or 0)
+            LLM_CACHE_AVOIDED_TOKENS.labels(call_site=call_site, token_type="output").inc(tokens.output_tokens or 0)
+        logger.debug(f"LLM response cache hit for {call_site}")
+        return response
+
+    async def set(self, key: str, response: Any) -> None:
+        if self.enabled:
+            await self.cache.aset(key, response)
+
+
+response_cache = ResponseCache()
+
+__all__ = ["response_cache", "ResponseCache"]
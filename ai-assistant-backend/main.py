@@ -1,27 +1,86 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from routes import all_routes
-from config import Config
-from db import client as db_client
-from contextlib import asynccontextmanager
-from prometheus_client import Counter, Summary, Gauge
-from prometheus_client.openmetrics.exposition import generate_latest
-from starlette.responses import Response
+from startup import startup_report
+
+# Imports are timed in groups for the startup report; each group includes whatever it pulls in first
+with startup_report.phase("import.framework"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from contextlib import asynccontextmanager
+    import asyncio
+    import os
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Summary, Gauge, generate_latest, multiprocess
+    from starlette.responses import JSONResponse, Response
+with startup_report.phase("import.config"):
+    from config import Config
+    from config.config import warm_up_clients
+with startup_report.phase("import.storage"):
+    from db import client as db_client, warm_up as warm_up_storage
+    from db_executor import db_executor
+    from conversation_writer import conversation_writer
+    from conversation_retention import conversation_retention
+with startup_report.phase("import.corpus"):
+    from corpus import corpus_ingestor
+    from corpus.corpus_ingestion import sentence_tokenizer
+    from llm_models.embed import cohere_embeddings
+with startup_report.phase("import.routes"):
+    from routes import all_routes
+    from agents.triage.triage_tools import load_agents
+    from utils.web_fetcher import web_fetcher
+    from utils.traffic import traffic_monitor
+    from utils.utils import logger
+    from tenancy import from_trusted_proxy, set_tenant
+    from shared_state import try_lock
+
+if Config.TENANCY_ENABLED and not Config.TENANT_PROXY_SECRET:
+    # Without a secret any client could pick its tenant by setting the header
+    raise RuntimeError("TENANCY_ENABLED requires TENANT_PROXY_SECRET, shared with the authenticating proxy")
+
+if Config.DEBUG:
+    # Rich tracebacks with local variables are slow to render and can expose secrets, so only in debug
+    from rich.traceback import install
+    install(show_locals=True)
 
 # Create metrics
 REQUEST_COUNT = Counter('request_count', 'Total request count')
 REQUEST_TIME = Summary('request_processing_seconds', 'Time spent processing request')
 DB_CONNECTION_GAUGE = Gauge('db_connection', 'Database connection status')
 
+# With several workers each process writes its metrics to files in PROMETHEUS_MULTIPROC_DIR, and
+# a scrape, whichever worker serves it, reads all of them
+MULTIPROCESS_METRICS = Config.SERVER_WORKERS > 1 and bool(Config.PROMETHEUS_MULTIPROC_DIR)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize ChromaDB client
-    db_client.heartbeat()
-    DB_CONNECTION_GAUGE.set(1)  # Set to 1 when connected
-    print("ChromaDB client initialized")
+    # Startup: initialize ChromaDB, the provider clients, NLTK data and the agent modules in
+    # parallel, or in lazy mode leave each to its first use
+    if Config.STARTUP_MODE == "lazy":
+        logger.info("Lazy startup: clients, ChromaDB, NLTK data and agents are initialized on first use")
+    else:
+        steps = {"chroma": warm_up_storage, "clients": warm_up_clients, "nltk": sentence_tokenizer, "agents": load_agents}
+        if Config.CORPUS_INGEST_ON_STARTUP:
+            steps["embeddings"] = cohere_embeddings.resolve
+        await startup_report.run_concurrently(steps)
+    if db_client.initialized:
+        DB_CONNECTION_GAUGE.set(1)  # Set to 1 when connected
+        print("ChromaDB client initialized")
+    # Store any conversation turns journaled before the last shutdown and start the batch writer
+    with startup_report.phase("init.conversation_writer"):
+        await conversation_writer.start()
+    conversation_retention.start()
+    # Index the curated corpus in the background so startup is not blocked on the network (in one worker only)
+    ingest = Config.CORPUS_INGEST_ON_STARTUP and try_lock("corpus_ingestion")
+    ingestion_task = asyncio.create_task(corpus_ingestor.ingest()) if ingest else None
+    startup_report.log()
     yield
     # Shutdown: Perform any cleanup if necessary
+    if ingestion_task and not ingestion_task.done():
+        ingestion_task.cancel()
+    await conversation_retention.stop()
+    await conversation_writer.stop()
+    await web_fetcher.aclose()
+    db_executor.shutdown()
     DB_CONNECTION_GAUGE.set(0)  # Set to 0 when disconnected
+    if MULTIPROCESS_METRICS:
+        multiprocess.mark_process_dead(os.getpid())
     print("Shutting down")
 
 app = FastAPI(lifespan=lifespan)
@@ -33,19 +92,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Thread-ID"],  # lets browser clients continue the thread they started
 )
 
 # Metrics endpoint
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type="text/plain")
+    registry = REGISTRY
+    if MULTIPROCESS_METRICS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 # Middleware to count requests and measure request time
 @app.middleware("http")
 async def metrics_middleware(request, call_next):
     REQUEST_COUNT.inc()
-    with REQUEST_TIME.time():
-        response = await call_next(request)
+    if Config.TENANCY_ENABLED and request.url.path != "/metrics":
+        # The tenant header is only trusted from the authenticating proxy
+        if not from_trusted_proxy(request.headers, Config.TENANT_PROXY_SECRET_HEADER, Config.TENANT_PROXY_SECRET):
+            return JSONResponse({"detail": "Requests must come through the authenticating proxy"}, status_code=401)
+        # Everything the request does, including its background tasks, runs as this tenant
+        set_tenant(request.headers.get(Config.TENANT_HEADER))
+    traffic_monitor.started()
+    try:
+        with REQUEST_TIME.time():
+            response = await call_next(request)
+    finally:
+        traffic_monitor.finished()
     return response
 
 # Include all routes
@@ -56,5 +130,6 @@ for route in all_routes:
         print(f"  - {r.methods} {r.path}")
 
 if __name__ == "__main__":
+    # Development server; use serve.py for production
     import uvicorn
     uvicorn.run(app, host="localhost", port=8000)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from typing import List, Optional
 
 
 # Common configuration for all models
@@ -16,6 +16,7 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     model_config = common_config
     messages: List[Message] = Field(description="List of messages in the chat history")
+    thread_id: Optional[str] = Field(default=None, description="Conversation thread to append this turn to; a new thread is started if omitted")
 
 class ChatFileRequest(BaseModel):
     model_config = common_config
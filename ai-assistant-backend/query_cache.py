@@ -0,0 +1,113 @@
+import copy
+import hashlib
+import json
+from typing import Any, Dict, Optional
+import numpy as np
+from prometheus_client import Counter
+from config.config import Config
+from shared_state import Counters, counters, named_cache
+from utils.cache import Cache
+
+# Query cache metrics
+QUERY_CACHE_REQUESTS = Counter('chroma_query_cache_requests_total', 'Chroma query cache lookups', ['collection', 'result'])
+
+# Shared by every tracked collection; entries are namespaced by collection name and generation.
+# Generations are per collection name and, with the shared state backend, shared across workers
+# so a write in one process invalidates the cached queries of all of them.
+_cache: Cache = named_cache("chroma_queries", Config.QUERY_CACHE_MAX_ENTRIES)
+_generations: Counters = counters("chroma_query_generations")
+
+
+def _vector_digest(vectors: Any) -> str:
+    return hashlib.sha256(np.asarray(vectors, dtype=np.float32).tobytes()).hexdigest()
+
+
+class TrackedCollection:
+    """
+    Wraps a vector store collection with a generation counter that is bumped by every add,
+    upsert, update and delete. query() results are cached under a key that includes
+    the current generation, so any write invalidates exactly the entries it could
+    have changed and no TTL is needed. Cached results must be treated as read-only.
+    Everything else is delegated to the wrapped collection.
+    """
+
+    def __init__(self, collection, cache: Cache = _cache, enabled: bool = Config.QUERY_CACHE_ENABLED,
+                 generations: Counters = _generations):
+        self._collection = collection
+        self._cache = cache
+        self._enabled = enabled
+        self._generations = generations
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._collection, name)
+
+    @property
+    def generation(self) -> int:
+        return self._generations.get(self._collection.name) or 0
+
+    @property
+    def uncached(self):
+        """The wrapped collection, for reads that must bypass the cache (e.g. latency probes)."""
+        return self._collection
+
+    def _bump(self) -> None:
+        self._generations.take(self._collection.name)
+
+    def add(self, *args, **kwargs):
+        try:
+            return self._collection.add(*args, **kwargs)
+        finally:
+            self._bump()
+
+    def upsert(self, *args, **kwargs):
+        try:
+            return self._collection.upsert(*args, **kwargs)
+        finally:
+            self._bump()
+
+    def update(self, *args, **kwargs):
+        try:
+            return self._collection.update(*args, **kwargs)
+        finally:
+            self._bump()
+
+    def delete(self, *args, **kwargs):
+        try:
+            return self._collection.delete(*args, **kwargs)
+        finally:
+            self._bump()
+
+    def _key(self, generation: int, kwargs: Dict[str, Any]) -> Optional[str]:
+        params = dict(kwargs)
+        if params.get("query_embeddings") is not None:
+            params["query_embeddings"] = _vector_digest(params["query_embeddings"])
+        try:
+            canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        except TypeError:
+            return None
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"{self._collection.name}:{generation}:{digest}"
+
+    def query(self, **kwargs):
+        """Chroma query with result caching. Call with keyword arguments, as Chroma expects."""
+        if not self._enabled:
+            return self._collection.query(**kwargs)
+
+        # Read the generation before querying so a concurrent write can only make the entry unreachable
+        generation = self.generation
+        key = self._key(generation, kwargs)
+        name = self._collection.name
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                QUERY_CACHE_REQUESTS.labels(collection=name, result="hit").inc()
+                return copy.copy(cached)
+
+        QUERY_CACHE_REQUESTS.labels(collection=name, result="miss").inc()
+        if key is None:
+            return self._collection.query(**kwargs)
+        # Identical queries running concurrently in other threads wait for this one's results
+        return self._cache.load_sync(key, lambda: self._collection.query(**kwargs))
+
+
+__all__ = ["TrackedCollection"]
@@ -1,14 +1,14 @@
 import json
 from typing import List, Dict, Any
-from config.config import cohere_client as client, Config
+from llm_models.chat import chat_model
 from llm_models.embed import get_embeddings
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from utils.utils import logger
 
-async def generate_text(prompt: str) -> str:
+async def generate_text(prompt: str, call_site: str = "reflexion.generate_text") -> str:
     messages = [{"role": "user", "content": prompt}]
-    response = await client.chat(messages=messages, model=Config.COHERE_MODEL)
+    response = await chat_model.generate_response(messages, use_cache=True, call_site=call_site)
     return response.message.content[0].text
 
 class ModelEvaluator:
@@ -74,7 +74,7 @@ class ModelEvaluator:
             </response_format>
         </prompt>
         """
-        evaluation_response = await generate_text(evaluation_prompt)
+        evaluation_response = await generate_text(evaluation_prompt, call_site="reflexion.evaluate")
         
         try:
             evaluation_json = json.loads(evaluation_response)
@@ -89,13 +89,9 @@ class ModelEvaluator:
             }
 
 class MathematicalEvaluator:
-    def __init__(self):
-        self.cached_embeddings = {}
-
     def get_embedding(self, text: str) -> List[float]:
-        if text not in self.cached_embeddings:
-            self.cached_embeddings[text] = get_embeddings([text])[0]
-        return self.cached_embeddings[text]
+        # get_embeddings is backed by the shared embedding cache, so repeated texts are not re-embedded
+        return get_embeddings([text])[0]
 
     def embedding_similarity(self, text1: str, text2: str) -> float:
         emb1 = self.get_embedding(text1)
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, Query, HTTPException
 from fastapi.responses import StreamingResponse
 from models import ChatRequest
-from agents.calendar.google_calendar_api import GoogleCalendarAPI
-from db import get_relevant_conversations, get_recent_conversations
+from db import get_relevant_conversations, get_recent_conversations, get_conversation_by_id
 from agents.triage.triage_agent import triage_agent
 from utils.utils import logger, handle_exception
 from fileupload.file_handler import FileProcessor
 from typing import Optional, List
 import json
+import uuid
 
 # APIRouter for the chat route
 chat_route = APIRouter(prefix="/api/chat")
@@ -57,8 +57,11 @@ async def chat(
         # Log the formatted history for debugging
         logger.debug(f"Formatted chat history: {formatted_chat_history}")
 
+        # Turns are stored under the client's thread, or start a new one
+        thread_id = request.thread_id or str(uuid.uuid4())
+
         # Get response from triage agent
-        triage_response = await triage_agent(user_message, formatted_chat_history, background_tasks)
+        triage_response = await triage_agent(user_message, formatted_chat_history, background_tasks, thread_id)
 
         async def event_stream():
             if isinstance(triage_response, StreamingResponse):
@@ -84,7 +87,8 @@ async def chat(
 
         return StreamingResponse(
             event_stream(),
-            media_type="text/event-stream"
+            media_type="text/event-stream",
+            headers={"X-Thread-ID": thread_id}
         )
 
     except Exception as e:
@@ -96,7 +100,8 @@ async def chat_with_file(
     background_tasks: BackgroundTasks,
     message: str = Form(...),
     chat_history: str = Form(default="[]"),
-    files: List[UploadFile] = File(None)
+    files: List[UploadFile] = File(None),
+    thread_id: Optional[str] = Form(default=None)
 ):
     try:
         logger.info(f"Received message: {message}")
@@ -132,8 +137,10 @@ async def chat_with_file(
         # Add current message to chat history
         formatted_chat_history.append({"role": "user", "content": user_message})
 
+        thread_id = thread_id or str(uuid.uuid4())
+
         # Pass to triage agent with just the query and file context
-        response = await triage_agent(user_message, formatted_chat_history, background_tasks)
+        response = await triage_agent(user_message, formatted_chat_history, background_tasks, thread_id)
 
         async def event_stream():
             if isinstance(response, StreamingResponse):
@@ -159,7 +166,8 @@ async def chat_with_file(
 
         return StreamingResponse(
             event_stream(),
-            media_type="text/event-stream"
+            media_type="text/event-stream",
+            headers={"X-Thread-ID": thread_id}
         )
 
     except Exception as e:
@@ -167,17 +175,29 @@ async def chat_with_file(
         return handle_exception(e)
 
 @chat_route.get("/history")
-async def get_chat_history(query: str):
+async def get_chat_history(
+    query: str,
+    n_results: int = Query(3, ge=1, le=100),
+    cursor: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
     """
     This route retrieves relevant conversations from the database based on the user's query.
     params:
         query: str
+        n_results: number of conversations per page
+        cursor: next_cursor from the previous page
+        start, end: optional ISO date/datetime range, start inclusive and end exclusive
     returns:
         conversations: list of relevant conversations
+        next_cursor: cursor for the next page, or null on the last page
     """
     try:
-        relevant_convs = get_relevant_conversations(query)
-        return {"conversations": relevant_convs}
+        relevant_convs, next_cursor = await get_relevant_conversations(query, n_results, cursor, start, end)
+        return {"conversations": relevant_convs, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return handle_exception(e)
 
@@ -191,30 +211,64 @@ async def get_events(date: str):
         events: list of events
     """
     try:
-        calendar_api = GoogleCalendarAPI()
-        events = calendar_api.get_google_calendar_events(date)
+        # Imported here so the calendar client is only set up when the calendar is used
+        from agents.calendar.calendar_tools import calendar_api
+        events = await calendar_api.get_cached_google_calendar_events(date)
         return {"events": events}
     except Exception as e:
         return handle_exception(e)
 
 @chat_route.get("/past-conversations")
-async def get_past_conversations():
+async def get_past_conversations(
+    n_results: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
     """
-    This route retrieves recent conversations from the database.
+    This route retrieves recent conversations from the database, newest first.
+    params:
+        n_results: number of conversations per page
+        cursor: next_cursor from the previous page
+        start, end: optional ISO date/datetime range, start inclusive and end exclusive
     returns:
         conversations: list of recent conversations
+        next_cursor: cursor for the next page, or null on the last page
     """
     try:
-        recent_convs = get_recent_conversations(n_results=10)
+        recent_convs, next_cursor = await get_recent_conversations(n_results, cursor, start, end)
         formatted_convs = [
             {
                 "id": conv["id"],
                 "title": conv["document"].split("\n")[0][:100] + "...",  # Use first 50 chars of user input as title
-                "timestamp": conv["metadata"]["timestamp"]
+                "timestamp": conv["metadata"]["timestamp"],
+                "thread_id": conv["metadata"].get("thread_id", conv["id"])
             }
             for conv in recent_convs
         ]
-        return {"conversations": formatted_convs}
+        return {"conversations": formatted_convs, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        return handle_exception(e)
+
+@chat_route.get("/threads/{conversation_id}")
+async def get_thread(conversation_id: str):
+    """
+    This route retrieves a whole conversation thread, turns in order.
+    params:
+        conversation_id: a thread ID or the ID of any turn in the thread
+    returns:
+        thread_id: the thread's ID
+        turns: the thread's turns
+    """
+    try:
+        thread = await get_conversation_by_id(conversation_id)
+        if thread is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return thread
+    except HTTPException:
+        raise
     except Exception as e:
         return handle_exception(e)
     
@@ -0,0 +1,110 @@
+"""
+Production entry point: serves the app from SERVER_WORKERS processes using uvloop and httptools.
+
+An embedded Chroma database and per-process caches cannot be shared between processes, so
+more than one worker requires CHROMA_MODE=http (a Chroma server owns the vector data) and
+SHARED_STATE_BACKEND=sqlite (caches, counters and background job leadership shared through
+SQLite on this host). --chroma-server starts the Chroma server as a child process.
+
+Usage:
+    python serve.py
+    SHARED_STATE_BACKEND=sqlite python serve.py --workers 4 --chroma-server
+    CHROMA_MODE=http CHROMA_HOST=chroma SHARED_STATE_BACKEND=sqlite SERVER_WORKERS=8 python serve.py
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Optional
+
+CHROMA_STARTUP_TIMEOUT = 60  # seconds
+
+
+def multi_worker_problems() -> List[str]:
+    """Settings that make it unsafe to run more than one worker."""
+    from config.config import Config
+    problems = []
+    if Config.CHROMA_MODE != "http":
+        problems.append("CHROMA_MODE must be 'http' (or pass --chroma-server); an embedded Chroma database is owned by one process")
+    if Config.SHARED_STATE_BACKEND != "sqlite":
+        problems.append("SHARED_STATE_BACKEND must be 'sqlite' so caches and turn counters are shared between workers")
+    for collection in ("agent_conversations", "documents_collection", Config.CORPUS_COLLECTION):
+        if Config.vector_store_backend(collection) == "numpy":
+            problems.append(f"collection '{collection}' uses the numpy vector store, which only one process can write")
+    return problems
+
+
+def start_chroma_server() -> subprocess.Popen:
+    """Run `chroma run` on the data directory and wait until it answers heartbeats."""
+    from config.config import Config
+    os.makedirs(Config.CHROMA_DB_PATH, exist_ok=True)
+    process = subprocess.Popen([
+        sys.executable, "-m", "chromadb.cli.cli", "run",
+        "--path", Config.CHROMA_DB_PATH, "--host", Config.CHROMA_HOST, "--port", str(Config.CHROMA_PORT),
+        "--log-path", os.path.join(Config.CHROMA_DB_PATH, "chroma_server.log"),
+    ], stdout=subprocess.DEVNULL)
+    url = f"http://{Config.CHROMA_HOST}:{Config.CHROMA_PORT}/api/v1/heartbeat"
+    deadline = time.monotonic() + CHROMA_STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Chroma server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Chroma server did not start within {CHROMA_STARTUP_TIMEOUT}s")
+
+
+def main(args) -> None:
+    # Workers are separate processes that read their settings from the environment, so command
+    # line options are applied there before the config is loaded
+    if args.workers is not None:
+        os.environ["SERVER_WORKERS"] = str(args.workers)
+    if args.chroma_server:
+        os.environ["CHROMA_MODE"] = "http"
+    import uvicorn
+    from config.config import Config
+
+    workers = max(1, Config.SERVER_WORKERS)
+    if workers > 1:
+        problems = multi_worker_problems()
+        if problems:
+            sys.exit("Cannot run multiple workers:\n  - " + "\n  - ".join(problems))
+
+    if workers > 1:
+        # Workers read this when prometheus_client is imported; files left by a previous run are stale
+        metrics_dir = Config.PROMETHEUS_MULTIPROC_DIR or os.path.join(Config.SHARED_STATE_DIR, "prometheus")
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    chroma_server: Optional[subprocess.Popen] = start_chroma_server() if args.chroma_server else None
+    try:
+        uvicorn.run(
+            "main:app",
+            host=args.host or Config.SERVER_HOST,
+            port=args.port or Config.SERVER_PORT,
+            workers=workers,
+            loop="uvloop",
+            http="httptools",
+            access_log=Config.DEBUG,
+        )
+    finally:
+        if chroma_server is not None:
+            chroma_server.terminate()
+            chroma_server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the backend with multiple worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default SERVER_WORKERS)")
+    parser.add_argument("--host", default=None, help="Bind address (default SERVER_HOST)")
+    parser.add_argument("--port", type=int, default=None, help="Port (default SERVER_PORT)")
+    parser.add_argument("--chroma-server", action="store_true",
+                        help="Start a Chroma server for CHROMA_DB_PATH on CHROMA_HOST:CHROMA_PORT and use it")
+    main(parser.parse_args())
@@ -0,0 +1,182 @@
+import collections
+import os
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from config.config import Config
+from utils.cache import CACHE_EVICTIONS, Cache, CacheBackend, InMemoryLRUBackend, SQLiteBackend
+
+# With the sqlite backend, caches, counters and locks live here and are shared by every worker on the host
+SHARED = Config.SHARED_STATE_BACKEND == "sqlite"
+SHARED_STATE_PATH = os.path.join(Config.SHARED_STATE_DIR, "shared_state.sqlite3")
+
+# Bounded counter namespaces are pruned on roughly this fraction of writes
+PRUNE_PROBABILITY = 0.01
+
+
+class Counters(ABC):
+    """Named integer counters, e.g. query cache generations or the next turn number of a thread."""
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def take(self, name: str, floor: int = 0) -> int:
+        """Atomically return max(current value, floor) and store that plus one."""
+
+    @abstractmethod
+    def raise_to(self, name: str, value: int) -> None:
+        """Set the counter to value unless it is already higher."""
+
+
+class LocalCounters(Counters):
+    """Counters for a single process. With max_entries, the least recently used are forgotten."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._values: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _store(self, name: str, value: int) -> None:
+        self._values[name] = value
+        self._values.move_to_end(name)
+        while self.max_entries and len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+
+    def get(self, name: str) -> Optional[int]:
+        with self._lock:
+            return self._values.get(name)
+
+    def take(self, name: str, floor: int = 0) -> int:
+        with self._lock:
+            value = max(self._values.get(name, floor), floor)
+            self._store(name, value + 1)
+            return value
+
+    def raise_to(self, name: str, value: int) -> None:
+        with self._lock:
+            self._store(name, max(self._values.get(name, value), value))
+
+
+class SQLiteCounters(Counters):
+    """
+    Counters in the shared SQLite database; take() runs in an immediate transaction, so it is
+    atomic across processes. With max_entries, the least recently updated are pruned.
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: Optional[int] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode, so transactions are explicit
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (namespace TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (namespace, name))"
+        )
+
+    def get(self, name: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM counters WHERE namespace = ? AND name = ?", (self.namespace, name)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _update(self, name: str, value: int) -> None:
+        self._conn.execute(
+            "INSERT INTO counters (namespace, name, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, name) DO UPDATE SET value = MAX(counters.value, excluded.value), updated_at = excluded.updated_at",
+            (self.namespace, name, value, time.time()),
+        )
+        if self.max_entries and random.random() < PRUNE_PROBABILITY:
+            self._conn.execute(
+                "DELETE FROM counters WHERE namespace = ? AND name NOT IN "
+                "(SELECT name FROM counters WHERE namespace = ? ORDER BY updated_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+
+    def take(self, name: str, floor: int = 0) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM counters WHERE namespace = ? AND name = ?", (self.namespace, name)
+                ).fetchone()
+                value = max(row[0], floor) if row else floor
+                self._update(name, value + 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def raise_to(self, name: str, value: int) -> None:
+        with self._lock:
+            self._update(name, value)
+
+
+def cache_backend(namespace: str, max_entries: int) -> CacheBackend:
+    """Storage for a named cache: an in-process LRU, or the shared SQLite cache with the sqlite backend."""
+    on_evict = CACHE_EVICTIONS.labels(namespace=namespace).inc
+    if SHARED:
+        return SQLiteBackend(SHARED_STATE_PATH, namespace, max_entries, on_evict=on_evict)
+    return InMemoryLRUBackend(max_entries=max_entries, on_evict=on_evict)
+
+
+def named_cache(namespace: str, max_entries: int, ttl: Optional[float] = None, enabled: bool = True) -> Cache:
+    """A Cache over cache_backend(namespace, max_entries)."""
+    return Cache(namespace, cache_backend(namespace, max_entries), ttl=ttl, enabled=enabled)
+
+
+def counters(namespace: str, max_entries: Optional[int] = None) -> Counters:
+    """A named set of counters, per process or shared depending on the backend."""
+    if SHARED:
+        return SQLiteCounters(SHARED_STATE_PATH, namespace, max_entries)
+    return LocalCounters(max_entries)
+
+
+_held_locks: Dict[str, object] = {}
+_held_locks_lock = threading.Lock()
+
+
+def try_lock(name: str) -> bool:
+    """
+    Take a named host-wide lock for the lifetime of this process (or until release), e.g. so
+    only one worker runs a background job. Returns False if another live process holds it;
+    the lock is freed by the OS when its holder exits. Always True with the memory backend.
+    """
+    if not SHARED:
+        return True
+    import fcntl
+
+    with _held_locks_lock:
+        if name in _held_locks:
+            return True
+        os.makedirs(Config.SHARED_STATE_DIR, exist_ok=True)
+        handle = open(os.path.join(Config.SHARED_STATE_DIR, f"{name}.lock"), "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        _held_locks[name] = handle
+        return True
+
+
+def release(name: str, delete: bool = False) -> None:
+    """Release a lock taken with try_lock; delete removes its lock file, for locks that will not be used again."""
+    with _held_locks_lock:
+        handle = _held_locks.pop(name, None)
+    if handle is not None:
+        if delete:
+            os.remove(handle.name)
+        handle.close()
+
+
+__all__ = ["SHARED", "Counters", "LocalCounters", "SQLiteCounters", "cache_backend", "named_cache", "counters", "try_lock", "release"]
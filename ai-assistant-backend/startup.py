@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+from prometheus_client import Gauge
+
+# Imported first by main, so it only depends on the standard library and prometheus_client
+STARTUP_PHASE_SECONDS = Gauge('startup_phase_seconds', 'Time spent in each import and initialization phase of startup', ['phase'])
+
+logger = logging.getLogger("ai_assistant")
+
+
+class StartupReport:
+    """
+    Breaks application startup down into timed phases (module imports in main, then each
+    initialization step in lifespan) so a slow boot can be traced to a module or client.
+    Phases are exported as a gauge and logged together once the app is ready.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        STARTUP_PHASE_SECONDS.labels(phase=name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at)
+
+    async def run_concurrently(self, steps: Dict[str, Callable[[], object]]) -> None:
+        """
+        Run blocking initialization steps in parallel worker threads. A failed step is logged
+        rather than raised; whatever it was initializing is retried on first use.
+        """
+        async def run(name: str, step: Callable[[], object]) -> None:
+            started_at = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                logger.warning(f"Startup step '{name}' failed, it will be retried on first use: {e}")
+            finally:
+                self.record(f"init.{name}", time.perf_counter() - started_at)
+
+        await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+
+    def log(self) -> None:
+        total = time.perf_counter() - self.started_at
+        self.record("total", total)
+        breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.phases.items() if name != "total")
+        logger.info(f"Startup complete in {total:.2f}s ({breakdown})")
+
+
+startup_report = StartupReport()
+
+__all__ = ["startup_report", "StartupReport"]
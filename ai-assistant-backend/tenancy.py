@@ -0,0 +1,51 @@
+import contextvars
+import hashlib
+import hmac
+import re
+from contextlib import contextmanager
+from typing import Mapping, Optional
+
+DEFAULT_TENANT = "default"
+# Identifiers usable verbatim in collection names; anything else is hashed
+SAFE_TENANT = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,38}[A-Za-z0-9])?$")
+
+_current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+
+
+def normalize_tenant(value: Optional[str]) -> str:
+    """Map a user or tenant identifier to a token that is safe in collection names."""
+    if not value:
+        return DEFAULT_TENANT
+    if SAFE_TENANT.match(value):
+        return value
+    return "h" + hashlib.sha1(value.encode("utf-8")).hexdigest()[:32]
+
+
+def current_tenant() -> str:
+    """Tenant of the current request (or of the enclosing tenant_scope)."""
+    return _current_tenant.get()
+
+
+def set_tenant(value: Optional[str]) -> contextvars.Token:
+    return _current_tenant.set(normalize_tenant(value))
+
+
+def from_trusted_proxy(headers: Mapping[str, str], secret_header: str, secret: str) -> bool:
+    """Whether a request carries the shared secret that only the authenticating proxy knows."""
+    supplied = headers.get(secret_header)
+    if not secret or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), secret.encode("utf-8"))
+
+
+@contextmanager
+def tenant_scope(tenant: str):
+    """Run a block as the given tenant, e.g. background work on behalf of a request."""
+    token = _current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
+
+
+__all__ = ["DEFAULT_TENANT", "normalize_tenant", "current_tenant", "set_tenant", "tenant_scope", "from_trusted_proxy"]
@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Tests import the backend modules directly and run against the fake provider, without network access
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("PROVIDER_MODE", "fake")
+os.environ.setdefault("FAKE_ERROR_RATE", "0")
+os.environ.setdefault("COHERE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+os.environ.setdefault("STARTUP_MODE", "lazy")
+os.environ.setdefault("CORPUS_INGEST_ON_STARTUP", "False")
@@ -0,0 +1,14 @@
+from agents.cohere_search.context_selection import merge_adjacent
+
+
+def _chunk(index, score, similarity, filename="notes"):
+    return {"id": f"file_{filename}_1_chunk_{index}", "document": f"chunk {index}", "score": score,
+            "similarity": similarity, "metadata": {"filename": filename, "chunk_index": index}}
+
+
+def test_merged_spans_keep_the_best_score_and_dense_similarity():
+    spans = merge_adjacent([_chunk(1, 0.03, None), _chunk(0, 0.01, 0.62), _chunk(4, 0.02, None)])
+
+    assert [(s["chunk_start"], s["chunk_end"]) for s in spans] == [(0, 1), (4, 4)]
+    assert (spans[0]["score"], spans[0]["similarity"]) == (0.03, 0.62)
+    assert spans[1]["similarity"] is None
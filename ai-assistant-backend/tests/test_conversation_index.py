@@ -0,0 +1,64 @@
+from conversation_index import ConversationTimeIndex
+
+
+class FakeCollection:
+    """The slice of the Chroma collection API the backfill reads."""
+
+    def __init__(self, records, fail_after=None):
+        self.records = records
+        self.fail_after = fail_after
+        self.gets = 0
+
+    def count(self):
+        return len(self.records)
+
+    def get(self, limit, offset, include):
+        if self.fail_after is not None and self.gets >= self.fail_after:
+            raise RuntimeError("collection unavailable")
+        self.gets += 1
+        page = self.records[offset:offset + limit]
+        return {"ids": [r[0] for r in page], "metadatas": [r[1] for r in page]}
+
+
+def _records(n, prefix="c"):
+    return [(f"{prefix}{i}", {"type": "conversation", "timestamp": f"2024-01-01T00:00:{i:02d}"}) for i in range(n)]
+
+
+def test_interrupted_backfill_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr("conversation_index.BACKFILL_PAGE_SIZE", 2)
+    index = ConversationTimeIndex(str(tmp_path / "times.sqlite3"))
+    collection = FakeCollection(_records(5), fail_after=1)
+
+    try:
+        index.ensure_indexed(collection)
+    except RuntimeError:
+        pass
+    collection.fail_after = None
+    index.ensure_indexed(collection)
+
+    assert index.count("default") == 5
+
+
+def test_backfill_is_per_tenant(tmp_path):
+    index = ConversationTimeIndex(str(tmp_path / "times.sqlite3"))
+
+    index.ensure_indexed(FakeCollection([]), "alice")
+    index.ensure_indexed(FakeCollection(_records(3)), "default")
+    index.ensure_indexed(FakeCollection(_records(2, "b")), "bob")
+
+    assert index.count("alice") == 0
+    assert index.count("default") == 3
+    assert [row[0] for row in index.page(10, tenant="bob")[0]] == ["b1", "b0"]
+
+
+def test_backfill_skips_summaries_and_is_recorded(tmp_path):
+    path = str(tmp_path / "times.sqlite3")
+    summary = ("summary_t1", {"type": "thread_summary", "timestamp": "2024-01-02T00:00:00"})
+    ConversationTimeIndex(path).ensure_indexed(FakeCollection(_records(2) + [summary]))
+
+    reopened = ConversationTimeIndex(path)
+    collection = FakeCollection(_records(2) + [summary])
+    reopened.ensure_indexed(collection)
+
+    assert reopened.count() == 2
+    assert collection.gets == 0
@@ -0,0 +1,81 @@
+import gzip
+import json
+import conversation_retention as retention_module
+from config.config import Config
+from conversation_retention import SUMMARY_HEADER, ConversationRetention
+
+
+class FakeCollection:
+    """In-memory stand-in for the conversation collection's get/upsert."""
+
+    name = "conversations"
+
+    def __init__(self):
+        self.records = {}
+
+    def get(self, ids, include):
+        found = [i for i in ids if i in self.records]
+        return {"ids": found, "documents": [self.records[i][0] for i in found],
+                "metadatas": [self.records[i][1] for i in found]}
+
+    def upsert(self, ids, documents, metadatas):
+        self.records.update({i: (doc, meta) for i, doc, meta in zip(ids, documents, metadatas)})
+
+
+class FakeLexicalIndex:
+    def __init__(self):
+        self.added = []
+
+    def add(self, collection_name, ids, documents):
+        self.added.extend(ids)
+
+
+def _turn(thread_id, turn):
+    return {"id": f"{thread_id}-{turn}", "thread_id": thread_id, "turn": turn, "timestamp": f"2024-01-0{turn}T00:00:00",
+            "user_input": f"question {turn}", "response": f"Answer {turn}. More detail."}
+
+
+def _compacting(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(retention_module, "conversation_collection", collection)
+    monkeypatch.setattr(retention_module, "lexical_index", FakeLexicalIndex())
+    return collection
+
+
+def test_compaction_folds_turns_into_one_summary_per_thread(monkeypatch):
+    collection = _compacting(monkeypatch)
+    retention = ConversationRetention()
+
+    retention._compact([_turn("a", 2), _turn("a", 1), _turn("b", 1)])
+    retention._compact([_turn("a", 3)])
+
+    document, metadata = collection.records["summary_a"]
+    assert document.split("\n") == [
+        SUMMARY_HEADER,
+        "- question 1 -> Answer 1. More detail.",
+        "- question 2 -> Answer 2. More detail.",
+        "- question 3 -> Answer 3. More detail.",
+    ]
+    assert metadata == {"type": "thread_summary", "thread_id": "a", "timestamp": "2024-01-03T00:00:00", "turns_compacted": 3}
+    assert collection.records["summary_b"][1]["turns_compacted"] == 1
+
+
+def test_compaction_keeps_the_most_recent_lines_within_the_budget(monkeypatch):
+    collection = _compacting(monkeypatch)
+    monkeypatch.setattr(Config, "RETENTION_SUMMARY_CHARS", 80)
+
+    ConversationRetention()._compact([_turn("a", turn) for turn in range(1, 6)])
+
+    lines = collection.records["summary_a"][0].split("\n")[1:]
+    assert lines == ["- question 4 -> Answer 4. More detail.", "- question 5 -> Answer 5. More detail."]
+
+
+def test_archive_appends_runs_to_one_readable_file(tmp_path):
+    retention = ConversationRetention(archive_dir=str(tmp_path))
+    path = str(tmp_path / "conversations.jsonl.gz")
+
+    retention._archive([_turn("a", 1)], path)
+    retention._archive([_turn("a", 2)], path)
+
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        assert [json.loads(line)["id"] for line in handle] == ["a-1", "a-2"]
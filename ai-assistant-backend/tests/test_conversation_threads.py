@@ -0,0 +1,35 @@
+from conversation_threads import ConversationThreadStore, summarize_response
+
+
+def _turn(turn_id, thread_id, turn, tenant="default"):
+    return {"id": turn_id, "thread_id": thread_id, "turn": turn, "timestamp": f"2024-01-01T00:00:0{turn}",
+            "user_input": f"question {turn}", "response": f"answer {turn}", "tenant": tenant}
+
+
+def test_thread_lookups_return_turns_in_order(tmp_path):
+    store = ConversationThreadStore(str(tmp_path / "threads.sqlite3"))
+    store.add_many([_turn("t3", "thread", 3), _turn("t1", "thread", 1), _turn("t2", "thread", 2)])
+
+    assert store.thread_of("t2") == "thread"
+    assert [turn["id"] for turn in store.get_thread("thread")] == ["t1", "t2", "t3"]
+    assert store.next_turn("thread") == 4
+    assert store.next_turn("new-thread") == 1
+    assert store.get_turns(["t1", "missing"])["t1"]["response"] == "answer 1"
+
+
+def test_thread_lookups_are_scoped_to_the_tenant(tmp_path):
+    store = ConversationThreadStore(str(tmp_path / "threads.sqlite3"))
+    store.add_many([_turn("a1", "shared", 1, tenant="alice"), _turn("b1", "shared", 1, tenant="bob"),
+                    _turn("b2", "shared", 2, tenant="bob")])
+
+    assert store.thread_of("a1", "bob") is None
+    assert [turn["id"] for turn in store.get_thread("shared", "alice")] == ["a1"]
+    assert store.next_turn("shared", "alice") == 2
+    assert store.next_turn("shared", "bob") == 3
+
+
+def test_summary_keeps_leading_sentences_within_the_limit():
+    response = "**First** sentence. Second sentence! A third sentence that does not fit."
+
+    assert summarize_response(response, 40) == "First sentence. Second sentence!"
+    assert summarize_response("x" * 50, 10) == "x" * 10
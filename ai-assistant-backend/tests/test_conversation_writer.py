@@ -0,0 +1,112 @@
+import asyncio
+import fcntl
+import json
+import os
+import pytest
+import conversation_writer as writer_module
+import shared_state
+from config.config import Config
+from conversation_writer import ConversationWriter
+from db import conversation_record
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Batches passed to store_conversations; set stored.fail to make the next store raise."""
+    batches = []
+
+    async def fake_store(records):
+        if getattr(fake_store, "fail", False):
+            fake_store.fail = False
+            raise RuntimeError("vector store unavailable")
+        batches.append([record["id"] for record in records])
+        return [record["id"] for record in records]
+
+    monkeypatch.setattr(writer_module, "store_conversations", fake_store)
+    fake_store.batches = batches
+    return fake_store
+
+
+def _write_journal(path, records):
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.writelines(json.dumps(record) + "\n" for record in records)
+
+
+def _journal_ids(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line)["id"] for line in handle]
+
+
+def _writer(path):
+    return ConversationWriter(str(path), batch_size=100, flush_interval=3600, fsync=False)
+
+
+def test_start_replays_a_journal_left_by_an_earlier_run(tmp_path, stored):
+    journal = tmp_path / "journal.jsonl"
+    records = [conversation_record("hi", "hello"), conversation_record("bye", "goodbye")]
+    _write_journal(journal, records)
+
+    async def scenario():
+        writer = _writer(journal)
+        await writer.start()
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+    assert stored.batches == [[record["id"] for record in records]]
+    assert not journal.exists()
+
+
+def test_failed_batch_stays_journaled_until_stored(tmp_path, stored):
+    journal = tmp_path / "journal.jsonl"
+
+    async def scenario():
+        writer = _writer(journal)
+        conversation_id = await writer.enqueue("hi", "hello")
+        stored.fail = True
+        await writer.flush()
+        assert _journal_ids(journal) == [conversation_id]
+        assert stored.batches == []
+
+        await writer.flush()
+        await writer.stop()
+        return conversation_id
+
+    conversation_id = asyncio.run(scenario())
+
+    assert stored.batches == [[conversation_id]]
+    assert not journal.exists()
+
+
+def test_worker_takes_over_dead_journals_without_duplicating_turns(tmp_path, stored, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_STATE_DIR", str(tmp_path / "shared"))
+    writer = _writer(tmp_path / "journal.jsonl")
+    monkeypatch.setattr(shared_state, "SHARED", True)
+    monkeypatch.setattr(writer_module, "SHARED", True)
+
+    first, second, live = (conversation_record(text, text) for text in ("one", "two", "live"))
+    # A dead worker's journal, partly copied into ours before a crash, and a live worker's journal
+    dead_journal = tmp_path / "journal.1001.jsonl"
+    live_journal = tmp_path / "journal.1002.jsonl"
+    _write_journal(dead_journal, [first, second])
+    _write_journal(tmp_path / f"journal.{os.getpid()}.jsonl", [first])
+    _write_journal(live_journal, [live])
+    os.makedirs(Config.SHARED_STATE_DIR)
+    live_lock = open(os.path.join(Config.SHARED_STATE_DIR, "journal-journal.1002.jsonl.lock"), "a")
+    fcntl.flock(live_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    async def scenario():
+        await writer.start()
+        await writer.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        live_lock.close()
+
+    assert sorted(stored.batches[0]) == sorted([first["id"], second["id"]])
+    assert len(stored.batches) == 1
+    assert not dead_journal.exists()
+    assert _journal_ids(live_journal) == [live["id"]]
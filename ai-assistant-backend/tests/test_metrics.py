@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    from main import app
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "request_count_total" in response.text
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from vector_store import NumpyVectorStore
+
+VECTORS = {
+    "north": [0.0, 1.0, 0.0],
+    "east": [1.0, 0.0, 0.0],
+    "up": [0.0, 0.0, 1.0],
+    "north-east": [0.7, 0.7, 0.0],
+}
+METADATAS = {
+    "north": {"type": "conversation", "turn": 1},
+    "east": {"type": "conversation", "turn": 2},
+    "up": {"type": "thread_summary", "turn": 3},
+    "north-east": {"type": "conversation", "turn": 4},
+}
+
+
+def _store(tmp_path, **kwargs):
+    store = NumpyVectorStore(str(tmp_path), "vectors", **kwargs)
+    store.add(ids=list(VECTORS), documents=[f"doc {i}" for i in VECTORS],
+              metadatas=[METADATAS[i] for i in VECTORS], embeddings=list(VECTORS.values()))
+    return store
+
+
+def test_query_ranks_by_distance_and_applies_filters(tmp_path):
+    store = _store(tmp_path)
+
+    result = store.query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=2)
+    assert result["ids"] == [["north", "north-east"]]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-6)
+
+    filtered = store.query(query_embeddings=[[0.0, 0.0, 1.0]], n_results=4, where={"type": "conversation"})
+    assert sorted(filtered["ids"][0]) == ["east", "north", "north-east"]
+    assert store.get(where={"$and": [{"type": "conversation"}, {"turn": {"$gte": 2}}]})["ids"] == ["east", "north-east"]
+    assert store.get(where={"turn": {"$in": [1, 3]}})["ids"] == ["north", "up"]
+
+
+def test_int8_store_keeps_the_ranking_and_approximate_embeddings(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(50, 16)).astype(np.float32)
+    ids = [f"v{i}" for i in range(50)]
+    exact = NumpyVectorStore(str(tmp_path), "exact")
+    quantized = NumpyVectorStore(str(tmp_path), "quantized", dtype="int8")
+    for store in (exact, quantized):
+        store.add(ids=ids, embeddings=embeddings)
+
+    queries = embeddings[:5] + rng.normal(scale=0.01, size=(5, 16)).astype(np.float32)
+    assert quantized.query(query_embeddings=queries, n_results=1)["ids"] == exact.query(query_embeddings=queries, n_results=1)["ids"]
+    stored = np.asarray(quantized.get(ids=["v0"], include=["embeddings"])["embeddings"][0])
+    assert np.allclose(stored, embeddings[0], atol=np.abs(embeddings[0]).max() / 127)
+
+
+def test_deleted_rows_are_reused_and_never_returned(tmp_path):
+    store = _store(tmp_path)
+
+    store.delete(ids=["north"])
+    assert store.count() == 3
+    assert "north" not in store.query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=4)["ids"][0]
+
+    store.add(ids=["south"], embeddings=[[0.0, -1.0, 0.0]])
+    assert store._high_water == len(VECTORS)
+    assert store.count() == 4
+    assert store.query(query_embeddings=[[0.0, -1.0, 0.0]], n_results=1)["ids"] == [["south"]]
+
+
+def test_reopened_store_keeps_records_and_its_layout(tmp_path):
+    _store(tmp_path, dtype="int8", space="l2").delete(ids=["up"])
+
+    reopened = NumpyVectorStore(str(tmp_path), "vectors")
+
+    assert (reopened.space, reopened.dtype, reopened.dim) == ("l2", np.dtype("int8"), 3)
+    assert reopened.count() == 3
+    assert reopened.get(ids=["east"])["metadatas"] == [METADATAS["east"]]
+    assert reopened.query(query_embeddings=[[1.0, 0.0, 0.0]], n_results=1)["ids"] == [["east"]]
@@ -0,0 +1,27 @@
+import db
+
+
+class FakeCollection:
+    def __init__(self, n):
+        self.n = n
+
+    def count(self):
+        return self.n
+
+
+def test_date_range_pages_reach_past_the_over_fetch(monkeypatch):
+    # Only the three lowest-ranked of 100 conversations fall inside the range
+    ranking = [
+        {"id": f"c{i}", "document": f"doc {i}", "score": 1.0 / (i + 1),
+         "metadata": {"timestamp": "2024-03-01T00:00:00" if i >= 97 else "2024-01-01T00:00:00"}}
+        for i in range(100)
+    ]
+    monkeypatch.setattr(db, "conversation_collection", FakeCollection(len(ranking)))
+    monkeypatch.setattr(db, "hybrid_query", lambda collection, query, n_results: ranking[:n_results])
+
+    first, cursor = db._get_relevant_conversations("query", 2, start="2024-02-01", end="2024-04-01")
+    second, last = db._get_relevant_conversations("query", 2, cursor=cursor, start="2024-02-01", end="2024-04-01")
+
+    assert first == ["doc 97", "doc 98"]
+    assert second == ["doc 99"]
+    assert last is None
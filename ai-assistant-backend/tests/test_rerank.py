@@ -0,0 +1,36 @@
+import asyncio
+import cohere
+from llm_models.rerank import rerank
+
+RELEVANCE_THRESHOLD = 0.7  # what web_search_tools keeps
+
+
+def test_single_weak_match_is_not_scored_as_highly_relevant():
+    query = "quantum chromodynamics lattice simulation results"
+    documents = ["Crossword tips: a lattice is a grid of crossed strips used in garden fences."]
+
+    response = asyncio.run(rerank.rerank(query=query, documents=documents))
+
+    assert len(response.results) == 1
+    assert response.results[0].relevance_score < RELEVANCE_THRESHOLD
+
+
+def test_small_sets_are_scored_by_the_reranker_with_caller_indices(monkeypatch):
+    query = "lattice simulation"
+    documents = ["garden lattice", "lattice simulation of quarks"]
+    sent = []
+
+    class Reranker:
+        async def rerank(self, query, documents, model, top_n):
+            sent.extend(documents)
+            return cohere.V2RerankResponse(id="test", results=[
+                cohere.V2RerankResponseResultsItem(index=0, relevance_score=0.9),
+                cohere.V2RerankResponseResultsItem(index=1, relevance_score=0.2),
+            ])
+
+    monkeypatch.setattr(rerank, "client", Reranker())
+    response = asyncio.run(rerank.rerank(query=query, documents=documents))
+
+    # Candidates are sent in BM25 order; results point back into the caller's list
+    assert sent == ["lattice simulation of quarks", "garden lattice"]
+    assert [(r.index, r.relevance_score) for r in response.results] == [(1, 0.9), (0, 0.2)]
@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from config.config import Config
+from tenancy import current_tenant, from_trusted_proxy
+
+SECRET_HEADER = Config.TENANT_PROXY_SECRET_HEADER
+
+
+def test_from_trusted_proxy_requires_the_configured_secret():
+    assert from_trusted_proxy({SECRET_HEADER: "s3cret"}, SECRET_HEADER, "s3cret")
+    assert not from_trusted_proxy({SECRET_HEADER: "guess"}, SECRET_HEADER, "s3cret")
+    assert not from_trusted_proxy({}, SECRET_HEADER, "s3cret")
+    assert not from_trusted_proxy({SECRET_HEADER: ""}, SECRET_HEADER, "")
+
+
+def test_tenant_header_is_ignored_without_the_proxy_secret(monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(Config, "TENANCY_ENABLED", True)
+    monkeypatch.setattr(Config, "TENANT_PROXY_SECRET", "s3cret")
+
+    @app.get("/_test/tenant")
+    async def tenant():
+        return {"tenant": current_tenant()}
+
+    client = TestClient(app)
+    spoofed = client.get("/_test/tenant", headers={Config.TENANT_HEADER: "someone-else"})
+    proxied = client.get("/_test/tenant", headers={Config.TENANT_HEADER: "alice", SECRET_HEADER: "s3cret"})
+
+    assert spoofed.status_code == 401
+    assert proxied.json() == {"tenant": "alice"}
+    assert client.get("/metrics").status_code == 200
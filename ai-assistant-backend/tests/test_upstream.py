@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from utils import upstream as upstream_module
+from utils.upstream import HybridSemaphore, TokenBucket, UpstreamGovernor
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"{status_code}")
+        self.status_code = status_code
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+def _governor(delays):
+    governor = UpstreamGovernor(max_retries=3, backoff_base=0.0, backoff_max=0.0)
+    governor._record_retry = lambda provider, endpoint, error, attempt, delay: delays.append(delay)
+    return governor
+
+
+def test_token_bucket_refills_and_tells_callers_how_long_to_wait(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(upstream_module.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2.0, burst=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    now[0] += 2.0
+    assert bucket.reserve() == 0.0
+
+
+def test_cancelled_acquirer_does_not_leak_a_slot():
+    async def scenario():
+        semaphore = HybridSemaphore(1)
+        await semaphore.acquire()
+
+        # Cancelled while queued
+        queued = asyncio.create_task(semaphore.acquire())
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert semaphore.waiting == 0
+
+        # Cancelled after the slot was handed over but before it resumed
+        granted = asyncio.create_task(semaphore.acquire())
+        await asyncio.sleep(0)
+        semaphore.release()
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        await asyncio.wait_for(semaphore.acquire(), timeout=1)
+        semaphore.release()
+        return semaphore._available
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_call_retries_only_rate_limits_and_server_errors():
+    delays = []
+    governor = _governor(delays)
+    attempts = []
+
+    async def flaky(errors):
+        attempts.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert asyncio.run(governor.call("test", "retry", flaky, [StatusError(503), StatusError(429, retry_after=0.05)])) == "ok"
+    assert len(attempts) == 3
+    assert delays[1] >= 0.05
+
+    attempts.clear()
+    with pytest.raises(StatusError):
+        asyncio.run(governor.call("test", "retry", flaky, [StatusError(400)]))
+    assert len(attempts) == 1
+
+
+def test_stream_does_not_retry_once_an_event_was_yielded():
+    delays = []
+    governor = _governor(delays)
+    calls = []
+
+    async def events(fail_before_first):
+        calls.append(1)
+        if fail_before_first and len(calls) == 1:
+            raise StatusError(503)
+        yield "first"
+        raise StatusError(503)
+
+    async def consume(fail_before_first):
+        received = []
+        with pytest.raises(StatusError):
+            async for event in governor.stream("test", "stream", events, fail_before_first):
+                received.append(event)
+        return received
+
+    assert asyncio.run(consume(False)) == ["first"]
+    assert len(calls) == 1
+
+    calls.clear()
+    assert asyncio.run(consume(True)) == ["first"]
+    assert len(calls) == 2
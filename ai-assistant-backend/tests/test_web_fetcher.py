@@ -0,0 +1,23 @@
+import asyncio
+from utils.web_fetcher import WebFetcher
+
+URL = "https://fake-search.local/lattice-simulation/1"
+
+
+def test_fake_pages_are_extracted_cached_and_revalidated(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_LATENCY_FETCH_MEDIAN", "0.001")
+    fetcher = WebFetcher(cache_dir=str(tmp_path))
+
+    async def scenario():
+        try:
+            return [await fetcher.fetch(URL), await fetcher.fetch(URL), await fetcher.fetch(URL, revalidate=True)]
+        finally:
+            await fetcher.aclose()
+
+    fetched, cached, revalidated = asyncio.run(scenario())
+
+    assert fetched.text.startswith("Lattice Simulation\nlattice simulation")
+    assert "Home | About" not in fetched.text
+    assert not fetched.from_cache
+    assert cached.from_cache and revalidated.from_cache
+    assert revalidated.content_hash == fetched.content_hash
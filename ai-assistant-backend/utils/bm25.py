@@ -0,0 +1,58 @@
+import math
+import re
+from collections import Counter
+from typing import List
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+    "who", "why", "with", "you", "your", "i", "me", "my", "we", "do", "does", "can",
+})
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def idf(document_count: int, document_frequency: np.ndarray) -> np.ndarray:
+    return np.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def bm25_scores(query: str, documents: List[str], k1: float = K1, b: float = B) -> np.ndarray:
+    """
+    Okapi BM25 score of every document for the query, treating the documents themselves
+    as the corpus. Only query terms are counted, so the term-frequency matrix is
+    (documents x query terms) and scoring is a handful of NumPy operations.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not documents:
+        return np.zeros(len(documents), dtype=np.float64)
+
+    term_index = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)), dtype=np.float64)
+    lengths = np.zeros(len(documents), dtype=np.float64)
+    for i, document in enumerate(documents):
+        tokens = tokenize(document)
+        lengths[i] = len(tokens)
+        for term, count in Counter(tokens).items():
+            j = term_index.get(term)
+            if j is not None:
+                tf[i, j] = count
+
+    avg_length = lengths.mean() or 1.0
+    weights = idf(len(documents), (tf > 0).sum(axis=0))
+    norm = k1 * (1 - b + b * lengths / avg_length)
+    return (tf * (k1 + 1) / (tf + norm[:, None]) * weights).sum(axis=1)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+__all__ = ["tokenize", "idf", "bm25_scores", "estimate_tokens", "K1", "B"]
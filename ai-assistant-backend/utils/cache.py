@@ -0,0 +1,317 @@
+import asyncio
+import collections
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+from prometheus_client import Counter
+from db_executor import db_executor
+
+# Cache metrics, per namespace. "coalesced" counts callers that waited for a load already in
+# progress for the same key instead of starting their own.
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups', ['namespace', 'result'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Entries evicted to keep a cache within its size bound', ['namespace'])
+
+
+class CacheBackend(ABC):
+    """Interface for cache storage backends."""
+
+    # Whether operations do disk I/O, so async callers should run them off the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class InMemoryLRUBackend(CacheBackend):
+    """Size-bounded LRU with per-entry TTL, safe to share between the event loop and worker threads."""
+
+    def __init__(self, max_entries: int = 1024, on_evict: Optional[Callable[[int], None]] = None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Size-bounded LRU with per-entry TTL in a local SQLite database, shared by every process on
+    the host (e.g. server workers) that opens the same path. Each namespace is a separate cache.
+    Values are pickled, so they must be picklable and are returned as copies. Expiry uses wall
+    clock time; the size bound is enforced every EVICT_EVERY writes rather than on each one.
+    Reads never write: recency is kept in memory and written with the next set, so a busy
+    writer in another process cannot stall cache hits here.
+    """
+
+    EVICT_EVERY = 64
+    blocking = True
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 1024,
+                 on_evict: Optional[Callable[[int], None]] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.evictions = 0
+        self._writes = 0
+        # Keys read since the last write, with the time they were last read
+        self._touched: Dict[str, float] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            # Expired rows are left for the next eviction pass
+            row = self._conn.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (self.namespace, key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = now
+        return pickle.loads(row[0])
+
+    def _flush_touches(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache_entries SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?",
+                [(accessed_at, self.namespace, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, data, now + ttl if ttl else None, now),
+            )
+            self._touched.pop(key, None)
+            self._flush_touches()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        )
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE rowid IN (SELECT rowid FROM cache_entries WHERE namespace = ? "
+                "ORDER BY accessed_at LIMIT ?)", (self.namespace, excess)
+            )
+            self.evictions += excess
+            if self.on_evict:
+                self.on_evict(excess)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class Cache:
+    """
+    A named cache over a storage backend, with a default TTL, per-namespace metrics and
+    stampede protection: get_or_set (and load) run at most one loader per key at a time in
+    this process, and concurrent callers for the same key wait for its result, or its error.
+    With a shared backend each process may still load a missing key once. None is never
+    cached, so loaders return None for results that should not be kept.
+    """
+
+    # Blocking loads (load_sync) serialize on one of this many locks, chosen by key
+    LOCK_STRIPES = 64
+
+    def __init__(self, namespace: str, backend: CacheBackend, ttl: Optional[float] = None, enabled: bool = True):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _record(self, result: str) -> None:
+        CACHE_REQUESTS.labels(namespace=self.namespace, result=result).inc()
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        self._record("miss" if value is None else "hit")
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if self.enabled and value is not None:
+            self.backend.set(key, value, ttl=self.ttl if ttl is None else ttl)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    async def _off_loop(self, operation: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.backend.blocking:
+            return func(*args, **kwargs)
+        return await db_executor.run(f"cache.{operation}", func, *args, **kwargs)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for coroutines; a blocking backend is read on the I/O thread pool."""
+        return await self._off_loop("get", self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._off_loop("set", self.set, key, value, ttl)
+
+    async def aclear(self) -> None:
+        await self._off_loop("clear", self.clear)
+
+    async def load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                   ttl: Union[float, Callable[[Any], float], None] = None) -> Any:
+        """
+        Run loader and store its result, or wait for a load of the same key already in progress.
+        ttl may be a function of the loaded value, for entries whose lifetime depends on what was loaded.
+        """
+        if not self.enabled:
+            return await loader()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._record("coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The caller that was loading was cancelled, not this one, so load it here instead
+                return await self.load(key, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            await self.aset(key, value, ttl(value) if callable(ttl) else ttl)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Marks the exception as retrieved, so a load nobody else waited for does not log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        value = await self.aget(key)
+        if value is not None:
+            return value
+        return await self.load(key, loader, ttl)
+
+    def load_sync(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """load() for blocking loaders called from worker threads."""
+        if not self.enabled:
+            return loader()
+        with self._stripes[zlib.crc32(key.encode("utf-8")) % self.LOCK_STRIPES]:
+            # Another thread may have stored it while this one waited for the lock
+            value = self.backend.get(key)
+            if value is not None:
+                self._record("coalesced")
+                return value
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+
+    def get_or_set_sync(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self.load_sync(key, loader, ttl)
+
+
+__all__ = ["Cache", "CacheBackend", "InMemoryLRUBackend", "SQLiteBackend"]
@@ -0,0 +1,110 @@
+import asyncio
+import collections
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from prometheus_client import Counter
+from config.config import Config
+from utils.utils import logger
+
+# Hedging metrics
+HEDGE_CALLS = Counter('hedge_calls_total', 'Calls eligible for hedging', ['call_site'])
+HEDGES_FIRED = Counter('hedges_fired_total', 'Duplicate (hedge) requests fired', ['call_site'])
+HEDGE_WINS = Counter('hedge_wins_total', 'Hedge requests that finished before the primary', ['call_site'])
+
+
+class RollingLatency:
+    """Sliding window of recent latencies used to pick the hedge delay."""
+
+    def __init__(self, window: int = 500):
+        self.samples: Deque[float] = collections.deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int) -> Optional[float]:
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Fires a duplicate request when the primary has not answered within the rolling
+    percentile latency for its call site. The first response wins and the loser is cancelled.
+    Hedges are capped by a budget expressed as a fraction of primary calls.
+    """
+
+    def __init__(self, enabled: bool = Config.HEDGING_ENABLED, budget: float = Config.HEDGE_BUDGET,
+                 percentile: float = Config.HEDGE_PERCENTILE, min_samples: int = Config.HEDGE_MIN_SAMPLES):
+        self.enabled = enabled
+        self.budget = budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies: Dict[str, RollingLatency] = collections.defaultdict(RollingLatency)
+        self.stats: Dict[str, Dict[str, int]] = collections.defaultdict(lambda: {"calls": 0, "hedges": 0, "wins": 0})
+        # Budget tokens accrue `budget` per call and each hedge spends one
+        self._tokens: Dict[str, float] = collections.defaultdict(float)
+
+    def _try_spend(self, call_site: str) -> bool:
+        if self._tokens[call_site] >= 1.0:
+            self._tokens[call_site] -= 1.0
+            return True
+        return False
+
+    def hedge_stats(self, call_site: str) -> Dict[str, float]:
+        """Return the hedge rate and win rate observed for a call site."""
+        stats = self.stats[call_site]
+        return {
+            "hedge_rate": stats["hedges"] / stats["calls"] if stats["calls"] else 0.0,
+            "win_rate": stats["wins"] / stats["hedges"] if stats["hedges"] else 0.0,
+        }
+
+    async def run(self, call_site: str, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `request` (a zero-argument coroutine factory) with hedging.
+        The factory is called a second time to create the hedge, so it must be idempotent.
+        """
+        if not self.enabled:
+            return await request()
+
+        start = time.perf_counter()
+        HEDGE_CALLS.labels(call_site=call_site).inc()
+        self.stats[call_site]["calls"] += 1
+        self._tokens[call_site] = min(self._tokens[call_site] + self.budget, 10.0)
+
+        primary = asyncio.ensure_future(request())
+        tasks = {primary}
+        try:
+            delay = self.latencies[call_site].percentile(self.percentile, self.min_samples)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._try_spend(call_site):
+                    logger.info(f"Hedging {call_site} after {delay:.2f}s")
+                    HEDGES_FIRED.labels(call_site=call_site).inc()
+                    self.stats[call_site]["hedges"] += 1
+                    tasks.add(asyncio.ensure_future(request()))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    # A failed attempt only loses if another attempt is still running
+                    if task.exception() is not None and pending:
+                        continue
+                    if task is not primary:
+                        HEDGE_WINS.labels(call_site=call_site).inc()
+                        self.stats[call_site]["wins"] += 1
+                    self.latencies[call_site].record(time.perf_counter() - start)
+                    return task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+# Shared hedger for upstream call sites
+hedger = Hedger()
+
+__all__ = ["hedger", "Hedger", "RollingLatency"]
@@ -0,0 +1,40 @@
+import threading
+from typing import Any, Callable
+
+
+class LazyObject:
+    """
+    Stand-in for a module-level object (client, collection, ...) that is only created when it
+    is first used, so importing a module does no network or disk work. Attribute access is
+    forwarded to the created object; creation happens at most once, even across threads.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "object")
+        self._target = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        """Create the object if needed and return it."""
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._target = self._factory()
+                    self._created = True
+        return self._target
+
+    @property
+    def initialized(self) -> bool:
+        return self._created
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        state = repr(self._target) if self._created else "not initialized"
+        return f"<lazy {self._name}: {state}>"
+
+
+__all__ = ["LazyObject"]
@@ -1,39 +1,102 @@
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import Counter, Histogram
 import functools
-from typing import AsyncIterator, Any
+import time
+from typing import AsyncIterator, Any, Optional
 
 # LLM-specific metrics
-LLM_REQUESTS = Counter('llm_requests_total', 'Total number of LLM requests', ['function_name'])
-LLM_REQUEST_DURATION = Histogram('llm_request_duration_seconds', 'Duration of LLM requests', ['function_name'])
-LLM_INPUT_TOKENS = Gauge('llm_input_tokens', 'Number of input tokens', ['function_name'])
-LLM_OUTPUT_TOKENS = Gauge('llm_output_tokens', 'Number of output tokens', ['function_name'])
+LLM_REQUESTS = Counter('llm_requests_total', 'Total number of LLM requests', ['model', 'call_site'])
+LLM_ERRORS = Counter('llm_errors_total', 'Total number of failed LLM requests', ['model', 'call_site'])
+LLM_INPUT_TOKENS = Counter('llm_input_tokens_total', 'Cumulative input tokens', ['model', 'call_site'])
+LLM_OUTPUT_TOKENS = Counter('llm_output_tokens_total', 'Cumulative output tokens', ['model', 'call_site'])
+LLM_REQUEST_DURATION = Histogram(
+    'llm_request_duration_seconds', 'Total duration of LLM requests, including the full stream',
+    ['model', 'call_site'], buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    'llm_time_to_first_token_seconds', 'Time from request to the first streamed token',
+    ['model', 'call_site'], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+)
+LLM_INTER_TOKEN_GAP = Histogram(
+    'llm_inter_token_gap_seconds', 'Gap between consecutive streamed content deltas',
+    ['model', 'call_site'], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    'llm_output_tokens_per_second', 'Output token throughput of streamed responses',
+    ['model', 'call_site'], buckets=(5, 10, 20, 40, 60, 80, 120, 160, 240)
+)
+
+
+def record_usage(model: str, call_site: str, usage: Any) -> Optional[int]:
+    """Add the token usage of a response to the cumulative counters. Returns the output token count."""
+    tokens = getattr(usage, 'tokens', None)
+    if tokens is None:
+        return None
+    input_tokens = getattr(tokens, 'input_tokens', None) or 0
+    output_tokens = getattr(tokens, 'output_tokens', None) or 0
+    LLM_INPUT_TOKENS.labels(model=model, call_site=call_site).inc(input_tokens)
+    LLM_OUTPUT_TOKENS.labels(model=model, call_site=call_site).inc(output_tokens)
+    return int(output_tokens)
+
+
+async def instrument_stream(stream: AsyncIterator, model: str, call_site: str, start: float) -> AsyncIterator:
+    """
+    Pass stream events through unchanged while measuring time-to-first-token,
+    inter-token gaps, total duration and output token throughput.
+    """
+    first_token_at = None
+    last_token_at = None
+    output_tokens = None
+    try:
+        async for event in stream:
+            event_type = getattr(event, 'type', None)
+            if event_type == 'content-delta':
+                now = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = now
+                    LLM_TIME_TO_FIRST_TOKEN.labels(model=model, call_site=call_site).observe(now - start)
+                else:
+                    LLM_INTER_TOKEN_GAP.labels(model=model, call_site=call_site).observe(now - last_token_at)
+                last_token_at = now
+            elif event_type == 'message-end':
+                usage = getattr(getattr(event, 'delta', None), 'usage', None)
+                if usage is not None:
+                    output_tokens = record_usage(model, call_site, usage)
+            yield event
+    except Exception:
+        LLM_ERRORS.labels(model=model, call_site=call_site).inc()
+        raise
+    finally:
+        LLM_REQUEST_DURATION.labels(model=model, call_site=call_site).observe(time.perf_counter() - start)
+        if output_tokens and first_token_at is not None and last_token_at > first_token_at:
+            LLM_TOKENS_PER_SECOND.labels(model=model, call_site=call_site).observe(output_tokens / (last_token_at - first_token_at))
+
 
 def track_llm_metrics(func):
+    """
+    Instrument an async ChatModel method. The call site is taken from the `call_site`
+    keyword argument when given, otherwise the method name. Streaming results are
+    wrapped transparently rather than consumed.
+    """
     @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        function_name = func.__name__
-        
-        # Increment the request counter
-        LLM_REQUESTS.labels(function_name=function_name).inc()
-        
-        # Use the Histogram to track duration
-        with LLM_REQUEST_DURATION.labels(function_name=function_name).time():
-            result = await func(*args, **kwargs)
-        
-        # Check if the result is an async generator
+    async def wrapper(self, *args, **kwargs):
+        model = getattr(self, 'model_name', 'unknown')
+        call_site = kwargs.get('call_site') or func.__name__
+        LLM_REQUESTS.labels(model=model, call_site=call_site).inc()
+        start = time.perf_counter()
+
+        try:
+            result = await func(self, *args, **kwargs)
+        except Exception:
+            LLM_ERRORS.labels(model=model, call_site=call_site).inc()
+            LLM_REQUEST_DURATION.labels(model=model, call_site=call_site).observe(time.perf_counter() - start)
+            raise
+
         if isinstance(result, AsyncIterator):
-            async for item in result:
-                # Assuming each item has usage data
-                if hasattr(item, 'usage') and hasattr(item.usage, 'tokens'):
-                    LLM_INPUT_TOKENS.labels(function_name=function_name).set(item.usage.tokens.input_tokens)
-                    LLM_OUTPUT_TOKENS.labels(function_name=function_name).set(item.usage.tokens.output_tokens)
-            return result
-        else:
-            # Update token usage for non-generator results
-            if hasattr(result, 'usage') and hasattr(result.usage, 'tokens'):
-                LLM_INPUT_TOKENS.labels(function_name=function_name).set(result.usage.tokens.input_tokens)
-                LLM_OUTPUT_TOKENS.labels(function_name=function_name).set(result.usage.tokens.output_tokens)
-        
+            # Duration is recorded when the stream finishes
+            return instrument_stream(result, model, call_site, start)
+
+        LLM_REQUEST_DURATION.labels(model=model, call_site=call_site).observe(time.perf_counter() - start)
+        record_usage(model, call_site, getattr(result, 'usage', None))
         return result
-    
+
     return wrapper
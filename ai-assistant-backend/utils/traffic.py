@@ -0,0 +1,26 @@
+import time
+
+
+class TrafficMonitor:
+    """Tracks in-flight HTTP requests so background maintenance can wait for a quiet period."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.last_request_at = time.monotonic()
+
+    def started(self) -> None:
+        self.in_flight += 1
+        self.last_request_at = time.monotonic()
+
+    def finished(self) -> None:
+        self.in_flight -= 1
+        self.last_request_at = time.monotonic()
+
+    def is_quiet(self, idle_seconds: float) -> bool:
+        """True when no request is running and none has finished in the last idle_seconds."""
+        return self.in_flight == 0 and time.monotonic() - self.last_request_at >= idle_seconds
+
+
+traffic_monitor = TrafficMonitor()
+
+__all__ = ["traffic_monitor", "TrafficMonitor"]
@@ -0,0 +1,307 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+from config.config import Config
+from utils.utils import logger
+
+# Upstream governance metrics
+UPSTREAM_REQUESTS = Counter('upstream_requests_total', 'Upstream requests by outcome', ['provider', 'endpoint', 'outcome'])
+UPSTREAM_RETRIES = Counter('upstream_retries_total', 'Upstream retries by status code', ['provider', 'endpoint', 'status'])
+UPSTREAM_QUEUE_WAIT = Histogram('upstream_queue_wait_seconds', 'Time spent waiting for a concurrency slot and rate token', ['provider', 'endpoint'])
+UPSTREAM_IN_FLIGHT = Gauge('upstream_in_flight', 'Upstream requests currently in flight', ['provider', 'endpoint'])
+UPSTREAM_QUEUE_DEPTH = Gauge('upstream_queue_depth', 'Callers waiting for an upstream slot', ['provider', 'endpoint'])
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Best-effort extraction of an HTTP status code from Cohere, Tavily, httpx, requests or Google errors."""
+    for candidate in (error, getattr(error, "response", None), getattr(error, "resp", None)):
+        if candidate is None:
+            continue
+        for attr in ("status_code", "status"):
+            value = getattr(candidate, attr, None)
+            try:
+                if value is not None:
+                    return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the Retry-After delay in seconds if the error carries one."""
+    for candidate in (error, getattr(error, "response", None), getattr(error, "resp", None)):
+        headers = getattr(candidate, "headers", None)
+        if not headers:
+            continue
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            if value is not None:
+                return float(value)
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Callers reserve a token and are told how long to wait for it."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            # The bucket is allowed to go negative so waiters are served in reservation order
+            return -self.tokens / self.rate
+
+
+class HybridSemaphore:
+    """
+    A FIFO semaphore usable from both the event loop and worker threads, so sync clients
+    running in threads and async clients share the same concurrency limit.
+    """
+
+    def __init__(self, limit: int):
+        self._available = max(1, limit)
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            future = loop.create_future()
+            entry = (loop, future)
+            self._waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(entry)
+                    granted = False
+                except ValueError:
+                    granted = True
+            # A permit that was handed to us must not leak; pending grants release themselves
+            if granted and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def acquire_sync(self) -> None:
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.done():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._available += 1
+                return
+            loop, waiter = self._waiters.popleft()
+        if loop is None:
+            waiter.set()
+        else:
+            loop.call_soon_threadsafe(self._grant, waiter)
+
+
+class EndpointLimiter:
+    """Concurrency semaphore plus token-bucket rate limit for one provider endpoint."""
+
+    def __init__(self, provider: str, endpoint: str, concurrency: int, rate: float, burst: int):
+        self.provider = provider
+        self.endpoint = endpoint
+        self.semaphore = HybridSemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+    def _labels(self) -> Dict[str, str]:
+        return {"provider": self.provider, "endpoint": self.endpoint}
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.perf_counter()
+        UPSTREAM_QUEUE_DEPTH.labels(**self._labels()).inc()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            UPSTREAM_QUEUE_DEPTH.labels(**self._labels()).dec()
+        try:
+            delay = self.bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            UPSTREAM_QUEUE_WAIT.labels(**self._labels()).observe(time.perf_counter() - start)
+            UPSTREAM_IN_FLIGHT.labels(**self._labels()).inc()
+            try:
+                yield
+            finally:
+                UPSTREAM_IN_FLIGHT.labels(**self._labels()).dec()
+        finally:
+            self.semaphore.release()
+
+    @contextmanager
+    def slot_sync(self):
+        start = time.perf_counter()
+        UPSTREAM_QUEUE_DEPTH.labels(**self._labels()).inc()
+        try:
+            self.semaphore.acquire_sync()
+        finally:
+            UPSTREAM_QUEUE_DEPTH.labels(**self._labels()).dec()
+        try:
+            delay = self.bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            UPSTREAM_QUEUE_WAIT.labels(**self._labels()).observe(time.perf_counter() - start)
+            UPSTREAM_IN_FLIGHT.labels(**self._labels()).inc()
+            try:
+                yield
+            finally:
+                UPSTREAM_IN_FLIGHT.labels(**self._labels()).dec()
+        finally:
+            self.semaphore.release()
+
+
+class UpstreamGovernor:
+    """
+    Shared governance layer for every upstream client (Cohere, Tavily, Google).
+    Applies per-provider/per-endpoint concurrency and rate limits, and retries
+    429/5xx responses with jittered exponential backoff.
+    """
+
+    def __init__(self, max_retries: int = Config.UPSTREAM_MAX_RETRIES,
+                 backoff_base: float = Config.UPSTREAM_BACKOFF_BASE,
+                 backoff_max: float = Config.UPSTREAM_BACKOFF_MAX):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiters: Dict[Tuple[str, str], EndpointLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider: str, endpoint: str) -> EndpointLimiter:
+        key = (provider, endpoint)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = EndpointLimiter(provider, endpoint, **Config.upstream_limit(provider, endpoint))
+                    self._limiters[key] = limiter
+        return limiter
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Return the backoff delay for a retryable error, or None if the error should be raised."""
+        status = get_status_code(error)
+        if status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+            return None
+        retry_after = get_retry_after(error)
+        # Full jitter keeps synchronized clients from retrying in lockstep
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def _record_retry(self, provider: str, endpoint: str, error: Exception, attempt: int, delay: float) -> None:
+        status = get_status_code(error)
+        UPSTREAM_RETRIES.labels(provider=provider, endpoint=endpoint, status=str(status)).inc()
+        logger.warning(f"{provider}.{endpoint} returned {status}; retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+
+    async def call(self, provider: str, endpoint: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await an async upstream call under the endpoint's limits, retrying 429/5xx."""
+        limiter = self.limiter(provider, endpoint)
+        attempt = 0
+        while True:
+            try:
+                async with limiter.slot():
+                    result = await func(*args, **kwargs)
+                UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="success").inc()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="error").inc()
+                    raise
+                self._record_retry(provider, endpoint, e, attempt, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def call_sync(self, provider: str, endpoint: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking upstream call under the endpoint's limits, retrying 429/5xx."""
+        limiter = self.limiter(provider, endpoint)
+        attempt = 0
+        while True:
+            try:
+                with limiter.slot_sync():
+                    result = func(*args, **kwargs)
+                UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="success").inc()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="error").inc()
+                    raise
+                self._record_retry(provider, endpoint, e, attempt, delay)
+                attempt += 1
+                time.sleep(delay)
+
+    async def call_in_thread(self, provider: str, endpoint: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking upstream call in a worker thread without blocking the event loop."""
+        return await asyncio.to_thread(self.call_sync, provider, endpoint, func, *args, **kwargs)
+
+    async def stream(self, provider: str, endpoint: str, func: Callable[..., AsyncIterator], *args, **kwargs) -> AsyncIterator:
+        """
+        Iterate a streaming upstream call while holding a concurrency slot for the stream's lifetime.
+        Failures are only retried before the first event has been yielded.
+        """
+        limiter = self.limiter(provider, endpoint)
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with limiter.slot():
+                    async for event in func(*args, **kwargs):
+                        started = True
+                        yield event
+                UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="success").inc()
+                return
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    UPSTREAM_REQUESTS.labels(provider=provider, endpoint=endpoint, outcome="error").inc()
+                    raise
+                self._record_retry(provider, endpoint, e, attempt, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+
+# Shared governor used by all upstream clients
+upstream = UpstreamGovernor()
+
+__all__ = ["upstream", "UpstreamGovernor", "EndpointLimiter", "TokenBucket", "get_status_code"]
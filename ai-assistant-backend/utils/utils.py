@@ -3,10 +3,6 @@ from fastapi import HTTPException
 import logging
 from rich.logging import RichHandler
 from rich.console import Console
-from rich.traceback import install
-
-# Install rich traceback handling
-install(show_locals=True)
 
 # Create a console object for rich output
 console = Console()
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from bs4 import BeautifulSoup
+from prometheus_client import Counter, Histogram
+from config.config import Config
+from utils.utils import logger
+
+# Fetcher metrics
+FETCH_REQUESTS = Counter('web_fetch_requests_total', 'Web page fetches by outcome', ['outcome'])
+FETCH_DURATION = Histogram('web_fetch_duration_seconds', 'Time to fetch and extract a web page',
+                           buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16))
+
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button"]
+
+
+class FetchResult:
+    def __init__(self, url: str, text: str, content_hash: str, from_cache: bool):
+        self.url = url
+        self.text = text
+        self.content_hash = content_hash
+        self.from_cache = from_cache
+
+
+def extract_main_text(html: bytes) -> str:
+    """Strip boilerplate and return the readable text of the page's main content, one block per line."""
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = []
+    for line in root.get_text(separator="\n").splitlines():
+        line = " ".join(line.split())
+        if line:
+            blocks.append(line)
+    return "\n".join(blocks)
+
+
+class WebFetcher:
+    """
+    Async fetch-and-extract with a pooled HTTP client and per-host concurrency limits.
+    Cleaned text is stored in a content-addressed disk cache keyed by SHA-256 and
+    each URL keeps a small index record with its validators, so revisits are served
+    from disk while fresh and revalidated with a conditional GET afterwards.
+    """
+
+    def __init__(self, cache_dir: str = Config.FETCH_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                transport=Config.init_fetch_transport(),
+                timeout=Config.FETCH_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=Config.FETCH_MAX_CONNECTIONS,
+                                    max_keepalive_connections=Config.FETCH_MAX_CONNECTIONS),
+                headers={"User-Agent": "ai-assistant-backend/1.0 (+fetcher)"},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(Config.FETCH_PER_HOST_CONCURRENCY)
+        return self._host_limits[host]
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, "index", f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json")
+
+    def _text_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, "texts", content_hash[:2], f"{content_hash}.txt")
+
+    def _read_index(self, url: str) -> Dict:
+        try:
+            with open(self._index_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _read_text(self, content_hash: str) -> Optional[str]:
+        try:
+            with open(self._text_path(content_hash), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_atomic(path: str, data: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _store(self, url: str, text: str, headers: httpx.Headers) -> str:
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        text_path = self._text_path(content_hash)
+        if not os.path.exists(text_path):
+            self._write_atomic(text_path, text)
+        self._write_index(url, {
+            "url": url,
+            "content_hash": content_hash,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
+        return content_hash
+
+    def _write_index(self, url: str, record: Dict) -> None:
+        self._write_atomic(self._index_path(url), json.dumps(record))
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> Tuple[int, bytes, httpx.Headers]:
+        """GET with a body size cap so oversized pages are abandoned instead of buffered."""
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return response.status_code, b"", response.headers
+            response.raise_for_status()
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > Config.FETCH_MAX_BYTES:
+                    raise ValueError(f"Response from {url} exceeds {Config.FETCH_MAX_BYTES} bytes")
+            return response.status_code, bytes(body), response.headers
+
+    async def fetch(self, url: str, revalidate: bool = False) -> Optional[FetchResult]:
+        """
+        Return the cleaned text for a URL. Cached text younger than FETCH_FRESH_TTL is
+        returned without a request unless revalidate is set. Returns None on failure.
+        """
+        start = time.perf_counter()
+        record = await asyncio.to_thread(self._read_index, url)
+        cached_text = None
+        if record:
+            cached_text = await asyncio.to_thread(self._read_text, record["content_hash"])
+            fresh = time.time() - record.get("fetched_at", 0) < Config.FETCH_FRESH_TTL
+            if cached_text is not None and fresh and not revalidate:
+                FETCH_REQUESTS.labels(outcome="cache_hit").inc()
+                return FetchResult(url, cached_text, record["content_hash"], from_cache=True)
+
+        headers = {}
+        if cached_text is not None:
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+
+        try:
+            async with self._host_limit(url):
+                status_code, body, response_headers = await self._get(url, headers)
+            if status_code == 304:
+                record["fetched_at"] = time.time()
+                await asyncio.to_thread(self._write_index, url, record)
+                FETCH_REQUESTS.labels(outcome="not_modified").inc()
+                return FetchResult(url, cached_text, record["content_hash"], from_cache=True)
+
+            # Parsing is CPU bound, so keep it off the event loop
+            text = await asyncio.to_thread(extract_main_text, body)
+            content_hash = await asyncio.to_thread(self._store, url, text, response_headers)
+            FETCH_REQUESTS.labels(outcome="fetched").inc()
+            return FetchResult(url, text, content_hash, from_cache=False)
+        except Exception as e:
+            FETCH_REQUESTS.labels(outcome="error").inc()
+            logger.warning(f"Failed to fetch {url}: {str(e)}")
+            return None
+        finally:
+            FETCH_DURATION.observe(time.perf_counter() - start)
+
+    async def fetch_many(self, urls: List[str], revalidate: bool = False) -> List[Optional[FetchResult]]:
+        return await asyncio.gather(*(self.fetch(url, revalidate=revalidate) for url in urls))
+
+
+web_fetcher = WebFetcher()
+
+__all__ = ["web_fetcher", "WebFetcher", "FetchResult", "extract_main_text"]
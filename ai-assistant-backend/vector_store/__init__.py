@@ -0,0 +1,6 @@
+from .base import VectorStore
+from .chroma_store import ChromaVectorStore
+from .numpy_store import NumpyVectorStore
+from .factory import open_vector_store
+
+__all__ = ["VectorStore", "ChromaVectorStore", "NumpyVectorStore", "open_vector_store"]
@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
+# Chroma's default include lists, which every backend follows
+DEFAULT_GET_INCLUDE = ["documents", "metadatas"]
+DEFAULT_QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+
+class VectorStore(ABC):
+    """
+    Interface for a named collection of embedded documents. Arguments and result shapes
+    follow Chroma's collection API (get returns flat lists, query returns one list per
+    query, keys that were not included are None), so retrieval code is backend agnostic.
+    A backend missing any of the methods cannot be instantiated.
+    """
+
+    name: str
+
+    @property
+    @abstractmethod
+    def space(self) -> str:
+        """Distance space of the store: "l2" (squared euclidean), "cosine" or "ip"."""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], documents: Optional[Sequence[str]] = None,
+            metadatas: Optional[Sequence[Dict]] = None, embeddings: Optional[Sequence[Sequence[float]]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Dict]] = None, embeddings: Optional[Sequence[Sequence[float]]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, ids: Sequence[str], documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Dict]] = None, embeddings: Optional[Sequence[Sequence[float]]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: List[str] = DEFAULT_GET_INCLUDE) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def query(self, query_texts: Optional[Sequence[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 10, where: Optional[Dict] = None, include: List[str] = DEFAULT_QUERY_INCLUDE) -> Dict[str, Any]:
+        ...
+
+
+__all__ = ["VectorStore", "DEFAULT_GET_INCLUDE", "DEFAULT_QUERY_INCLUDE"]
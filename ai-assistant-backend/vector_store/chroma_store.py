@@ -0,0 +1,43 @@
+from typing import Any, Dict
+from index_config import collection_space, open_collection
+from .base import VectorStore
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a Chroma collection with a configured HNSW index."""
+
+    def __init__(self, client, name: str, embedding_function, hnsw: Dict[str, Any]):
+        self.collection = open_collection(client, name, embedding_function, hnsw)
+        self.name = name
+
+    @property
+    def space(self) -> str:
+        return collection_space(self.collection)
+
+    @property
+    def metadata(self):
+        return self.collection.metadata
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, *args, **kwargs) -> None:
+        self.collection.add(*args, **kwargs)
+
+    def upsert(self, *args, **kwargs) -> None:
+        self.collection.upsert(*args, **kwargs)
+
+    def update(self, *args, **kwargs) -> None:
+        self.collection.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs) -> None:
+        self.collection.delete(*args, **kwargs)
+
+    def get(self, *args, **kwargs) -> Dict[str, Any]:
+        return self.collection.get(*args, **kwargs)
+
+    def query(self, *args, **kwargs) -> Dict[str, Any]:
+        return self.collection.query(*args, **kwargs)
+
+
+__all__ = ["ChromaVectorStore"]
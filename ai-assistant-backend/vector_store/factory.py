@@ -0,0 +1,23 @@
+import os
+from config.config import Config
+from .base import VectorStore
+from .chroma_store import ChromaVectorStore
+from .numpy_store import NumpyVectorStore
+
+
+def open_vector_store(name: str, embedding_function, client, path: str, config_name: str = None) -> VectorStore:
+    """
+    Open a collection with the backend configured for it ("chroma" or "numpy"). Partitions
+    pass their base collection as config_name to share its settings.
+    """
+    config_name = config_name or name
+    backend = Config.vector_store_backend(config_name)
+    if backend == "numpy":
+        return NumpyVectorStore(os.path.join(path, "numpy_store"), name, embedding_function,
+                                space=Config.NUMPY_STORE_SPACE, dtype=Config.NUMPY_STORE_DTYPE)
+    if backend == "chroma":
+        return ChromaVectorStore(client, name, embedding_function, Config.hnsw_config(config_name))
+    raise ValueError(f"Unknown vector store backend '{backend}' for collection '{name}'")
+
+
+__all__ = ["open_vector_store"]
@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from utils.utils import logger
+from .base import VectorStore, DEFAULT_GET_INCLUDE, DEFAULT_QUERY_INCLUDE
+
+INITIAL_CAPACITY = 1024
+SEARCH_BLOCK_ROWS = 16384  # rows scored per matrix product, bounding the dequantized copy
+SQL_CHUNK = 10000  # bound on bound parameters per statement
+COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def where_clause(where: Dict) -> Tuple[str, List]:
+    """Translate a Chroma metadata filter into an SQL condition over the JSON metadata column."""
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_clause(sub) for sub in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, sub_params in parts:
+                params.extend(sub_params)
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        path = f'$."{key}"'
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                placeholders = ", ".join("?" for _ in value)
+                clauses.append(f"json_extract(metadata, ?) {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend([path, *value])
+            elif operator in COMPARISONS:
+                clauses.append(f"json_extract(metadata, ?) {COMPARISONS[operator]} ?")
+                params.extend([path, value])
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return " AND ".join(clauses) or "1", params
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search VectorStore for small collections. Vectors live in memory-mapped float32 or
+    int8 arrays (int8 with a per-vector scale) and documents and metadata in SQLite, so
+    opening reads only the row table, there is no index to build and the page cache decides
+    how much of the vectors stays resident. Queries are a blocked matrix product over the
+    live (and filtered) rows. Deleted rows are reused by later inserts.
+    """
+
+    def __init__(self, path: str, name: str, embedding_function=None, space: str = "cosine", dtype: str = "float32"):
+        self.name = name
+        self.embedding_function = embedding_function
+        self.path = os.path.join(path, name)
+        self._lock = threading.RLock()
+        os.makedirs(self.path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.path, "store.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items (row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        settings = dict(self._conn.execute("SELECT key, value FROM settings").fetchall())
+        # A store keeps the layout it was created with
+        for key, configured in (("space", space), ("dtype", dtype)):
+            if settings.get(key, configured) != configured:
+                logger.warning(f"Vector store '{name}' was created with {key}={settings[key]}, not the configured {configured}")
+        self._space = settings.get("space", space)
+        self.dtype = np.dtype(settings.get("dtype", dtype))
+        if self._space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"Unsupported space: {self._space}")
+        if self.dtype not in (np.dtype("float32"), np.dtype("int8")):
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        self.dim: Optional[int] = int(settings["dim"]) if "dim" in settings else None
+
+        rows = np.asarray([row for (row,) in self._conn.execute("SELECT row FROM items")], dtype=np.int64)
+        self._high_water = int(rows.max()) + 1 if len(rows) else 0
+        self._capacity = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors = self._norms = self._scales = None
+        if self.dim is not None:
+            self._ensure_capacity(max(self._high_water, 1))
+        self._alive[rows] = True
+
+    @property
+    def space(self) -> str:
+        return self._space
+
+    def _array(self, filename: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        file = os.path.join(self.path, filename)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file, "ab") as handle:
+            if handle.tell() < size:
+                handle.truncate(size)
+        return np.memmap(file, dtype=dtype, mode="r+", shape=shape)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        for array in (self._vectors, self._norms, self._scales):
+            if array is not None:
+                array.flush()
+        self._vectors = self._array(f"vectors.{self.dtype.name}", self.dtype, (capacity, self.dim))
+        self._norms = self._array("norms.float32", np.float32, (capacity,))
+        if self.dtype == np.dtype("int8"):
+            self._scales = self._array("scales.float32", np.float32, (capacity,))
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._capacity = capacity
+
+    def _set_dim(self, dim: int) -> None:
+        self.dim = dim
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            [("dim", str(dim)), ("space", self._space), ("dtype", self.dtype.name)],
+        )
+        self._conn.commit()
+        self._ensure_capacity(1)
+
+    def _existing_rows(self, ids: List[str]) -> Dict[str, int]:
+        existing = {}
+        for start in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[start:start + SQL_CHUNK]
+            existing.update(self._conn.execute(
+                f"SELECT id, row FROM items WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+            ).fetchall())
+        return existing
+
+    def _allocate(self, count: int) -> List[int]:
+        free = np.flatnonzero(~self._alive[:self._high_water])[:count].tolist()
+        fresh = list(range(self._high_water, self._high_water + count - len(free)))
+        self._high_water += len(fresh)
+        return free + fresh
+
+    def _write_vectors(self, rows: List[int], embeddings) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self._set_dim(vectors.shape[1])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's dimension {self.dim}")
+        self._ensure_capacity(max(rows) + 1)
+        self._norms[rows] = np.linalg.norm(vectors, axis=1)
+        if self._scales is not None:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+            self._scales.flush()
+        else:
+            self._vectors[rows] = vectors
+        self._vectors.flush()
+        self._norms.flush()
+
+    def _write(self, mode: str, ids: Sequence[str], documents: Optional[Sequence[str]],
+               metadatas: Optional[Sequence[Dict]], embeddings) -> None:
+        ids = list(ids)
+        if embeddings is None and documents is not None:
+            embeddings = self.embedding_function(list(documents))
+        with self._lock:
+            existing = self._existing_rows(ids)
+            if mode == "add":
+                keep = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+            elif mode == "update":
+                keep = [i for i, doc_id in enumerate(ids) if doc_id in existing]
+            else:
+                keep = list(range(len(ids)))
+            if not keep:
+                return
+            new_ids = [ids[i] for i in keep if ids[i] not in existing]
+            if new_ids and embeddings is None:
+                raise ValueError("New records need embeddings or documents to embed")
+            allocated = dict(zip(new_ids, self._allocate(len(new_ids))))
+            rows = [existing.get(ids[i], allocated.get(ids[i])) for i in keep]
+
+            if embeddings is not None:
+                self._write_vectors(rows, [embeddings[i] for i in keep])
+            for i, row in zip(keep, rows):
+                document = documents[i] if documents is not None else None
+                metadata = json.dumps(metadatas[i]) if metadatas is not None else None
+                if ids[i] in existing:
+                    self._conn.execute(
+                        "UPDATE items SET document = COALESCE(?, document), metadata = COALESCE(?, metadata) WHERE row = ?",
+                        (document, metadata, row),
+                    )
+                else:
+                    self._conn.execute("INSERT INTO items (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                                       (row, ids[i], document, metadata))
+            self._conn.commit()
+            self._alive[rows] = True
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        """Insert new records; IDs that already exist are ignored, as in Chroma."""
+        self._write("add", ids, documents, metadatas, embeddings)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        self._write("upsert", ids, documents, metadatas, embeddings)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        self._write("update", ids, documents, metadatas, embeddings)
+
+    def _select(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None, rows: Optional[Sequence[int]] = None,
+                limit: Optional[int] = None, offset: Optional[int] = None) -> List[Tuple]:
+        """(row, id, document, metadata) tuples matching every given condition, in row order."""
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({', '.join('?' for _ in ids)})")
+            params.extend(ids)
+        if rows is not None:
+            clauses.append(f"row IN ({', '.join('?' for _ in rows)})")
+            params.extend(int(r) for r in rows)
+        if where:
+            sql, where_params = where_clause(where)
+            clauses.append(sql)
+            params.extend(where_params)
+        sql = "SELECT row, id, document, metadata FROM items"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset or 0])
+        return self._conn.execute(sql, params).fetchall()
+
+    def _records(self, rows: Sequence[int]) -> Dict[int, Tuple]:
+        records = {}
+        rows = list(rows)
+        for start in range(0, len(rows), SQL_CHUNK):
+            for record in self._select(rows=rows[start:start + SQL_CHUNK]):
+                records[record[0]] = record
+        return records
+
+    def _embeddings(self, rows: Sequence[int]) -> List[np.ndarray]:
+        vectors = np.asarray(self._vectors[list(rows)], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[list(rows)][:, None]
+        return list(vectors)
+
+    def delete(self, ids=None, where=None) -> None:
+        with self._lock:
+            if ids is None and where is None:
+                return
+            rows = [record[0] for record in self._select(ids=list(ids) if ids is not None else None, where=where)]
+            for start in range(0, len(rows), SQL_CHUNK):
+                chunk = rows[start:start + SQL_CHUNK]
+                self._conn.execute(f"DELETE FROM items WHERE row IN ({', '.join('?' for _ in chunk)})", chunk)
+            self._conn.commit()
+            self._alive[rows] = False
+
+    def count(self) -> int:
+        return int(self._alive.sum())
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include: List[str] = DEFAULT_GET_INCLUDE) -> Dict[str, Any]:
+        with self._lock:
+            records = self._select(ids=list(ids) if ids is not None else None, where=where, limit=limit, offset=offset)
+            rows = [record[0] for record in records]
+            return {
+                "ids": [record[1] for record in records],
+                "documents": [record[2] for record in records] if "documents" in include else None,
+                "metadatas": [json.loads(record[3]) if record[3] else None for record in records] if "metadatas" in include else None,
+                "embeddings": (self._embeddings(rows) if rows else []) if "embeddings" in include else None,
+            }
+
+    def _distances(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(rows x queries) distances in the store's space, scored block by block."""
+        dots = np.empty((len(rows), len(queries)), dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            vectors = np.asarray(self._vectors[block], dtype=np.float32)
+            scores = vectors @ queries.T
+            if self._scales is not None:
+                scores *= self._scales[block][:, None]
+            dots[start:start + len(block)] = scores
+        if self._space == "ip":
+            return 1 - dots
+        norms = np.asarray(self._norms[rows], dtype=np.float32)[:, None]
+        query_norms = np.linalg.norm(queries, axis=1)[None, :]
+        if self._space == "cosine":
+            return 1 - dots / np.maximum(norms * query_norms, 1e-12)
+        # Squared euclidean distance, as Chroma's l2 space reports
+        return norms ** 2 - 2 * dots + query_norms ** 2
+
+    def query(self, query_texts=None, query_embeddings=None, n_results: int = 10, where=None,
+              include: List[str] = DEFAULT_QUERY_INCLUDE) -> Dict[str, Any]:
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            if where:
+                rows = np.asarray([record[0] for record in self._select(where=where)], dtype=np.int64)
+            else:
+                rows = np.flatnonzero(self._alive[:self._high_water])
+            if self.dim is None or not len(rows):
+                ranked = [np.zeros(0, dtype=np.int64) for _ in queries]
+                distances = np.zeros((0, len(queries)), dtype=np.float32)
+            else:
+                distances = self._distances(rows, queries)
+                k = min(n_results, len(rows))
+                ranked = []
+                for column in range(len(queries)):
+                    top = np.argpartition(distances[:, column], k - 1)[:k]
+                    ranked.append(top[np.argsort(distances[top, column])])
+            records = self._records({int(rows[i]) for order in ranked for i in order})
+            return {
+                "ids": [[records[rows[i]][1] for i in order] for order in ranked],
+                "documents": [[records[rows[i]][2] for i in order] for order in ranked] if "documents" in include else None,
+                "metadatas": [[json.loads(records[rows[i]][3]) if records[rows[i]][3] else None for i in order]
+                              for order in ranked] if "metadatas" in include else None,
+                "embeddings": [self._embeddings(rows[order]) if len(order) else [] for order in ranked]
+                              if "embeddings" in include else None,
+                "distances": [[float(distances[i, column]) for i in order] for column, order in enumerate(ranked)]
+                             if "distances" in include else None,
+            }
+
+
+__all__ = ["NumpyVectorStore", "where_clause"]
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+from prometheus_client import Counter, Gauge
+from tenancy import DEFAULT_TENANT, current_tenant
+
+# Partition metrics
+PARTITIONS_OPEN = Gauge('vector_store_partitions_open', 'Tenant partitions currently open', ['collection'])
+PARTITION_EVENTS = Counter('vector_store_partition_events_total', 'Tenant partitions opened and evicted', ['collection', 'event'])
+
+# Partitions used this recently are never evicted to make room, so in-flight work keeps its handle
+EVICTION_GRACE_SECONDS = 5.0
+
+
+class _Partition:
+    def __init__(self, collection: Any):
+        self.collection = collection
+        self.last_used = time.monotonic()
+        self.users = 0
+
+
+class PartitionRouter:
+    """
+    Maps tenants to their own collection ("<base>__<tenant>"; the default tenant keeps the
+    base collection). Partitions are opened on first use and evicted from memory when idle
+    for idle_seconds, or oldest first once more than max_open are open. Partitions in use
+    are never evicted.
+    """
+
+    def __init__(self, base_name: str, opener: Callable[[str], Any], max_open: int, idle_seconds: float):
+        self.base_name = base_name
+        self._opener = opener
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def partition_name(self, tenant: str) -> str:
+        return self.base_name if tenant == DEFAULT_TENANT else f"{self.base_name}__{tenant}"
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for tenant, partition in list(self._partitions.items()):
+            idle = now - partition.last_used
+            over_limit = len(self._partitions) > self.max_open and idle >= EVICTION_GRACE_SECONDS
+            if partition.users == 0 and (idle >= self.idle_seconds or over_limit):
+                del self._partitions[tenant]
+                PARTITION_EVENTS.labels(collection=self.base_name, event="evict").inc()
+        PARTITIONS_OPEN.labels(collection=self.base_name).set(len(self._partitions))
+
+    def _partition(self, tenant: str, acquire: bool = False) -> _Partition:
+        # Opening under the lock keeps exactly one handle per partition
+        with self._lock:
+            partition = self._partitions.get(tenant)
+            if partition is None:
+                partition = _Partition(self._opener(self.partition_name(tenant)))
+                self._partitions[tenant] = partition
+                PARTITION_EVENTS.labels(collection=self.base_name, event="open").inc()
+                self._evict()
+            self._partitions.move_to_end(tenant)
+            partition.last_used = time.monotonic()
+            if acquire:
+                partition.users += 1
+            return partition
+
+    def get(self, tenant: str) -> Any:
+        return self._partition(tenant).collection
+
+    @contextmanager
+    def use(self, tenant: str):
+        """Hold a tenant's partition open for the duration of an operation."""
+        partition = self._partition(tenant, acquire=True)
+        try:
+            yield partition.collection
+        finally:
+            with self._lock:
+                partition.users -= 1
+                partition.last_used = time.monotonic()
+
+    def sweep(self) -> None:
+        """Evict idle partitions without waiting for the next open."""
+        with self._lock:
+            self._evict()
+
+    def open_partitions(self) -> Dict[str, Any]:
+        with self._lock:
+            return {tenant: partition.collection for tenant, partition in self._partitions.items()}
+
+
+class PartitionedCollection:
+    """
+    Collection-like view that sends every call to the current tenant's partition, so code
+    written against a single collection is tenant scoped without changes.
+    """
+
+    def __init__(self, router: PartitionRouter):
+        self.router = router
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.router.get(current_tenant()), name)
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        with self.router.use(current_tenant()) as collection:
+            return getattr(collection, method)(*args, **kwargs)
+
+    def count(self) -> int:
+        return self._call("count")
+
+    def add(self, *args, **kwargs):
+        return self._call("add", *args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        return self._call("upsert", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._call("update", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call("delete", *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call("get", *args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        return self._call("query", *args, **kwargs)
+
+
+__all__ = ["PartitionRouter", "PartitionedCollection"]